@@ -0,0 +1,471 @@
+"""
+Precomputed analytics aggregates for the e-commerce schema.
+
+Summary tables (agg_*) hold revenue by category and month, sales per
+product, the payment-method mix and purchase demographics. They are built
+at setup time and refreshed incrementally with additive upserts:
+
+- new rows are picked up by an id watermark per source table
+  (agg_refresh_state);
+- ids near the top of each folded range that were missing are remembered
+  in agg_refresh_gaps for ANALYTICS_LATE_ROW_SECONDS, so a row whose id was
+  taken before a higher one but that committed later is folded when it
+  appears;
+- UPDATE and DELETE triggers on the source tables log the old and new row
+  images in agg_row_changes, and the refresh subtracts the old contribution
+  and adds the new one for rows that were already folded.
+
+Changes to the dimension tables (a product's category, a customer's age)
+and to a transaction's date once its details were folded are not tracked;
+a full rebuild picks them up. Migrations that rewrite a
+source table call reset_aggregates() so the next refresh rebuilds.
+
+All functions take a DB-API (psycopg2) connection so the same code runs
+from setup_database.py and from the API (via engine.raw_connection()).
+"""
+
+import os
+import re
+import time
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import Dict, Any, List, Optional
+
+# Analytics configuration
+ANALYTICS_REFRESH_SECONDS = float(os.getenv("ANALYTICS_REFRESH_SECONDS", "30"))
+ANALYTICS_GROUNDING = os.getenv("ANALYTICS_GROUNDING", "true").lower() == "true"
+ANALYTICS_LATE_ROW_WINDOW = int(os.getenv("ANALYTICS_LATE_ROW_WINDOW", "10000"))  # ids below the newest row watched
+ANALYTICS_LATE_ROW_SECONDS = float(os.getenv("ANALYTICS_LATE_ROW_SECONDS", "3600"))  # then a missing id counts as rolled back
+
+# Advisory lock so only one worker refreshes at a time
+REFRESH_LOCK_KEY = 70420001
+
+ANALYTICS_DDL = """
+CREATE TABLE IF NOT EXISTS agg_refresh_state (
+    source VARCHAR(50) PRIMARY KEY,
+    watermark BIGINT NOT NULL DEFAULT 0,
+    refreshed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS agg_refresh_gaps (
+    source VARCHAR(50) NOT NULL,
+    row_id BIGINT NOT NULL,
+    recorded_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (source, row_id)
+);
+
+CREATE TABLE IF NOT EXISTS agg_row_changes (
+    change_id BIGSERIAL PRIMARY KEY,
+    source VARCHAR(50) NOT NULL,
+    row_id BIGINT NOT NULL,
+    sign SMALLINT NOT NULL,
+    image JSONB NOT NULL
+);
+
+-- Arguments: id column, source table (TG_TABLE_NAME would name the partition)
+CREATE OR REPLACE FUNCTION agg_log_row_change() RETURNS trigger AS $$
+DECLARE
+    old_id BIGINT := (to_jsonb(OLD) ->> TG_ARGV[0])::BIGINT;
+BEGIN
+    INSERT INTO agg_row_changes (source, row_id, sign, image) VALUES (TG_ARGV[1], old_id, -1, to_jsonb(OLD));
+    IF TG_OP = 'UPDATE' THEN
+        INSERT INTO agg_row_changes (source, row_id, sign, image) VALUES (TG_ARGV[1], old_id, 1, to_jsonb(NEW));
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TABLE IF NOT EXISTS agg_category_month_revenue (
+    category_id INTEGER NOT NULL,
+    month DATE NOT NULL,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    units BIGINT NOT NULL DEFAULT 0,
+    line_items BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (category_id, month)
+);
+
+CREATE TABLE IF NOT EXISTS agg_product_sales (
+    product_id INTEGER PRIMARY KEY,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    units BIGINT NOT NULL DEFAULT 0,
+    line_items BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS agg_payment_methods (
+    payment_method VARCHAR(50) PRIMARY KEY,
+    transactions BIGINT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS agg_customer_demographics (
+    gender VARCHAR(10) NOT NULL,
+    age_band VARCHAR(10) NOT NULL,
+    transactions BIGINT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (gender, age_band)
+);
+
+INSERT INTO agg_refresh_state (source, watermark) VALUES
+    ('transaction_details', 0),
+    ('transactions', 0)
+ON CONFLICT (source) DO NOTHING;
+"""
+
+# Aggregate table -> the row count column; rows whose count drops to 0 are removed
+AGGREGATE_TABLES = {
+    "agg_category_month_revenue": "line_items",
+    "agg_product_sales": "line_items",
+    "agg_payment_methods": "transactions",
+    "agg_customer_demographics": "transactions",
+}
+
+AGE_BAND_SQL = """
+    CASE
+        WHEN c.age IS NULL THEN 'Unknown'
+        WHEN c.age < 25 THEN '18-24'
+        WHEN c.age < 35 THEN '25-34'
+        WHEN c.age < 45 THEN '35-44'
+        WHEN c.age < 55 THEN '45-54'
+        WHEN c.age < 65 THEN '55-64'
+        ELSE '65+'
+    END
+"""
+
+# Row sets folded into the aggregates, each with a sign column (+1 add, -1 subtract)
+NEW_ROWS = "(SELECT x.*, 1 AS sign FROM {source} x WHERE x.{id} > %(low)s AND x.{id} <= %(high)s)"
+LATE_ROWS = "(SELECT x.*, 1 AS sign FROM {source} x WHERE x.{id} = ANY(%(late)s))"
+# Logged changes of rows that were already folded: at or below the watermark and not a pending gap
+CHANGED_ROWS = """(
+    SELECT r.*, c.sign
+    FROM agg_row_changes c
+    CROSS JOIN LATERAL jsonb_populate_record(NULL::{source}, c.image) r
+    WHERE c.source = %(source)s AND c.row_id <= %(low)s
+      AND NOT EXISTS (SELECT 1 FROM agg_refresh_gaps g WHERE g.source = c.source AND g.row_id = c.row_id)
+)"""
+
+# Additive upserts per source table over one of the row sets above ({rows})
+# transaction_details comes first: its deletes read the transactions change log before it is cleared
+INCREMENTAL_SQL = {
+    "transaction_details": ("detail_id", [
+        """
+        INSERT INTO agg_category_month_revenue AS agg (category_id, month, revenue, units, line_items)
+        SELECT COALESCE(p.category_id, 0),
+               CAST(date_trunc('month', COALESCE(t.transaction_date, gone.transaction_date)) AS DATE),
+               SUM(td.sign * td.line_total), SUM(td.sign * td.quantity), SUM(td.sign)
+        FROM {rows} td
+        LEFT JOIN transactions t ON t.transaction_id = td.transaction_id
+        -- A deleted detail whose transaction went with it: the date comes from the logged transaction
+        LEFT JOIN LATERAL (
+            SELECT (jsonb_populate_record(NULL::transactions, c.image)).transaction_date
+            FROM agg_row_changes c
+            WHERE t.transaction_id IS NULL AND c.source = 'transactions'
+              AND c.row_id = td.transaction_id AND c.sign = -1
+            ORDER BY c.change_id
+            LIMIT 1
+        ) gone ON TRUE
+        LEFT JOIN products p ON p.product_id = td.product_id
+        WHERE COALESCE(t.transaction_date, gone.transaction_date) IS NOT NULL
+        GROUP BY 1, 2
+        ON CONFLICT (category_id, month) DO UPDATE SET
+            revenue = agg.revenue + EXCLUDED.revenue,
+            units = agg.units + EXCLUDED.units,
+            line_items = agg.line_items + EXCLUDED.line_items
+        """,
+        """
+        INSERT INTO agg_product_sales AS agg (product_id, revenue, units, line_items)
+        SELECT td.product_id, SUM(td.sign * td.line_total), SUM(td.sign * td.quantity), SUM(td.sign)
+        FROM {rows} td
+        WHERE td.product_id IS NOT NULL
+        GROUP BY 1
+        ON CONFLICT (product_id) DO UPDATE SET
+            revenue = agg.revenue + EXCLUDED.revenue,
+            units = agg.units + EXCLUDED.units,
+            line_items = agg.line_items + EXCLUDED.line_items
+        """,
+    ]),
+    "transactions": ("transaction_id", [
+        """
+        INSERT INTO agg_payment_methods AS agg (payment_method, transactions, revenue)
+        SELECT COALESCE(t.payment_method, 'Unknown'), SUM(t.sign), SUM(t.sign * t.total_amount)
+        FROM {rows} t
+        GROUP BY 1
+        ON CONFLICT (payment_method) DO UPDATE SET
+            transactions = agg.transactions + EXCLUDED.transactions,
+            revenue = agg.revenue + EXCLUDED.revenue
+        """,
+        f"""
+        INSERT INTO agg_customer_demographics AS agg (gender, age_band, transactions, revenue)
+        SELECT COALESCE(c.gender, 'Unknown'), {AGE_BAND_SQL}, SUM(t.sign), SUM(t.sign * t.total_amount)
+        FROM {{rows}} t
+        LEFT JOIN customers c ON c.customer_id = t.customer_id
+        GROUP BY 1, 2
+        ON CONFLICT (gender, age_band) DO UPDATE SET
+            transactions = agg.transactions + EXCLUDED.transactions,
+            revenue = agg.revenue + EXCLUDED.revenue
+        """,
+    ]),
+}
+
+def install_change_triggers(cursor):
+    """Log UPDATEs and DELETEs of the source tables (a rebuilt table needs them again)"""
+    for source, (id_column, _) in INCREMENTAL_SQL.items():
+        cursor.execute("""
+            SELECT 1 FROM pg_trigger
+            WHERE tgrelid = to_regclass(%s) AND tgname = 'agg_row_changes' AND NOT tgisinternal
+        """, (source,))
+        if not cursor.fetchone():
+            cursor.execute(f"""
+                CREATE TRIGGER agg_row_changes AFTER UPDATE OR DELETE ON {source}
+                FOR EACH ROW EXECUTE FUNCTION agg_log_row_change('{id_column}', '{source}')
+            """)
+
+def create_analytics_tables(connection):
+    """Create the summary tables, watermark rows and change triggers"""
+    cursor = connection.cursor()
+    cursor.execute(ANALYTICS_DDL)
+    install_change_triggers(cursor)
+    if not connection.autocommit:
+        connection.commit()
+
+def reset_aggregates(cursor):
+    """Empty the aggregates and their refresh state; the next refresh folds every row again"""
+    cursor.execute(f"TRUNCATE {', '.join(AGGREGATE_TABLES)}")
+    # DELETE rather than TRUNCATE: changes logged by transactions still in flight must survive
+    cursor.execute("DELETE FROM agg_refresh_gaps")
+    cursor.execute("DELETE FROM agg_row_changes")
+    cursor.execute("UPDATE agg_refresh_state SET watermark = 0")
+
+def fold(cursor, source: str, rows: str, params: Dict[str, Any]):
+    id_column, statements = INCREMENTAL_SQL[source]
+    row_set = rows.format(source=source, id=id_column)
+    for statement in statements:
+        cursor.execute(statement.format(rows=row_set), params)
+
+def refresh_aggregates(connection, full: bool = False) -> Dict[str, Any]:
+    """Fold changed and newly committed source rows into the aggregates (or rebuild them) in one transaction"""
+    started = time.perf_counter()
+    autocommit = connection.autocommit
+    connection.autocommit = False
+    try:
+        cursor = connection.cursor()
+        # One snapshot for the change log, the gaps and the folds
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        cursor.execute("SELECT pg_try_advisory_xact_lock(%s)", (REFRESH_LOCK_KEY,))
+        if not cursor.fetchone()[0]:
+            connection.rollback()
+            return {"skipped": True, "reason": "refresh already running"}
+
+        if full:
+            reset_aggregates(cursor)
+
+        folded = {}
+        for source, (id_column, _) in INCREMENTAL_SQL.items():
+            cursor.execute("SELECT watermark FROM agg_refresh_state WHERE source = %s FOR UPDATE", (source,))
+            low = cursor.fetchone()[0]
+            params = {"source": source, "low": low}
+
+            # Updates and deletes of folded rows: subtract the old image, add the new one
+            cursor.execute("SELECT COUNT(*) FROM agg_row_changes WHERE source = %s", (source,))
+            changes = cursor.fetchone()[0]
+            if changes:
+                fold(cursor, source, CHANGED_ROWS, params)
+                # Only the changes this snapshot sees; later ones wait for the next refresh
+                cursor.execute("DELETE FROM agg_row_changes WHERE source = %s", (source,))
+
+            # Rows that committed after a higher id was folded
+            cursor.execute(f"""
+                SELECT g.row_id FROM agg_refresh_gaps g
+                WHERE g.source = %s AND EXISTS (SELECT 1 FROM {source} x WHERE x.{id_column} = g.row_id)
+            """, (source,))
+            late = [row_id for (row_id,) in cursor.fetchall()]
+            if late:
+                fold(cursor, source, LATE_ROWS, {**params, "late": late})
+                cursor.execute("DELETE FROM agg_refresh_gaps WHERE source = %s AND row_id = ANY(%s)", (source, late))
+            cursor.execute(
+                "DELETE FROM agg_refresh_gaps WHERE source = %s AND recorded_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 second'",
+                (source, ANALYTICS_LATE_ROW_SECONDS)
+            )
+
+            cursor.execute(f"SELECT COALESCE(MAX({id_column}), 0) FROM {source}")
+            high = cursor.fetchone()[0]
+            if high > low:
+                fold(cursor, source, NEW_ROWS, {**params, "high": high})
+                # Ids near the top that are missing may belong to transactions still in flight
+                cursor.execute(f"""
+                    INSERT INTO agg_refresh_gaps (source, row_id)
+                    SELECT %(source)s, g FROM (
+                        SELECT generate_series(GREATEST(%(low)s, %(high)s - %(window)s) + 1, %(high)s) AS g
+                        EXCEPT
+                        SELECT x.{id_column} FROM {source} x
+                        WHERE x.{id_column} > GREATEST(%(low)s, %(high)s - %(window)s) AND x.{id_column} <= %(high)s
+                    ) missing
+                    ON CONFLICT DO NOTHING
+                """, {**params, "high": high, "window": ANALYTICS_LATE_ROW_WINDOW})
+                cursor.execute(
+                    "UPDATE agg_refresh_state SET watermark = %s, refreshed_at = CURRENT_TIMESTAMP WHERE source = %s",
+                    (high, source)
+                )
+            folded[source] = {"new_ids": max(0, high - low), "late_rows": len(late), "changes": changes}
+
+        for table, count_column in AGGREGATE_TABLES.items():
+            cursor.execute(f"DELETE FROM {table} WHERE {count_column} = 0")
+        connection.commit()
+        return {
+            "skipped": False,
+            "full": full,
+            "folded": folded,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.autocommit = autocommit
+
+def fetch_rows(connection, sql: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Run a read query and return rows as dicts with JSON-friendly numbers"""
+    cursor = connection.cursor()
+    cursor.execute(sql, params or {})
+    columns = [column[0] for column in cursor.description]
+    rows = []
+    for values in cursor.fetchall():
+        rows.append({
+            column: float(value) if isinstance(value, Decimal) else
+                    value.isoformat() if hasattr(value, "isoformat") else value
+            for column, value in zip(columns, values)
+        })
+    return rows
+
+# Read queries behind the /analytics endpoints
+REPORT_SQL = {
+    "revenue_by_category_month": """
+        SELECT a.month, a.category_id, COALESCE(c.category_name, 'Uncategorized') AS category_name,
+               a.revenue, a.units, a.line_items
+        FROM agg_category_month_revenue a
+        LEFT JOIN categories c ON c.category_id = a.category_id
+        WHERE %(year)s IS NULL OR EXTRACT(YEAR FROM a.month) = %(year)s
+        ORDER BY a.month, a.revenue DESC
+    """,
+    "payment_methods": """
+        SELECT payment_method, transactions, revenue,
+               ROUND(100.0 * transactions / NULLIF(SUM(transactions) OVER (), 0), 2) AS share_pct
+        FROM agg_payment_methods
+        ORDER BY transactions DESC
+    """,
+    "demographics": """
+        SELECT gender, age_band, transactions, revenue
+        FROM agg_customer_demographics
+        ORDER BY gender, age_band
+    """,
+    "top_products": """
+        SELECT a.product_id, p.product_name, a.units, a.revenue, a.line_items
+        FROM agg_product_sales a
+        LEFT JOIN products p ON p.product_id = a.product_id
+        ORDER BY a.revenue DESC
+        LIMIT %(limit)s
+    """,
+}
+
+_GROUNDING_KEYWORDS = re.compile(
+    r"\b(sales|sold|revenue|income|earn\w*|payment|paid|pay|demographic\w*|gender|age|"
+    r"top|best|popular|trend\w*|month\w*|categor\w+|products?|customers?)\b",
+    re.IGNORECASE
+)
+
+class AnalyticsService:
+    """Serves the aggregates with an in-process cache that is dropped on every refresh"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._cache: Dict[Any, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self.grounding = ""
+        self.last_refresh: Dict[str, Any] = {}
+        self.refreshes = 0
+
+    @contextmanager
+    def _connection(self):
+        # Pooled DB-API connection; yield the driver connection so autocommit can be toggled
+        pooled = self.engine.raw_connection()
+        try:
+            yield getattr(pooled, "driver_connection", pooled)
+        finally:
+            pooled.close()
+
+    def setup(self):
+        """Create the aggregate tables if needed and catch them up"""
+        with self._connection() as connection:
+            create_analytics_tables(connection)
+        self.refresh()
+
+    def refresh(self, full: bool = False) -> Dict[str, Any]:
+        """Incrementally refresh the aggregates and rebuild the grounding snapshot"""
+        with self._connection() as connection:
+            result = refresh_aggregates(connection, full=full)
+        with self._lock:
+            self._cache.clear()
+        self.refreshes += 1
+        self.last_refresh = {**result, "at": time.time()}
+        self.grounding = self._build_grounding()
+        return result
+
+    def report(self, name: str, **params) -> List[Dict[str, Any]]:
+        """Return a report from the aggregates, cached until the next refresh"""
+        key = (name, tuple(sorted(params.items())))
+        with self._lock:
+            rows = self._cache.get(key)
+        if rows is not None:
+            return rows
+        with self._connection() as connection:
+            rows = fetch_rows(connection, REPORT_SQL[name], params)
+            connection.rollback()
+        with self._lock:
+            self._cache[key] = rows
+        return rows
+
+    def grounding_text(self, message: str) -> str:
+        """Aggregate snapshot to add to the prompt for analytical questions"""
+        if not ANALYTICS_GROUNDING or not self.grounding:
+            return ""
+        if not _GROUNDING_KEYWORDS.search(message):
+            return ""
+        return self.grounding
+
+    def _build_grounding(self) -> str:
+        try:
+            payments = self.report("payment_methods")
+            products = self.report("top_products", limit=5)
+            demographics = self.report("demographics")
+            months = self.report("revenue_by_category_month", year=None)
+        except Exception as e:
+            print(f"Analytics grounding error: {e}")
+            return ""
+
+        category_totals: Dict[str, float] = {}
+        for row in months:
+            category_totals[row["category_name"]] = category_totals.get(row["category_name"], 0.0) + row["revenue"]
+
+        lines = ["LIVE ANALYTICS SNAPSHOT (precomputed from the database; prefer these figures):"]
+        if category_totals:
+            ranked = sorted(category_totals.items(), key=lambda item: item[1], reverse=True)
+            lines.append("- Revenue by category: " + ", ".join(f"{name} {revenue:,.2f}" for name, revenue in ranked))
+        if payments:
+            lines.append("- Payment methods (transactions, share): " + ", ".join(
+                f"{row['payment_method']} {row['transactions']} ({row['share_pct']}%)" for row in payments))
+        if products:
+            lines.append("- Top products by revenue: " + ", ".join(
+                f"{row['product_name'] or row['product_id']} {row['revenue']:,.2f}" for row in products))
+        if demographics:
+            lines.append("- Transactions by gender/age band: " + ", ".join(
+                f"{row['gender']} {row['age_band']}: {row['transactions']}" for row in demographics))
+        return "\n".join(lines) + "\n" if len(lines) > 1 else ""
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "refreshes": self.refreshes,
+            "last_refresh": self.last_refresh,
+            "cached_reports": len(self._cache),
+            "refresh_interval_seconds": ANALYTICS_REFRESH_SECONDS,
+            "grounding_enabled": ANALYTICS_GROUNDING
+        }
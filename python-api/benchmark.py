@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for the chat API.
+
+Virtual users hit /chat, /chat/stream, /sessions and /health with a
+configurable mix, concurrency and number of sessions. By default the app
+runs in-process with the simulated model from fake_llm.py (configurable
+latency, token rate and failure rate), so runs are repeatable and need no
+API key. Pass --url to drive an already running server instead (start it
+with FAKE_LLM=true for the same simulated model).
+
+The report is JSON with throughput, p50/p95/p99 latency per endpoint, status
+and fallback counts, and process memory growth across the run.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import resource
+import contextlib
+from collections import defaultdict
+from typing import Dict, Any, List, Optional
+
+import httpx
+
+QUESTIONS = [
+    "What tables are in the database?",
+    "How are transactions related to customers?",
+    "Which product categories generate the most revenue?",
+    "Show me the payment method breakdown",
+    "What is the average order value by city?",
+    "Explain the transaction_details table",
+    "How many customers are there?",
+    "Which products sell best in {month}?",
+    "Compare revenue for {year} with the previous year",
+    "What did we discuss about {topic} earlier?",
+]
+TOPICS = ["refunds", "electronics", "customer age", "UPI payments", "stock levels"]
+MONTHS = ["January", "March", "June", "September", "November", "December"]
+
+def rss_bytes() -> int:
+    """Current resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # ru_maxrss is the peak, in KiB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(p * len(values)))], 2)
+
+def summarize(latencies: List[float]) -> Dict[str, Optional[float]]:
+    return {
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "max": round(max(latencies), 2) if latencies else None,
+        "mean": round(sum(latencies) / len(latencies), 2) if latencies else None
+    }
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """'chat=80,stream=10,sessions=5,health=5' -> weights"""
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ("chat", "stream", "sessions", "health"):
+            raise ValueError(f"Unknown operation in --mix: {name}")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+class Recorder:
+    """Latency samples and outcomes per operation"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.first_token: List[float] = []
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, op: str, started: float, status: Any):
+        self.latencies[op].append((time.perf_counter() - started) * 1000)
+        self.statuses[op][str(status)] += 1
+
+class Benchmark:
+    def __init__(self, client: httpx.AsyncClient, args):
+        self.client = client
+        self.args = args
+        self.weights = parse_mix(args.mix)
+        self.recorder = Recorder()
+        self.sent = 0
+        self._random = random.Random(args.seed)
+
+    def message(self, user: int, turn: int) -> str:
+        question = self._random.choice(QUESTIONS).format(
+            month=self._random.choice(MONTHS), year=self._random.choice([2023, 2024, 2025]),
+            topic=self._random.choice(TOPICS))
+        if self.args.unique_messages:
+            question += f" (user {user}, turn {turn})"
+        return question
+
+    def session_id(self, user: int) -> str:
+        return f"bench-{self.args.run_id}-{user % self.args.sessions}"
+
+    async def chat(self, user: int, turn: int):
+        started = time.perf_counter()
+        response = await self.client.post("/chat", json={"message": self.message(user, turn),
+                                                          "session_id": self.session_id(user)})
+        self.recorder.record("chat", started, response.status_code)
+
+    async def stream(self, user: int, turn: int):
+        started = time.perf_counter()
+        first = None
+        payload = {"message": self.message(user, turn), "session_id": self.session_id(user)}
+        async with self.client.stream("POST", "/chat/stream", json=payload) as response:
+            async for chunk in response.aiter_text():
+                if first is None and "event: token" in chunk:
+                    first = (time.perf_counter() - started) * 1000
+        if first is not None:
+            self.recorder.first_token.append(first)
+        self.recorder.record("stream", started, response.status_code)
+
+    async def sessions(self, user: int, turn: int):
+        started = time.perf_counter()
+        response = await self.client.get("/sessions")
+        self.recorder.record("sessions", started, response.status_code)
+
+    async def health(self, user: int, turn: int):
+        started = time.perf_counter()
+        response = await self.client.get("/health")
+        self.recorder.record("health", started, response.status_code)
+
+    async def user(self, user: int, deadline: float):
+        ops = list(self.weights)
+        weights = [self.weights[op] for op in ops]
+        rng = random.Random(f"{self.args.seed}:{user}")
+        turn = 0
+        while time.perf_counter() < deadline and (not self.args.requests or self.sent < self.args.requests):
+            self.sent += 1
+            turn += 1
+            op = rng.choices(ops, weights)[0]
+            try:
+                await getattr(self, op)(user, turn)
+            except Exception as e:
+                self.recorder.errors[f"{op}: {type(e).__name__}"] += 1
+            if self.args.think_ms:
+                await asyncio.sleep(rng.uniform(0, 2 * self.args.think_ms) / 1000)
+
+    async def run(self) -> Dict[str, Any]:
+        memory = {"start": rss_bytes(), "peak": rss_bytes()}
+
+        async def sample_memory():
+            while True:
+                await asyncio.sleep(0.5)
+                memory["peak"] = max(memory["peak"], rss_bytes())
+
+        sampler = asyncio.create_task(sample_memory())
+        started = time.perf_counter()
+        deadline = started + self.args.duration if self.args.duration else float("inf")
+        await asyncio.gather(*(self.user(user, deadline) for user in range(self.args.concurrency)))
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+        memory["end"] = rss_bytes()
+        memory["peak"] = max(memory["peak"], memory["end"])
+
+        health = await self.client.get("/health")
+        recorder = self.recorder
+        total = sum(len(samples) for samples in recorder.latencies.values())
+        return {
+            "config": {key: value for key, value in vars(self.args).items() if key != "output"},
+            "duration_seconds": round(elapsed, 3),
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2) if elapsed else None,
+            "endpoints": {
+                op: {
+                    "requests": len(samples),
+                    "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else None,
+                    "latency_ms": summarize(samples),
+                    "status_codes": dict(recorder.statuses[op]),
+                }
+                for op, samples in sorted(recorder.latencies.items())
+            },
+            "stream_first_token_ms": summarize(recorder.first_token) if recorder.first_token else None,
+            "client_errors": dict(recorder.errors),
+            "memory": {
+                "measured": "benchmark process (includes the in-process app)" if not self.args.url else "benchmark client only",
+                "rss_start_bytes": memory["start"],
+                "rss_end_bytes": memory["end"],
+                "rss_peak_bytes": memory["peak"],
+                "rss_growth_bytes": memory["end"] - memory["start"]
+            },
+            "server": health.json() if health.status_code == 200 else None
+        }
+
+async def run_in_process(args) -> Dict[str, Any]:
+    import main
+    from fake_llm import FakeChatNVIDIA
+    from resilience import ResilientLLM
+
+    await main.startup_event()
+    # Measure a warm worker, as a load balancer gating on /ready would
+    await main.startup.wait_ready()
+    fake = FakeChatNVIDIA(latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms,
+                          tokens_per_second=args.llm_tokens_per_second,
+                          response_tokens=args.llm_response_tokens,
+                          failure_rate=args.llm_failure_rate, seed=args.seed)
+    main.llm = ResilientLLM(fake)
+    transport = httpx.ASGITransport(app=main.app)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=args.timeout,
+                                     limits=limits) as client:
+            report = await Benchmark(client, args).run()
+        # Every injected failure is answered with the fallback response
+        report["fake_llm"] = {"calls": fake.calls, "injected_failures": fake.failures}
+        return report
+    finally:
+        await main.shutdown_event()
+
+async def run_against_url(args) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        return await Benchmark(client, args).run()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the chat API with a simulated LLM")
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--concurrency", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--sessions", type=int, default=50, help="distinct chat sessions shared by the users")
+    parser.add_argument("--duration", type=float, default=20, help="seconds to run (0 = until --requests)")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many requests (0 = no limit)")
+    parser.add_argument("--mix", default="chat=80,stream=10,sessions=5,health=5",
+                        help="operation weights: chat, stream, sessions, health")
+    parser.add_argument("--think-ms", type=float, default=0, help="mean pause between a user's requests")
+    parser.add_argument("--unique-messages", action="store_true", help="make every message unique (defeats the response cache)")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="simulated time to first token")
+    parser.add_argument("--llm-jitter-ms", type=float, default=100)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=60)
+    parser.add_argument("--llm-response-tokens", type=int, default=80)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0, help="fraction of LLM calls that raise")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args(argv)
+    if not args.duration and not args.requests:
+        parser.error("set --duration or --requests")
+    args.run_id = f"{int(time.time())}"
+
+    # Keep the app's log output out of the JSON report on stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        report = asyncio.run(run_against_url(args) if args.url else run_in_process(args))
+    text = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(text + "\n")
+    print(text)
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,496 @@
+"""
+Bulk ingestion through PostgreSQL COPY.
+
+Sources are CSV files named after their table (`customers.csv`,
+`transactions.csv.gz`, ... with a header row) or SQL dumps made of CREATE
+TABLE and INSERT ... VALUES statements such as store_transactions.session.sql.
+Rows are streamed to the server in batches of COPY data, one connection per
+table, with the tables loading in parallel. Foreign keys and secondary
+indexes on the target tables are dropped for the duration of the load and
+recreated afterwards, so each table loads independently and every index is
+built once instead of being maintained row by row.
+"""
+
+import os
+import io
+import re
+import gzip
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Iterator, Iterable, Optional, Tuple
+
+import psycopg2
+from psycopg2 import sql as pgsql
+
+# Loader configuration
+BULK_BATCH_ROWS = int(os.getenv("BULK_BATCH_ROWS", "50000"))
+BULK_WORKERS = int(os.getenv("BULK_WORKERS", "4"))
+
+_INSERT = re.compile(
+    r"^\s*INSERT\s+INTO\s+(?P<table>[\w.\"]+)\s*(?:\((?P<columns>[^)]*)\))?\s*VALUES\s*(?P<values>.*)$",
+    re.IGNORECASE | re.DOTALL
+)
+_NUMBER = re.compile(r"^[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?$")
+
+class UnsupportedValue(Exception):
+    """An INSERT value that is not a plain literal (expression, function call...)"""
+
+# ---------------------------------------------------------------------------
+# Sources
+
+def open_text(path: str):
+    """Open a plain or gzip-compressed text file"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+def table_name_for(path: str) -> str:
+    """customers.csv / customers.csv.gz / customers.part-0003.csv -> customers"""
+    name = os.path.basename(path)
+    return name.split(".", 1)[0]
+
+def csv_header(path: str) -> List[str]:
+    """Column names from the first line of a CSV file"""
+    with open_text(path) as handle:
+        return [column.strip().strip('"') for column in handle.readline().rstrip("\r\n").split(",")]
+
+def csv_batches(path: str, batch_rows: int = BULK_BATCH_ROWS) -> Iterator[Tuple[str, int]]:
+    """Yield (csv_text, row_count) batches of a CSV file without its header.
+
+    Records are split on line ends outside double quotes, so quoted fields
+    with embedded newlines stay intact.
+    """
+    with open_text(path) as handle:
+        handle.readline()  # header
+        lines: List[str] = []
+        rows = 0
+        in_quotes = False
+        for line in handle:
+            lines.append(line)
+            if line.count('"') % 2:
+                in_quotes = not in_quotes
+            if in_quotes:
+                continue
+            rows += 1
+            if rows >= batch_rows:
+                yield "".join(lines), rows
+                lines, rows = [], 0
+        if lines:
+            yield "".join(lines), rows
+
+def split_statements(handle: Iterable[str]) -> Iterator[str]:
+    """Yield SQL statements from a dump, splitting on semicolons outside quotes and comments"""
+    buffer: List[str] = []
+    in_string = False
+    for line in handle:
+        if not in_string and not buffer and line.lstrip().startswith("--"):
+            continue
+        start = 0
+        i = 0
+        while i < len(line):
+            char = line[i]
+            if in_string:
+                if char == "'":
+                    in_string = False
+            elif char == "'":
+                in_string = True
+            elif char == "-" and line.startswith("--", i):
+                buffer.append(line[start:i])
+                start = i = len(line)
+                buffer.append("\n")
+                break
+            elif char == ";":
+                buffer.append(line[start:i])
+                statement = "".join(buffer).strip()
+                if statement:
+                    yield statement
+                buffer = []
+                start = i + 1
+            i += 1
+        if start < len(line):
+            buffer.append(line[start:])
+    statement = "".join(buffer).strip()
+    if statement:
+        yield statement
+
+def parse_values(values: str) -> Iterator[List[Optional[str]]]:
+    """Parse the tuples of a VALUES clause into lists of literal strings (None for NULL)"""
+    i, length = 0, len(values)
+    while i < length:
+        while i < length and values[i] in " \t\r\n,":
+            i += 1
+        if i >= length:
+            return
+        if values[i] != "(":
+            raise UnsupportedValue(values[i:i + 20])
+        i += 1
+        row: List[Optional[str]] = []
+        while True:
+            while values[i] in " \t\r\n":
+                i += 1
+            if values[i] == "'":
+                j = i + 1
+                chunks = []
+                while True:
+                    k = values.index("'", j)
+                    chunks.append(values[j:k])
+                    if k + 1 < length and values[k + 1] == "'":
+                        chunks.append("'")
+                        j = k + 2
+                        continue
+                    i = k + 1
+                    break
+                row.append("".join(chunks))
+            else:
+                j = i
+                while values[j] not in ",)":
+                    j += 1
+                token = values[i:j].strip()
+                if token.upper() == "NULL":
+                    row.append(None)
+                elif _NUMBER.match(token) or token.upper() in ("TRUE", "FALSE"):
+                    row.append(token)
+                else:
+                    raise UnsupportedValue(token)
+                i = j
+            while values[i] in " \t\r\n":
+                i += 1
+            if values[i] == ",":
+                i += 1
+                continue
+            if values[i] == ")":
+                i += 1
+                break
+            raise UnsupportedValue(values[i:i + 20])
+        yield row
+
+def csv_line(row: List[Optional[str]]) -> str:
+    """Encode one row for COPY ... (FORMAT csv); unquoted empty fields are NULL"""
+    fields = []
+    for value in row:
+        if value is None:
+            fields.append("")
+        elif value == "" or any(c in value for c in ',"\r\n') or value != value.strip():
+            fields.append('"' + value.replace('"', '""') + '"')
+        else:
+            fields.append(value)
+    return ",".join(fields) + "\n"
+
+# ---------------------------------------------------------------------------
+# Deferred constraints and indexes
+
+def deferred_ddl(cursor, tables: List[str]) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str, str]]]:
+    """Secondary indexes (name, definition) and foreign keys (table, name, definition) on the tables"""
+    cursor.execute("""
+        SELECT i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        WHERE i.indrelid = ANY(%s::regclass[])
+          AND NOT i.indisprimary
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+    """, (tables,))
+    indexes = cursor.fetchall()
+    cursor.execute("""
+        SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE contype = 'f' AND conparentid = 0 AND (conrelid = ANY(%s::regclass[]) OR confrelid = ANY(%s::regclass[]))
+    """, (tables, tables))
+    foreign_keys = cursor.fetchall()
+    return indexes, foreign_keys
+
+def drop_deferred(connection, indexes, foreign_keys):
+    """Drop the foreign keys and secondary indexes found by deferred_ddl()"""
+    with connection.cursor() as cursor:
+        for table, name, _ in foreign_keys:
+            cursor.execute(f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS "{name}"')
+        for name, _ in indexes:
+            cursor.execute(f"DROP INDEX IF EXISTS {name}")
+    connection.commit()
+
+def restore_deferred(db_config: Dict[str, Any], indexes, foreign_keys, workers: int) -> float:
+    """Rebuild the dropped indexes in parallel, then re-add the foreign keys; returns seconds"""
+    started = time.perf_counter()
+
+    def run(statement: str):
+        connection = psycopg2.connect(**db_config)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(statement)
+            connection.commit()
+        finally:
+            connection.close()
+
+    # Indexes of a partitioned parent come back as "ON ONLY"; rebuild them on every partition
+    definitions = [definition.replace(" ON ONLY ", " ON ", 1) for _, definition in indexes]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        list(pool.map(run, definitions))
+    failures = []
+    for table, name, definition in foreign_keys:
+        try:
+            run(f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {definition}')
+        except psycopg2.Error as e:
+            failures.append(f"{table}.{name}: {str(e).strip()}")
+    if failures:
+        raise RuntimeError("Could not restore foreign keys after the load:\n" + "\n".join(failures))
+    return time.perf_counter() - started
+
+def reset_sequences(cursor, table: str):
+    """Move serial sequences past the ids loaded explicitly by COPY"""
+    cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s AND column_default LIKE 'nextval(%%'
+    """, (table,))
+    for (column,) in cursor.fetchall():
+        cursor.execute(pgsql.SQL(
+            "SELECT setval(pg_get_serial_sequence({table_name}, {column_name}), "
+            "COALESCE(MAX({column}), 1), MAX({column}) IS NOT NULL) FROM {table}"
+        ).format(
+            table_name=pgsql.Literal(table), column_name=pgsql.Literal(column),
+            column=pgsql.Identifier(column), table=pgsql.Identifier(table)
+        ))
+
+# ---------------------------------------------------------------------------
+# Loading
+
+class TableLoad:
+    """COPY a stream of CSV batches into one table on its own connection"""
+
+    def __init__(self, table: str, columns: Optional[List[str]], batches: Iterable[Tuple[str, int]]):
+        self.table = table
+        self.columns = columns
+        self.batches = batches
+        self.truncate = False
+        self.rows = 0
+        self.seconds = 0.0
+
+    def run(self, db_config: Dict[str, Any]) -> "TableLoad":
+        started = time.perf_counter()
+        connection = None
+        try:
+            connection = psycopg2.connect(**db_config)
+            with connection.cursor() as cursor:
+                target = pgsql.Identifier(self.table)
+                if self.columns:
+                    target = pgsql.SQL("{} ({})").format(
+                        target, pgsql.SQL(", ").join(pgsql.Identifier(c) for c in self.columns))
+                options = "FORMAT csv"
+                if self.truncate:
+                    cursor.execute(pgsql.SQL("TRUNCATE {}").format(pgsql.Identifier(self.table)))
+                    # Truncating in the same transaction lets COPY write frozen rows (not on partitioned tables)
+                    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (self.table,))
+                    if cursor.fetchone()[0] != "p":
+                        options += ", FREEZE"
+                copy = pgsql.SQL("COPY {} FROM STDIN WITH ({})").format(target, pgsql.SQL(options)).as_string(cursor)
+                for text, rows in self.batches:
+                    cursor.copy_expert(copy, io.StringIO(text))
+                    self.rows += rows
+                reset_sequences(cursor, self.table)
+            connection.commit()
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(pgsql.SQL("ANALYZE {}").format(pgsql.Identifier(self.table)))
+        except BaseException:
+            if isinstance(self.batches, QueueBatches):
+                self.batches.drain()  # keep the dump parser from blocking on this table
+            raise
+        finally:
+            if connection is not None:
+                connection.close()  # rolls back whatever was not committed
+        self.seconds = time.perf_counter() - started
+        return self
+
+class QueueBatches:
+    """Iterable of batches fed by another thread (used for SQL dumps)"""
+
+    _END = object()
+
+    def __init__(self, depth: int = 4):
+        self._queue: "queue.Queue" = queue.Queue(maxsize=depth)
+        self._ended = False
+
+    def put(self, batch: Tuple[str, int]):
+        self._queue.put(batch)
+
+    def close(self):
+        self._queue.put(self._END)
+
+    def drain(self):
+        """Discard the remaining batches; returns at once if the end was already read"""
+        for _ in self:
+            pass
+
+    def __iter__(self):
+        while not self._ended:
+            batch = self._queue.get()
+            if batch is self._END:
+                self._ended = True
+                return
+            yield batch
+
+def unquote(identifier: str) -> str:
+    """Table/column name as PostgreSQL stores it"""
+    identifier = identifier.strip()
+    return identifier[1:-1].replace('""', '"') if identifier.startswith('"') else identifier.lower()
+
+class DumpFeeder(threading.Thread):
+    """Parses INSERT statements from a dump and feeds COPY batches per table"""
+
+    def __init__(self, path: str, streams: Dict[str, QueueBatches], batch_rows: int):
+        super().__init__(daemon=True)
+        self.path = path
+        self.streams = streams
+        self.batch_rows = batch_rows
+        self.error: Optional[BaseException] = None
+
+    def run(self):
+        pending: Dict[str, Tuple[List[str], int]] = {}
+        try:
+            with open_text(self.path) as handle:
+                for statement in split_statements(handle):
+                    match = _INSERT.match(statement)
+                    if not match:
+                        continue
+                    table = unquote(match.group("table"))
+                    lines, rows = pending.get(table, ([], 0))
+                    for row in parse_values(match.group("values")):
+                        lines.append(csv_line(row))
+                        rows += 1
+                    if rows >= self.batch_rows:
+                        self.streams[table].put(("".join(lines), rows))
+                        lines, rows = [], 0
+                    pending[table] = (lines, rows)
+            for table, (lines, rows) in pending.items():
+                if rows:
+                    self.streams[table].put(("".join(lines), rows))
+        except BaseException as e:
+            self.error = e
+        finally:
+            for stream in self.streams.values():
+                stream.close()
+
+def dump_loader(path: str, batch_rows: int) -> Tuple[List[TableLoad], DumpFeeder]:
+    """One TableLoad per table in the dump, fed by a single parser thread.
+
+    Each table's INSERTs must name the same column list (as pg_dump and the
+    project's dumps do); it is read from the first INSERT for the table.
+    """
+    columns: Dict[str, Optional[List[str]]] = {}
+    with open_text(path) as handle:
+        for line in handle:
+            match = _INSERT.match(line)
+            if match:
+                table = unquote(match.group("table"))
+                if table not in columns:
+                    listed = match.group("columns")
+                    columns[table] = [unquote(c) for c in listed.split(",")] if listed else None
+    streams = {table: QueueBatches() for table in columns}
+    loads = [TableLoad(table, columns[table], streams[table]) for table in columns]
+    return loads, DumpFeeder(path, streams, batch_rows)
+
+def run_dump_ddl(connection, path: str):
+    """Execute the CREATE statements of a dump, skipping objects that already exist"""
+    with open_text(path) as handle, connection.cursor() as cursor:
+        for statement in split_statements(handle):
+            if re.match(r"^\s*CREATE\s", statement, re.IGNORECASE):
+                try:
+                    cursor.execute(statement)
+                except (psycopg2.errors.DuplicateTable, psycopg2.errors.DuplicateObject):
+                    pass
+
+def bulk_load(db_config: Dict[str, Any], paths: List[str], truncate: bool = False,
+              workers: int = BULK_WORKERS, batch_rows: int = BULK_BATCH_ROWS) -> Dict[str, Any]:
+    """Load CSV files and/or SQL dumps; returns per-table rows, seconds and rows/sec"""
+    started = time.perf_counter()
+    files: List[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                if name.endswith((".csv", ".csv.gz", ".sql"))))
+        else:
+            files.append(path)
+
+    # Several CSV parts of one table are loaded one after another by the same worker
+    grouped: Dict[str, List[str]] = {}
+    for path in files:
+        if not path.endswith(".sql"):
+            grouped.setdefault(table_name_for(path), []).append(path)
+
+    def chained(parts: List[str]) -> Iterator[Tuple[str, int]]:
+        for part in parts:
+            yield from csv_batches(part, batch_rows)
+
+    csv_loads = [TableLoad(table, csv_header(parts[0]), chained(parts)) for table, parts in grouped.items()]
+    dump_loads: List[TableLoad] = []
+    feeders: List[DumpFeeder] = []
+    for dump in (path for path in files if path.endswith(".sql")):
+        loads, feeder = dump_loader(dump, batch_rows)
+        dump_loads.extend(loads)
+        feeders.append(feeder)
+    loads = csv_loads + dump_loads
+    tables = sorted({load.table for load in loads})
+
+    control = psycopg2.connect(**db_config)
+    control.autocommit = True
+    try:
+        for feeder in feeders:
+            run_dump_ddl(control, feeder.path)
+        with control.cursor() as cursor:
+            indexes, foreign_keys = deferred_ddl(cursor, tables) if tables else ([], [])
+        drop_deferred(control, indexes, foreign_keys)
+        print(f"⏸️  Deferred {len(indexes)} indexes and {len(foreign_keys)} foreign keys")
+
+        try:
+            if truncate:
+                counts: Dict[str, int] = {}
+                for load in loads:
+                    counts[load.table] = counts.get(load.table, 0) + 1
+                for load in loads:
+                    load.truncate = counts[load.table] == 1
+                shared = [table for table, count in counts.items() if count > 1]
+                if shared:
+                    with control.cursor() as cursor:
+                        cursor.execute(pgsql.SQL("TRUNCATE {}").format(
+                            pgsql.SQL(", ").join(pgsql.Identifier(t) for t in shared)))
+
+            # Dump-fed loads all run at once (one parser feeds them); CSV loads share the worker pool
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as csv_pool, \
+                    ThreadPoolExecutor(max_workers=max(1, len(dump_loads))) as dump_pool:
+                futures = [csv_pool.submit(load.run, db_config) for load in csv_loads]
+                futures += [dump_pool.submit(load.run, db_config) for load in dump_loads]
+                for feeder in feeders:
+                    feeder.start()
+                for future in futures:
+                    future.result()
+            for feeder in feeders:
+                feeder.join()
+                if feeder.error:
+                    raise feeder.error
+        except BaseException:
+            # Put the indexes and keys back, without letting a failure there hide why the load failed
+            try:
+                restore_deferred(db_config, indexes, foreign_keys, workers)
+            except Exception as e:
+                print(f"⚠️ Could not restore the deferred indexes and foreign keys: {e}")
+            raise
+        restore_seconds = restore_deferred(db_config, indexes, foreign_keys, workers)
+    finally:
+        control.close()
+
+    total_seconds = time.perf_counter() - started
+    per_table: Dict[str, Dict[str, Any]] = {}
+    for load in loads:
+        entry = per_table.setdefault(load.table, {"rows": 0, "seconds": 0.0})
+        entry["rows"] += load.rows
+        entry["seconds"] = max(entry["seconds"], load.seconds)
+    for entry in per_table.values():
+        entry["rows_per_sec"] = round(entry["rows"] / entry["seconds"]) if entry["seconds"] else None
+        entry["seconds"] = round(entry["seconds"], 3)
+    total_rows = sum(entry["rows"] for entry in per_table.values())
+    return {
+        "tables": per_table,
+        "rows": total_rows,
+        "seconds": round(total_seconds, 3),
+        "rows_per_sec": round(total_rows / total_seconds) if total_seconds else None,
+        "index_rebuild_seconds": round(restore_seconds, 3)
+    }
@@ -0,0 +1,363 @@
+"""
+Optional in-process columnar engine for the sales data.
+
+The flat `sales` table and the transactions/transaction_details join are
+loaded into NumPy column arrays (strings dictionary-encoded, dates as
+datetime64[D]). Filter / group-by / aggregate requests are then answered
+with vectorized operations instead of a database round trip. Tables are
+rebuilt off to the side and swapped in atomically on reload().
+
+Requires numpy, imported on first use so it does not slow down API start;
+when it is not installed the engine reports itself as unavailable and the
+API keeps using the database.
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+np = None  # optional dependency, set by load_numpy()
+
+from sqlalchemy import text
+
+# Engine configuration
+COLUMNAR_ENGINE = os.getenv("COLUMNAR_ENGINE", "true").lower() == "true"
+COLUMNAR_RELOAD_SECONDS = float(os.getenv("COLUMNAR_RELOAD_SECONDS", "0"))  # 0 = only on demand
+COLUMNAR_FETCH_BATCH = int(os.getenv("COLUMNAR_FETCH_BATCH", "10000"))
+
+def load_numpy() -> bool:
+    """Import numpy on first use; False when it is not installed"""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+        np = numpy
+    return True
+
+# Source queries with column kinds: "int", "float", "date", "str"
+TABLE_SOURCES = {
+    "sales": (
+        """
+        SELECT "Transaction ID" AS transaction_id, date, "Customer ID" AS customer_id, gender, age,
+               "Product Category" AS category, quantity, "Price per Unit" AS price_per_unit,
+               "Total Amount" AS total_amount
+        FROM sales
+        """,
+        {
+            "transaction_id": "int", "date": "date", "customer_id": "str", "gender": "str", "age": "int",
+            "category": "str", "quantity": "int", "price_per_unit": "float", "total_amount": "float",
+        },
+    ),
+    "line_items": (
+        """
+        SELECT td.detail_id, td.transaction_id, CAST(t.transaction_date AS DATE) AS transaction_date,
+               t.payment_method, t.status, CAST(t.customer_id AS VARCHAR) AS customer_id,
+               cu.gender, cu.age, cu.city, td.product_id, p.product_name, c.category_name,
+               td.quantity, td.unit_price, td.line_total
+        FROM transaction_details td
+        JOIN transactions t ON t.transaction_id = td.transaction_id
+        LEFT JOIN products p ON p.product_id = td.product_id
+        LEFT JOIN categories c ON c.category_id = p.category_id
+        LEFT JOIN customers cu ON cu.customer_id = t.customer_id
+        """,
+        {
+            "detail_id": "int", "transaction_id": "int", "transaction_date": "date", "payment_method": "str",
+            "status": "str", "customer_id": "str", "gender": "str", "age": "int", "city": "str",
+            "product_id": "int", "product_name": "str", "category_name": "str",
+            "quantity": "int", "unit_price": "float", "line_total": "float",
+        },
+    ),
+}
+
+AGGREGATES = ("count", "sum", "mean", "min", "max")
+DATE_PARTS = ("year", "month", "day")
+
+class ColumnarQueryError(Exception):
+    """Raised for an invalid columnar query (unknown table, column, operator...)"""
+
+class Column:
+    """One column: a values array, plus the dictionary for string columns"""
+
+    __slots__ = ("kind", "values", "dictionary", "_lookup")
+
+    def __init__(self, kind: str, values, dictionary: Optional[List[str]] = None):
+        self.kind = kind
+        self.values = values
+        self.dictionary = dictionary
+        self._lookup = {value: code for code, value in enumerate(dictionary)} if dictionary is not None else None
+
+    def code(self, value: Any) -> int:
+        """Dictionary code for a string value (-2 when absent, so comparisons match nothing)"""
+        return self._lookup.get(None if value is None else str(value), -2)
+
+    def decode(self, values) -> List[Any]:
+        if self.kind == "str":
+            return [self.dictionary[code] if code >= 0 else None for code in values.tolist()]
+        if self.kind == "date":
+            return [None if np.isnat(v) else str(v) for v in values]
+        return values.tolist()
+
+    @property
+    def nbytes(self) -> int:
+        size = self.values.nbytes
+        if self.dictionary is not None:
+            size += sum(len(value) for value in self.dictionary if value) + 8 * len(self.dictionary)
+        return size
+
+def build_column(kind: str, raw: List[Any]) -> Column:
+    """Convert a list of Python values into a typed column"""
+    if kind == "str":
+        dictionary: List[str] = []
+        lookup: Dict[str, int] = {}
+        codes = np.empty(len(raw), dtype=np.int32)
+        for i, value in enumerate(raw):
+            if value is None:
+                codes[i] = -1
+                continue
+            value = str(value)
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(dictionary)
+                dictionary.append(value)
+            codes[i] = code
+        return Column(kind, codes, dictionary)
+    if kind == "date":
+        return Column(kind, np.array([v if v is not None else "NaT" for v in raw], dtype="datetime64[D]"))
+    if kind == "int":
+        if any(v is None for v in raw):
+            return Column("float", np.array([np.nan if v is None else v for v in raw], dtype=np.float64))
+        return Column(kind, np.array(raw, dtype=np.int64))
+    return Column(kind, np.array([np.nan if v is None else float(v) for v in raw], dtype=np.float64))
+
+class ColumnTable:
+    __slots__ = ("name", "columns", "rows", "loaded_at", "load_ms")
+
+    def __init__(self, name: str, columns: Dict[str, Column], rows: int, load_ms: float):
+        self.name = name
+        self.columns = columns
+        self.rows = rows
+        self.loaded_at = time.time()
+        self.load_ms = load_ms
+
+    def column(self, name: str) -> Column:
+        if name not in self.columns:
+            raise ColumnarQueryError(f"Unknown column '{name}' in table '{self.name}'")
+        return self.columns[name]
+
+class ColumnarEngine:
+    """Holds column tables in memory and answers aggregate queries over them"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.tables: Dict[str, ColumnTable] = {}
+        self._reload_lock = threading.Lock()
+        self.queries = 0
+        self.reloads = 0
+        self.load_errors: Dict[str, str] = {}  # table -> why its last reload failed
+
+    @staticmethod
+    def available() -> bool:
+        return COLUMNAR_ENGINE and load_numpy()
+
+    def reload(self) -> Dict[str, Any]:
+        """Reload every source table from the database and swap them in.
+
+        A table that fails to load keeps its previous copy (if any); the
+        failure is listed under load_errors in the report.
+        """
+        with self._reload_lock:
+            tables = {}
+            errors = {}
+            for name, (sql, kinds) in TABLE_SOURCES.items():
+                try:
+                    tables[name] = self._load_table(name, sql, kinds)
+                except Exception as e:
+                    errors[name] = str(e)
+                    if name in self.tables:
+                        tables[name] = self.tables[name]
+                    print(f"Columnar load of '{name}' failed{', keeping the previous copy' if name in tables else ''}: {e}")
+            self.tables = tables
+            self.load_errors = errors
+            self.reloads += 1
+            return self.memory_report()
+
+    def _load_table(self, name: str, sql: str, kinds: Dict[str, str]) -> ColumnTable:
+        started = time.perf_counter()
+        raw: Dict[str, List[Any]] = {column: [] for column in kinds}
+        names = list(kinds)
+        with self.engine.connect() as connection:
+            result = connection.execution_options(stream_results=True).execute(text(sql))
+            for partition in result.partitions(COLUMNAR_FETCH_BATCH):
+                for row in partition:
+                    for column, value in zip(names, row):
+                        raw[column].append(value)
+        columns = {column: build_column(kinds[column], raw.pop(column)) for column in names}
+        rows = len(next(iter(columns.values())).values) if columns else 0
+        return ColumnTable(name, columns, rows, (time.perf_counter() - started) * 1000)
+
+    def memory_report(self) -> Dict[str, Any]:
+        """Rows and bytes held per table and column"""
+        tables = {}
+        total = 0
+        for name, table in self.tables.items():
+            column_bytes = {column: col.nbytes for column, col in table.columns.items()}
+            table_bytes = sum(column_bytes.values())
+            total += table_bytes
+            tables[name] = {
+                "rows": table.rows,
+                "bytes": table_bytes,
+                "columns": column_bytes,
+                "loaded_at": table.loaded_at,
+                "load_ms": round(table.load_ms, 2)
+            }
+        return {"tables": tables, "total_bytes": total, "reloads": self.reloads, "queries": self.queries,
+                "load_errors": dict(self.load_errors)}
+
+    def query(self, table: str, filters: Optional[List[Dict[str, Any]]] = None,
+              group_by: Optional[List[str]] = None, aggregates: Optional[List[Dict[str, str]]] = None,
+              order_by: Optional[str] = None, descending: bool = True, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Filter, group and aggregate one table.
+
+        filters: [{"column", "op" (eq ne lt le gt ge in between), "value"}]
+        group_by: column names, or "<date column>:year|month|day"
+        aggregates: [{"fn" (count sum mean min max), "column"}]
+        """
+        started = time.perf_counter()
+        source = self.tables.get(table)
+        if source is None:
+            raise ColumnarQueryError(f"Table '{table}' is not loaded (available: {', '.join(self.tables) or 'none'})")
+        aggregates = aggregates or [{"fn": "count"}]
+
+        mask = np.ones(source.rows, dtype=bool)
+        for condition in filters or []:
+            mask &= self._filter_mask(source, condition)
+        selected = np.flatnonzero(mask)
+
+        group_specs = [self._group_key(source, spec) for spec in (group_by or [])]
+        if group_specs:
+            key_arrays = [values[selected] for _, values, _ in group_specs]
+            stacked = np.stack(key_arrays, axis=1) if len(key_arrays) > 1 else key_arrays[0].reshape(-1, 1)
+            unique_keys, inverse = np.unique(stacked, axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            group_count = len(unique_keys)
+        else:
+            unique_keys = np.empty((1, 0))
+            inverse = np.zeros(len(selected), dtype=np.int64)
+            group_count = 1
+
+        result_columns: Dict[str, List[Any]] = {}
+        for position, (name, _, decode) in enumerate(group_specs):
+            result_columns[name] = decode(unique_keys[:, position])
+        for spec in aggregates:
+            fn = spec.get("fn", "count")
+            if fn not in AGGREGATES:
+                raise ColumnarQueryError(f"Unknown aggregate '{fn}'")
+            column_name = spec.get("column")
+            label = f"{fn}_{column_name}" if column_name else fn
+            result_columns[label] = self._aggregate(source, fn, column_name, selected, inverse, group_count)
+
+        labels = list(result_columns)
+        rows = [dict(zip(labels, values)) for values in zip(*result_columns.values())]
+        if order_by:
+            if order_by not in result_columns:
+                raise ColumnarQueryError(f"Cannot order by '{order_by}' (choose from {', '.join(labels)})")
+            rows.sort(key=lambda row: (row[order_by] is None, row[order_by]), reverse=descending)
+        if limit is not None:
+            if limit < 1:
+                raise ColumnarQueryError(f"limit must be at least 1, got {limit}")
+            rows = rows[:limit]
+
+        self.queries += 1
+        return {
+            "table": table,
+            "rows": rows,
+            "matched_rows": int(len(selected)),
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3)
+        }
+
+    def _filter_mask(self, table: ColumnTable, condition: Dict[str, Any]):
+        name = condition.get("column", "")
+        column = table.column(name)
+        op = condition.get("op", "eq")
+        value = condition.get("value")
+        values = column.values
+        comparisons = {
+            "eq": np.equal, "ne": np.not_equal, "lt": np.less,
+            "le": np.less_equal, "gt": np.greater, "ge": np.greater_equal,
+        }
+        if op not in comparisons and op not in ("in", "between"):
+            raise ColumnarQueryError(f"Unknown operator '{op}'")
+        if column.kind == "str" and op not in ("eq", "ne", "in"):
+            # Dictionary codes follow first appearance, not text order
+            raise ColumnarQueryError(f"Operator '{op}' is not supported on text column '{name}'")
+
+        def convert(v):
+            if column.kind == "str":
+                return column.code(v)
+            if column.kind == "date":
+                if isinstance(v, str):
+                    try:
+                        return np.datetime64(v, "D")
+                    except ValueError:
+                        pass
+                raise ColumnarQueryError(f"Column '{name}' needs a date (YYYY-MM-DD), got {v!r}")
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                return v
+            raise ColumnarQueryError(f"Column '{name}' needs a number, got {v!r}")
+
+        if op == "in":
+            if not isinstance(value, list):
+                raise ColumnarQueryError(f"Operator 'in' needs a list of values for column '{name}'")
+            return np.isin(values, [convert(v) for v in value])
+        if op == "between":
+            if not isinstance(value, list) or len(value) != 2:
+                raise ColumnarQueryError(f"Operator 'between' needs a [low, high] pair for column '{name}'")
+            low, high = value
+            return (values >= convert(low)) & (values <= convert(high))
+        return comparisons[op](values, convert(value))
+
+    def _group_key(self, table: ColumnTable, spec: str) -> Tuple[str, Any, Any]:
+        name, _, part = spec.partition(":")
+        column = table.column(name)
+        if part:
+            if column.kind != "date" or part not in DATE_PARTS:
+                raise ColumnarQueryError(f"Invalid date grouping '{spec}'")
+            unit = {"year": "Y", "month": "M", "day": "D"}[part]
+            truncated = column.values.astype(f"datetime64[{unit}]")
+            return spec, truncated.astype(np.int64), lambda keys, unit=unit: [
+                str(np.datetime64(int(k), unit)) for k in keys]
+        if column.kind == "date":
+            return spec, column.values.astype(np.int64), lambda keys: [
+                str(np.datetime64(int(k), "D")) for k in keys]
+        if column.kind == "str":
+            return spec, column.values, lambda keys, column=column: column.decode(keys.astype(np.int32))
+        return spec, column.values, lambda keys: keys.tolist()
+
+    def _aggregate(self, table: ColumnTable, fn: str, column_name: Optional[str],
+                   selected, inverse, group_count: int) -> List[Any]:
+        if fn == "count" and not column_name:
+            return np.bincount(inverse, minlength=group_count).tolist()
+        column = table.column(column_name)
+        if column.kind in ("str", "date"):
+            if fn != "count":
+                raise ColumnarQueryError(f"Aggregate '{fn}' needs a numeric column")
+            present = column.values[selected] >= 0 if column.kind == "str" else ~np.isnat(column.values[selected])
+            return np.bincount(inverse, weights=present, minlength=group_count).astype(np.int64).tolist()
+        values = column.values[selected].astype(np.float64)
+        valid = ~np.isnan(values)
+        if fn == "count":
+            return np.bincount(inverse, weights=valid, minlength=group_count).astype(np.int64).tolist()
+        counts = np.bincount(inverse[valid], minlength=group_count)
+        if fn in ("sum", "mean"):
+            sums = np.bincount(inverse[valid], weights=values[valid], minlength=group_count)
+            if fn == "sum":
+                return [round(float(v), 4) for v in sums]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                means = sums / counts
+            return [None if c == 0 else round(float(m), 4) for m, c in zip(means, counts)]
+        out = np.full(group_count, np.inf if fn == "min" else -np.inf)
+        (np.minimum if fn == "min" else np.maximum).at(out, inverse[valid], values[valid])
+        return [None if c == 0 else float(v) for v, c in zip(out, counts)]
@@ -0,0 +1,168 @@
+"""
+Concurrency controls for the AI assistant: a bounded admission gate for
+upstream LLM calls, per-session locks that keep turns in order and
+single-flight coalescing of identical in-flight LLM calls
+"""
+
+import os
+import asyncio
+from dataclasses import dataclass
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Any
+
+# Gate configuration
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+LLM_SINGLE_FLIGHT = os.getenv("LLM_SINGLE_FLIGHT", "true").lower() == "true"
+
+class QueueFullError(Exception):
+    """Raised when an LLM call cannot be admitted (queue full or wait timed out)"""
+
+class LLMGate:
+    """Limits concurrent LLM calls and bounds the number of callers waiting for a slot"""
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    def check_capacity(self):
+        """Raise QueueFullError if a new caller would overflow the wait queue"""
+        if self.in_flight + self.waiting >= self.max_concurrency + self.max_queue:
+            self.rejected += 1
+            raise QueueFullError("LLM request queue is full")
+
+    async def acquire(self):
+        """Wait for an LLM slot, honouring the queue bound and timeout"""
+        self.check_capacity()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise QueueFullError("Timed out waiting for an LLM slot")
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+
+    async def try_acquire(self) -> bool:
+        """Take a free slot only if nobody is waiting for one (used for optional extra calls)"""
+        if self.waiting or self._semaphore.locked():
+            return False
+        await self._semaphore.acquire()
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        """Return an LLM slot to the pool"""
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold an LLM slot for the duration of the block"""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Current gate utilisation"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "rejected": self.rejected
+        }
+
+class SessionLocks:
+    """FIFO locks keyed by session_id so turns of one session never interleave"""
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._holders: Dict[str, int] = {}
+
+    @asynccontextmanager
+    async def hold(self, session_id: str):
+        """Serialize the block against other turns of the same session"""
+        lock = self._locks.get(session_id)
+        if lock is None:
+            lock = self._locks[session_id] = asyncio.Lock()
+        self._holders[session_id] = self._holders.get(session_id, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            # Drop the lock once nobody is holding or waiting on it
+            self._holders[session_id] -= 1
+            if self._holders[session_id] == 0:
+                del self._holders[session_id]
+                del self._locks[session_id]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+@dataclass
+class FlightResult:
+    value: Any
+    shared: bool   # True if another caller made the call
+    callers: int   # callers that received this result
+
+class _Flight:
+    __slots__ = ("task", "callers")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.callers = 0
+
+class SingleFlight:
+    """Concurrent callers with the same key share one in-flight call and its result (or error)"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._flights: Dict[str, _Flight] = {}
+        self.flights = 0
+        self.coalesced = 0
+
+    def _finished(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Mark the error as retrieved even if every caller has gone away
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    async def run(self, key: str, call: Callable[[], Awaitable[Any]]) -> FlightResult:
+        """Await call(), or the identical call another caller already started"""
+        if not self.enabled:
+            return FlightResult(await call(), False, 1)
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if flight is None:
+            # The call runs in its own task so one caller disconnecting does not cancel it for the rest
+            flight = self._flights[key] = _Flight(asyncio.ensure_future(call()))
+            flight.task.add_done_callback(lambda _: self._finished(key, flight))
+            self.flights += 1
+        else:
+            self.coalesced += 1
+        flight.callers += 1
+        value = await asyncio.shield(flight.task)
+        return FlightResult(value, shared, flight.callers)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._flights),
+            "flights": self.flights,
+            "coalesced": self.coalesced
+        }
+
+llm_gate = LLMGate(LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT)
+session_locks = SessionLocks()
+llm_flights = SingleFlight(LLM_SINGLE_FLIGHT)
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generator for scale testing the e-commerce schema.
+
+Writes categories, customers, products, transactions and transaction_details
+as CSV part files that `setup_database.py --load <dir> --truncate` loads
+directly. Output is fully determined by the seed and the sizes: every part
+file is produced from its own random stream, so the result is identical
+whatever the number of worker processes. Rows are written as they are
+generated, so memory stays flat from thousands to tens of millions of rows.
+
+Foreign keys always point at generated rows, line_total is quantity times
+the product price, and total_amount is the sum of the transaction's lines.
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import random
+import hashlib
+import argparse
+from datetime import datetime, timedelta, timezone
+from multiprocessing import Pool
+from typing import Dict, Any, List, Tuple
+
+# Generator configuration
+GENERATOR_CHUNK_ROWS = int(os.getenv("GENERATOR_CHUNK_ROWS", "250000"))
+MAX_LINES_PER_TRANSACTION = 5  # detail ids are (transaction_id - 1) * 5 + line number
+
+CATEGORIES = [
+    ("Electronics", "Electronic devices and gadgets", (15.0, 2500.0)),
+    ("Clothing", "Apparel and fashion items", (8.0, 250.0)),
+    ("Beauty", "Cosmetics and personal care", (4.0, 150.0)),
+    ("Home & Garden", "Home improvement and garden supplies", (5.0, 900.0)),
+    ("Sports", "Sports equipment and accessories", (10.0, 600.0)),
+]
+PRODUCT_NOUNS = {
+    "Electronics": ["Smartphone", "Laptop", "Headphones", "Tablet", "Smartwatch", "Monitor", "Speaker", "Camera"],
+    "Clothing": ["T-Shirt", "Jeans", "Jacket", "Sneakers", "Dress", "Hoodie", "Scarf", "Shorts"],
+    "Beauty": ["Face Cream", "Lipstick", "Perfume", "Shampoo", "Serum", "Sunscreen", "Mascara", "Lotion"],
+    "Home & Garden": ["Lamp", "Chair", "Planter", "Rug", "Cookware Set", "Hose", "Shelf", "Bedding"],
+    "Sports": ["Yoga Mat", "Dumbbells", "Football", "Tennis Racket", "Bicycle Helmet", "Running Shoes", "Tent", "Gloves"],
+}
+PRODUCT_ADJECTIVES = ["Classic", "Premium", "Eco", "Pro", "Compact", "Deluxe", "Essential", "Ultra", "Smart", "Vintage"]
+FIRST_NAMES = {
+    "Male": ["James", "John", "Robert", "Michael", "David", "Daniel", "Rahul", "Arjun", "Carlos", "Wei", "Omar", "Lucas"],
+    "Female": ["Mary", "Jennifer", "Linda", "Sarah", "Emily", "Priya", "Ananya", "Maria", "Mei", "Fatima", "Sofia", "Emma"],
+}
+LAST_NAMES = ["Smith", "Johnson", "Brown", "Garcia", "Miller", "Davis", "Wilson", "Patel", "Sharma", "Kumar",
+              "Nguyen", "Chen", "Khan", "Lopez", "Taylor", "Thomas", "Moore", "Martin", "Lee", "Walker"]
+CITIES = ["New York", "Los Angeles", "Chicago", "Houston", "Phoenix", "Philadelphia", "San Antonio", "San Diego",
+          "Dallas", "Austin", "Bengaluru", "Mumbai", "Delhi", "Chennai", "Hyderabad", "London", "Toronto", "Sydney"]
+STREETS = ["Main St", "Oak Ave", "Pine Rd", "Elm St", "Maple Dr", "Cedar Ln", "Park Ave", "Lake Rd", "Hill St", "MG Road"]
+PAYMENT_METHODS = (["Credit Card", "Debit Card", "UPI", "PayPal", "Cash", "Net Banking"], [34, 22, 18, 12, 8, 6])
+STATUSES = (["completed", "pending", "cancelled", "refunded"], [92, 4, 2, 2])
+# Relative order volume per month (holiday peak in November/December)
+MONTH_WEIGHTS = [0.85, 0.8, 0.9, 0.9, 0.95, 0.95, 1.0, 1.0, 0.95, 1.05, 1.35, 1.6]
+
+COLUMNS = {
+    "categories": ["category_id", "category_name", "description"],
+    "customers": ["customer_id", "first_name", "last_name", "email", "phone", "gender", "age", "address", "city",
+                  "registration_date"],
+    "products": ["product_id", "product_name", "category_id", "price", "stock_quantity", "description"],
+    "transactions": ["transaction_id", "customer_id", "transaction_date", "total_amount", "payment_method", "status"],
+    "transaction_details": ["detail_id", "transaction_id", "product_id", "quantity", "unit_price", "line_total"],
+}
+
+def stream_rng(seed: int, table: str, part: int) -> random.Random:
+    """Independent random stream per (seed, table, part)"""
+    digest = hashlib.blake2b(f"{seed}:{table}:{part}".encode(), digest_size=8).digest()
+    return random.Random(int.from_bytes(digest, "big"))
+
+def money(cents: int) -> str:
+    return f"{cents // 100}.{cents % 100:02d}"
+
+def csv_field(value: str) -> str:
+    if any(c in value for c in ',"\n'):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+def skewed(rng: random.Random, count: int, skew: float) -> int:
+    """1-based id where low ids are picked more often (skew 1.0 = uniform)"""
+    return int(count * rng.random() ** skew) + 1
+
+# ---------------------------------------------------------------------------
+# Row generators
+
+def product_catalog(seed: int, products: int) -> List[Tuple[int, str, int, int, int, str]]:
+    """All products as (id, name, category_id, price_cents, stock, description); small enough to keep in memory"""
+    rng = stream_rng(seed, "products", 0)
+    catalog = []
+    for product_id in range(1, products + 1):
+        category_id = rng.randint(1, len(CATEGORIES))
+        category, _, (low, high) = CATEGORIES[category_id - 1]
+        noun = rng.choice(PRODUCT_NOUNS[category])
+        name = f"{rng.choice(PRODUCT_ADJECTIVES)} {noun} {product_id}"
+        # Log-uniform prices: many cheap items, a few expensive ones
+        price = low * (high / low) ** rng.random()
+        price_cents = max(99, int(round(price * 100)) // 100 * 100 - 1)
+        catalog.append((product_id, name, category_id, price_cents, rng.randint(0, 500), f"{noun} in {category}"))
+    return catalog
+
+def customer_rows(seed: int, part: int, first_id: int, last_id: int, start: datetime, span_days: int):
+    rng = stream_rng(seed, "customers", part)
+    for customer_id in range(first_id, last_id + 1):
+        gender = "Female" if rng.random() < 0.51 else "Male"
+        first = rng.choice(FIRST_NAMES[gender])
+        last = rng.choice(LAST_NAMES)
+        age = min(80, max(18, int(rng.gauss(38, 12))))
+        registered = start + timedelta(days=rng.randrange(span_days), seconds=rng.randrange(86400))
+        yield [
+            str(customer_id), first, last, f"{first.lower()}.{last.lower()}.{customer_id}@example.com",
+            f"555-{rng.randrange(10000):04d}-{customer_id % 10000:04d}", gender, str(age),
+            f"{rng.randint(1, 9999)} {rng.choice(STREETS)}", rng.choice(CITIES), registered.isoformat()
+        ]
+
+def transaction_rows(seed: int, part: int, first_id: int, last_id: int, customers: int,
+                     prices: List[int], start: datetime, span_days: int):
+    """Yield (transaction_row, detail_rows) with totals computed from the lines"""
+    rng = stream_rng(seed, "transactions", part)
+    methods, method_weights = PAYMENT_METHODS
+    statuses, status_weights = STATUSES
+    products = len(prices)
+    for transaction_id in range(first_id, last_id + 1):
+        # Seasonal date: rejection-sample the day against its month's weight
+        while True:
+            day = start + timedelta(days=rng.randrange(span_days))
+            if rng.random() * 1.6 < MONTH_WEIGHTS[day.month - 1]:
+                break
+        when = day + timedelta(seconds=rng.randrange(8 * 3600, 23 * 3600))
+        lines = []
+        total = 0
+        line_count = min(MAX_LINES_PER_TRANSACTION, 1 + int(rng.expovariate(0.9)))
+        base_id = (transaction_id - 1) * MAX_LINES_PER_TRANSACTION
+        for line in range(1, line_count + 1):
+            product_id = skewed(rng, products, 1.8)
+            quantity = 1 + int(rng.expovariate(1.2)) % 4
+            unit = prices[product_id - 1]
+            line_total = unit * quantity
+            total += line_total
+            lines.append([str(base_id + line), str(transaction_id), str(product_id), str(quantity),
+                          money(unit), money(line_total)])
+        yield [
+            str(transaction_id), str(skewed(rng, customers, 1.5)), when.isoformat(), money(total),
+            rng.choices(methods, method_weights)[0], rng.choices(statuses, status_weights)[0]
+        ], lines
+
+# ---------------------------------------------------------------------------
+# Part files
+
+class PartWriter:
+    """Buffered CSV part file with a header row"""
+
+    def __init__(self, out_dir: str, table: str, part: int, compress: bool):
+        suffix = ".csv.gz" if compress else ".csv"
+        self.path = os.path.join(out_dir, f"{table}.part-{part:05d}{suffix}")
+        self.handle = gzip.open(self.path, "wt", encoding="utf-8", compresslevel=3) if compress \
+            else open(self.path, "w", encoding="utf-8", buffering=1 << 20)
+        self.handle.write(",".join(COLUMNS[table]) + "\n")
+        self.rows = 0
+
+    def write(self, row: List[str]):
+        self.handle.write(",".join(csv_field(value) for value in row) + "\n")
+        self.rows += 1
+
+    def close(self):
+        self.handle.close()
+
+_worker_prices: List[int] = []
+
+def init_worker(seed: int, products: int):
+    """Each worker rebuilds the product price list deterministically"""
+    global _worker_prices
+    _worker_prices = [product[3] for product in product_catalog(seed, products)]
+
+def generate_part(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Write one part file (or, for transactions, one pair of part files); returns row counts"""
+    started = time.perf_counter()
+    start = datetime.fromisoformat(task["start"]).replace(tzinfo=timezone.utc)
+    span_days = task["span_days"]
+    counts: Dict[str, int] = {}
+    if task["table"] == "customers":
+        writer = PartWriter(task["out_dir"], "customers", task["part"], task["compress"])
+        for row in customer_rows(task["seed"], task["part"], task["first_id"], task["last_id"], start, span_days):
+            writer.write(row)
+        writer.close()
+        counts["customers"] = writer.rows
+    else:
+        transactions = PartWriter(task["out_dir"], "transactions", task["part"], task["compress"])
+        details = PartWriter(task["out_dir"], "transaction_details", task["part"], task["compress"])
+        for transaction, lines in transaction_rows(task["seed"], task["part"], task["first_id"], task["last_id"],
+                                                   task["customers"], _worker_prices, start, span_days):
+            transactions.write(transaction)
+            for line in lines:
+                details.write(line)
+        transactions.close()
+        details.close()
+        counts["transactions"] = transactions.rows
+        counts["transaction_details"] = details.rows
+    return {"table": task["table"], "part": task["part"], "rows": counts, "seconds": time.perf_counter() - started}
+
+def chunk_ranges(total: int, chunk_rows: int) -> List[Tuple[int, int]]:
+    return [(first, min(first + chunk_rows - 1, total)) for first in range(1, total + 1, chunk_rows)]
+
+def generate(out_dir: str, transactions: int, customers: int = None, products: int = None, seed: int = 42,
+             start: str = "2023-01-01", end: str = "2025-12-31", workers: int = None,
+             compress: bool = False, chunk_rows: int = GENERATOR_CHUNK_ROWS) -> Dict[str, Any]:
+    """Generate a dataset into out_dir; returns the manifest (also written as manifest.json)"""
+    started = time.perf_counter()
+    customers = customers or max(10, transactions // 8)
+    products = products or max(50, min(200000, transactions // 500))
+    first_day = datetime.fromisoformat(start)
+    span_days = (datetime.fromisoformat(end) - first_day).days + 1
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Small reference tables are written directly
+    categories = PartWriter(out_dir, "categories", 0, compress)
+    for category_id, (name, description, _) in enumerate(CATEGORIES, start=1):
+        categories.write([str(category_id), name, description])
+    categories.close()
+    catalog = PartWriter(out_dir, "products", 0, compress)
+    for product_id, name, category_id, price_cents, stock, description in product_catalog(seed, products):
+        catalog.write([str(product_id), name, str(category_id), money(price_cents), str(stock), description])
+    catalog.close()
+
+    common = {"out_dir": out_dir, "seed": seed, "start": first_day.date().isoformat(),
+              "span_days": span_days, "compress": compress, "customers": customers}
+    tasks = [dict(common, table="customers", part=part, first_id=first, last_id=last)
+             for part, (first, last) in enumerate(chunk_ranges(customers, chunk_rows))]
+    tasks += [dict(common, table="transactions", part=part, first_id=first, last_id=last)
+              for part, (first, last) in enumerate(chunk_ranges(transactions, chunk_rows))]
+
+    counts = {"categories": len(CATEGORIES), "products": products}
+    with Pool(processes=workers or os.cpu_count(), initializer=init_worker, initargs=(seed, products)) as pool:
+        for result in pool.imap_unordered(generate_part, tasks):
+            for table, rows in result["rows"].items():
+                counts[table] = counts.get(table, 0) + rows
+
+    seconds = time.perf_counter() - started
+    manifest = {
+        "seed": seed,
+        "start": start,
+        "end": end,
+        "chunk_rows": chunk_rows,
+        "rows": counts,
+        "seconds": round(seconds, 2),
+        "rows_per_sec": round(sum(counts.values()) / seconds) if seconds else None
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w") as handle:
+        json.dump(manifest, handle, indent=2)
+    return manifest
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic e-commerce dataset")
+    parser.add_argument("--out", default="generated-data", help="output directory for the CSV part files")
+    parser.add_argument("--transactions", type=int, default=100000, help="number of transactions")
+    parser.add_argument("--customers", type=int, help="number of customers (default: transactions / 8)")
+    parser.add_argument("--products", type=int, help="number of products (default: transactions / 500, min 50)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--start", default="2023-01-01", help="first transaction date")
+    parser.add_argument("--end", default="2025-12-31", help="last transaction date")
+    parser.add_argument("--workers", type=int, help="generator processes (default: CPU count)")
+    parser.add_argument("--compress", action="store_true", help="write .csv.gz parts")
+    parser.add_argument("--chunk-rows", type=int, default=GENERATOR_CHUNK_ROWS,
+                        help="rows per part file; changing it changes the generated data")
+    args = parser.parse_args(argv)
+
+    print(f"🧪 Generating {args.transactions:,} transactions into {args.out} (seed {args.seed})...")
+    manifest = generate(args.out, args.transactions, args.customers, args.products, args.seed,
+                        args.start, args.end, args.workers, args.compress, args.chunk_rows)
+    for table, rows in manifest["rows"].items():
+        print(f"   {table:<22} {rows:>12,} rows")
+    print(f"✅ Done in {manifest['seconds']:.1f}s ({manifest['rows_per_sec']:,} rows/s)")
+    print(f"📦 Load with: python setup_database.py --load {args.out} --truncate")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
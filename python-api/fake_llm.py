@@ -0,0 +1,93 @@
+"""
+Stand-in for ChatNVIDIA used in benchmarks and load tests.
+
+It answers with generated text after a configurable first-token latency,
+emits tokens at a configurable rate when streaming and fails a configurable
+fraction of calls, so the API can be load tested without an NVIDIA API key
+or network access. Set FAKE_LLM=true to have the API use it instead of
+ChatNVIDIA.
+"""
+
+import os
+import time
+import random
+import asyncio
+from typing import Iterator, AsyncIterator, Optional
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+# Fake model configuration
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "300"))
+FAKE_LLM_JITTER_MS = float(os.getenv("FAKE_LLM_JITTER_MS", "100"))
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "60"))
+FAKE_LLM_RESPONSE_TOKENS = int(os.getenv("FAKE_LLM_RESPONSE_TOKENS", "80"))
+FAKE_LLM_FAILURE_RATE = float(os.getenv("FAKE_LLM_FAILURE_RATE", "0"))
+
+_WORDS = ("the database stores customers products and transactions with categories so you can "
+          "join them by id to see revenue trends payment methods and demographics over time").split()
+
+class FakeLLMError(Exception):
+    """Injected failure, standing in for an API error or timeout"""
+
+class FakeChatNVIDIA:
+    """Implements the invoke/ainvoke/stream/astream calls the API makes on ChatNVIDIA"""
+
+    def __init__(self, latency_ms: float = FAKE_LLM_LATENCY_MS, jitter_ms: float = FAKE_LLM_JITTER_MS,
+                 tokens_per_second: float = FAKE_LLM_TOKENS_PER_SECOND,
+                 response_tokens: int = FAKE_LLM_RESPONSE_TOKENS,
+                 failure_rate: float = FAKE_LLM_FAILURE_RATE, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self.calls = 0
+        self.failures = 0
+
+    def _first_token_delay(self) -> float:
+        jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    def _token_delay(self) -> float:
+        return 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def _maybe_fail(self):
+        self.calls += 1
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            self.failures += 1
+            raise FakeLLMError("Injected LLM failure")
+
+    def _tokens(self, prompt_size: int):
+        start = prompt_size % len(_WORDS)
+        return [_WORDS[(start + i) % len(_WORDS)] + " " for i in range(self.response_tokens)]
+
+    @staticmethod
+    def _prompt_size(messages) -> int:
+        return sum(len(getattr(m, "content", str(m))) for m in messages) if isinstance(messages, list) else len(str(messages))
+
+    def invoke(self, messages, **kwargs) -> AIMessage:
+        self._maybe_fail()
+        time.sleep(self._first_token_delay() + self.response_tokens * self._token_delay())
+        return AIMessage(content="".join(self._tokens(self._prompt_size(messages))).strip())
+
+    async def ainvoke(self, messages, **kwargs) -> AIMessage:
+        self._maybe_fail()
+        await asyncio.sleep(self._first_token_delay() + self.response_tokens * self._token_delay())
+        return AIMessage(content="".join(self._tokens(self._prompt_size(messages))).strip())
+
+    def stream(self, messages, **kwargs) -> Iterator[AIMessageChunk]:
+        self._maybe_fail()
+        time.sleep(self._first_token_delay())
+        for token in self._tokens(self._prompt_size(messages)):
+            time.sleep(self._token_delay())
+            yield AIMessageChunk(content=token)
+
+    async def astream(self, messages, **kwargs) -> AsyncIterator[AIMessageChunk]:
+        self._maybe_fail()
+        await asyncio.sleep(self._first_token_delay())
+        delay = self._token_delay()
+        for token in self._tokens(self._prompt_size(messages)):
+            if delay:
+                await asyncio.sleep(delay)
+            yield AIMessageChunk(content=token)
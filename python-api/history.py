@@ -0,0 +1,117 @@
+"""
+Token-budgeted conversation history for prompt construction.
+
+Each session keeps a window of pre-rendered recent turns with their token
+counts. Appending a turn updates the window in place; when the window grows
+past its token budget the oldest turns are folded into a compact extractive
+summary, which is itself bounded. The window tracks its own memory footprint
+so the session store can count it against the byte budget.
+"""
+
+import os
+import re
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+# History configuration
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+HISTORY_SUMMARY_TOKEN_BUDGET = int(os.getenv("HISTORY_SUMMARY_TOKEN_BUDGET", "300"))
+HISTORY_MAX_TURN_TOKENS = int(os.getenv("HISTORY_MAX_TURN_TOKENS", "400"))
+
+# Approximate fixed cost of one window entry (tuple + str headers)
+ENTRY_OVERHEAD_BYTES = 120
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+_WHITESPACE = re.compile(r"\s+")
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return (len(text) + 3) // 4
+
+def clip(text: str, max_chars: int) -> str:
+    """Collapse whitespace and cut text to max_chars with an ellipsis"""
+    text = _WHITESPACE.sub(" ", text).strip()
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars - 1].rstrip() + "…"
+
+def first_sentence(text: str) -> str:
+    """Return the first sentence of a reply"""
+    return _SENTENCE_END.split(text.strip(), 1)[0]
+
+def entry_size(text: str) -> int:
+    return len(text.encode("utf-8")) + ENTRY_OVERHEAD_BYTES
+
+class HistoryWindow:
+    """Rendered recent turns plus a rolling summary of older ones, kept under a token budget"""
+
+    __slots__ = ("token_budget", "summary_budget", "turns", "turn_tokens",
+                 "summary", "summary_tokens", "omitted_turns", "entry_bytes", "_rendered")
+
+    def __init__(self, token_budget: int = HISTORY_TOKEN_BUDGET,
+                 summary_budget: int = HISTORY_SUMMARY_TOKEN_BUDGET):
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.turns: Deque[Tuple[str, str, str, int]] = deque()  # (user, assistant, rendered, tokens)
+        self.turn_tokens = 0
+        self.summary: Deque[Tuple[str, int]] = deque()  # (summary line, tokens)
+        self.summary_tokens = 0
+        self.omitted_turns = 0
+        self.entry_bytes = 0  # rendered turns and summary lines
+        self._rendered: Optional[str] = None
+
+    def append(self, user_message: str, assistant_message: str):
+        """Add a turn, folding the oldest turns into the summary when over budget"""
+        max_chars = HISTORY_MAX_TURN_TOKENS * 4
+        rendered = f"User: {clip(user_message, max_chars)}\nAssistant: {clip(assistant_message, max_chars)}\n"
+        tokens = estimate_tokens(rendered)
+        self.turns.append((user_message, assistant_message, rendered, tokens))
+        self.turn_tokens += tokens
+        self.entry_bytes += entry_size(rendered)
+        while self.turn_tokens > self.token_budget and len(self.turns) > 1:
+            self._fold_oldest()
+        self._rendered = None
+
+    def render(self) -> str:
+        """Return the history block for the prompt (cached until the next append)"""
+        if self._rendered is None:
+            parts = []
+            if self.summary or self.omitted_turns:
+                parts.append("Summary of earlier conversation:\n")
+                if self.omitted_turns:
+                    parts.append(f"- ({self.omitted_turns} earlier turns omitted)\n")
+                parts.extend(line for line, _ in self.summary)
+                parts.append("\n")
+            parts.extend(rendered for _, _, rendered, _ in self.turns)
+            self._rendered = "".join(parts)
+        return self._rendered
+
+    def fold_oldest(self):
+        """Fold the oldest recent turn into the summary now (the session store trimmed it)"""
+        if self.turns:
+            self._fold_oldest()
+            self._rendered = None
+
+    @property
+    def tokens(self) -> int:
+        return self.turn_tokens + self.summary_tokens
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held, counting the cached render() as a second copy of the entries"""
+        return 2 * self.entry_bytes
+
+    def _fold_oldest(self):
+        user_message, assistant_message, rendered, tokens = self.turns.popleft()
+        self.turn_tokens -= tokens
+        self.entry_bytes -= entry_size(rendered)
+        line = f"- User asked: {clip(user_message, 120)} | Assistant: {clip(first_sentence(assistant_message), 160)}\n"
+        line_tokens = estimate_tokens(line)
+        self.summary.append((line, line_tokens))
+        self.summary_tokens += line_tokens
+        self.entry_bytes += entry_size(line)
+        while self.summary_tokens > self.summary_budget and len(self.summary) > 1:
+            dropped, dropped_tokens = self.summary.popleft()
+            self.summary_tokens -= dropped_tokens
+            self.entry_bytes -= entry_size(dropped)
+            self.omitted_turns += 1
@@ -0,0 +1,423 @@
+"""
+Rule-based intent router that answers well-known questions without the LLM.
+
+Intents are declared in INTENT_RULES: each rule lists keyword groups that
+must all appear in the message, plus the other words it may contain. The
+table is compiled once into a phrase index, so routing a message is one
+pass over its tokens with a dictionary lookup per word and word pair, no
+matter how many rules there are. A match is confident only when every
+group matched and no content word is left unexplained: "how many customers
+are there" is answered from the database in milliseconds, while "how many
+customers in Chicago bought twice" still goes to the LLM.
+
+Rules with a handler fill a template from live data (aggregates from the
+analytics service when available, otherwise a direct query, cached for
+INTENT_DATA_TTL_SECONDS). Rules with only a reply are the canned answers
+served when the LLM is unavailable or fails.
+
+Run "python intent_router.py" for a routing micro-benchmark.
+"""
+
+import os
+import sys
+import time
+import json
+import argparse
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple, Callable
+
+from sqlalchemy import text
+
+from response_cache import normalize_message
+from schema_context import CONTEXT_TABLES, ROW_ESTIMATES_SQL
+
+# Intent router configuration
+INTENT_ROUTER = os.getenv("INTENT_ROUTER", "true").lower() == "true"
+INTENT_DATA_TTL_SECONDS = float(os.getenv("INTENT_DATA_TTL_SECONDS", "60"))
+INTENT_DB_RETRY_SECONDS = float(os.getenv("INTENT_DB_RETRY_SECONDS", "5"))  # doubles per failure, up to 60s
+INTENT_DB_MAX_RETRY_SECONDS = 60.0
+
+# Words that carry no intent of their own; every other word must be claimed by the rule
+STOPWORDS = frozenset("""
+    a an the of in on at to for by with from about and or is are was were be been there here
+    do does did we i you your us our my me it its this that these those please can could would will
+    tell show give list display get see know what which whats all any currently right now today
+    database db system store shop data hi hello hey thanks thank
+""".split())
+
+# Entity words for row counts; values are table names (never user input)
+COUNTED_TABLES = {
+    "customer": "customers", "customers": "customers", "client": "customers", "clients": "customers",
+    "product": "products", "products": "products", "item": "products", "items": "products",
+    "transaction": "transactions", "transactions": "transactions", "order": "transactions",
+    "orders": "transactions", "purchase": "transactions", "purchases": "transactions",
+    "category": "categories", "categories": "categories",
+    "line item": "transaction_details", "line items": "transaction_details",
+    "transaction details": "transaction_details", "order lines": "transaction_details",
+}
+
+@dataclass(frozen=True)
+class IntentRule:
+    """One intent: every group must match; vocabulary lists the other words it accepts"""
+    name: str
+    groups: Tuple[Tuple[str, ...], ...]
+    vocabulary: Tuple[str, ...] = ()
+    slots: Dict[str, str] = field(default_factory=dict)  # phrase -> slot value
+    handler: Optional[str] = None  # data template answered before the LLM
+    reply: Optional[str] = None  # canned answer for when the LLM is unavailable
+    max_slots: Optional[int] = None  # more distinct slot values than this is not confident
+    excluded: Tuple[str, ...] = ()  # words that make a match not confident
+
+@dataclass
+class IntentMatch:
+    rule: IntentRule
+    confident: bool
+    slots: Tuple[str, ...] = ()  # distinct slot values in message order
+
+GREETING_REPLY = """Hello! I'm your polite database assistant for this e-commerce system. I'm here to help you understand and analyze your database containing information about categories, products, customers, and transactions. How may I assist you today?"""
+
+CUSTOMERS_REPLY = """I'd be happy to help you with customer information! Our database contains comprehensive customer details including names, contact information, demographics, and registration dates. We have customers from major cities across the country. Would you like me to help you analyze customer data, demographics, or suggest specific queries for customer insights?"""
+
+PRODUCTS_REPLY = """I can certainly assist you with product and inventory analysis! Our product database includes items across multiple categories such as Electronics (smartphones, laptops, headphones), Clothing (t-shirts, jeans, shoes), Beauty products (cosmetics, personal care), and more. Each product has detailed information including pricing, stock quantities, and descriptions. What specific product information would you like to explore?"""
+
+SALES_REPLY = """I'm here to help you analyze sales and transaction data! Our comprehensive transaction records include payment methods (Credit Card, Debit Card, Cash, PayPal), transaction dates, amounts, and detailed line items. I can help you understand sales patterns, customer purchase behavior, and revenue trends. What specific sales insights would you like me to help you with?"""
+
+CATEGORIES_REPLY = """I'd be pleased to help you understand our product categories! Our database organizes products into well-defined categories: Electronics, Clothing, Beauty, Home & Garden, and Sports. Each category contains multiple products with detailed descriptions and relationships. Would you like to explore category-wise analysis or see how products are distributed across categories?"""
+
+DATABASE_REPLY = """I'm happy to explain our database structure! Our e-commerce database consists of 5 main tables: Categories, Products, Customers, Transactions, and Transaction Details. These tables are thoughtfully connected through foreign key relationships to maintain data integrity and enable comprehensive analysis. Would you like me to explain any specific table structure, relationships, or suggest ways to query the data?"""
+
+HELP_REPLY = """I'm here to provide friendly assistance with your e-commerce database! Here's how I can help you:
+
+• **Customer Analytics**: Analyze customer demographics, behavior, and registration patterns
+• **Product Management**: Explore inventory levels, product categories, and pricing insights
+• **Sales Analysis**: Examine transaction trends, revenue patterns, and payment preferences
+• **Database Structure**: Explain table relationships and suggest useful queries
+• **Data Insights**: Provide recommendations for business intelligence and reporting
+
+I remember our conversation context, so feel free to ask follow-up questions. What would you like to explore first?"""
+
+DEFAULT_REPLY = """Thank you for your message! I'm your helpful database assistant for this e-commerce system. I have comprehensive knowledge about your database schema including categories, products, customers, and transactions. I maintain conversation context and always strive to provide polite and informative responses.
+
+Could you please let me know what specific aspect of your database you'd like to explore? I'm here to help with data analysis, explanations, or any questions you might have!"""
+
+# Rules are tried in order; phrases are single words or word pairs of the normalized message
+INTENT_RULES: Tuple[IntentRule, ...] = (
+    # Answered from live data before the LLM
+    IntentRule(
+        name="list_tables",
+        groups=(("table", "tables"),),
+        vocabulary=("available", "exist", "existing", "name", "names", "have", "has", "contain",
+                    "contains", "main", "how many", "many", "how", "row", "rows", "size", "sizes"),
+        handler="tables"),
+    IntentRule(
+        name="row_count",
+        groups=(("how many", "count", "number of", "total number"), tuple(COUNTED_TABLES)),
+        vocabulary=("total", "overall", "altogether", "records", "rows", "table", "registered", "exist",
+                    "have", "has", "got", "stored", "number", "many", "how", "of"),
+        slots=COUNTED_TABLES,
+        # "How many customers have orders?" relates two tables; only the LLM can answer that
+        max_slots=1,
+        excluded=("with", "per", "without", "who", "whose", "that"),
+        handler="row_count"),
+    IntentRule(
+        name="category_breakdown",
+        groups=(("category", "categories", "category wise", "per category", "each category"),
+                ("revenue", "sales", "breakdown", "split", "distribution", "share", "performance",
+                 "compare", "comparison", "earnings", "income")),
+        vocabulary=("per", "each", "wise", "total", "overall", "product", "break", "down",
+                    "by", "how", "much", "made", "make", "earned", "units", "sold"),
+        handler="category_breakdown"),
+    IntentRule(
+        name="payment_breakdown",
+        groups=(("payment", "payments", "pay", "paid"),
+                ("method", "methods", "breakdown", "split", "distribution", "share", "mix",
+                 "popular", "common", "used", "type", "types", "options", "how")),
+        vocabulary=("method", "methods", "most", "least", "usage", "use", "used", "preferred",
+                    "transactions", "orders", "customers", "people", "by", "break", "down",
+                    "do", "does", "per", "each", "revenue", "type", "types"),
+        handler="payment_breakdown"),
+    # Canned replies for when the LLM is unavailable
+    IntentRule(name="greeting", groups=(("hello", "hi", "hey", "greetings"),), reply=GREETING_REPLY),
+    IntentRule(name="customers", groups=(("customer", "customers", "user", "users"),), reply=CUSTOMERS_REPLY),
+    IntentRule(name="products", groups=(("product", "products", "inventory", "stock"),), reply=PRODUCTS_REPLY),
+    IntentRule(name="sales", groups=(("sales", "transaction", "transactions", "revenue", "money"),),
+               reply=SALES_REPLY),
+    IntentRule(name="categories", groups=(("category", "categories"),), reply=CATEGORIES_REPLY),
+    IntentRule(name="database", groups=(("database", "schema", "table", "tables", "structure"),),
+               reply=DATABASE_REPLY),
+    IntentRule(name="help", groups=(("help", "what", "how", "can you"),), reply=HELP_REPLY),
+)
+
+class IntentRouter:
+    """Single-pass keyword matcher compiled from a rule table, with templated data answers"""
+
+    def __init__(self, rules: Tuple[IntentRule, ...] = INTENT_RULES, enabled: bool = INTENT_ROUTER,
+                 ttl_seconds: float = INTENT_DATA_TTL_SECONDS):
+        self.rules = rules
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        # phrase -> [(rule index, group index, -1 for vocabulary or -2 for excluded, slot value)]
+        self._index: Dict[str, List[Tuple[int, int, Optional[str]]]] = {}
+        self._full_masks = [(1 << len(rule.groups)) - 1 for rule in rules]
+        for rule_index, rule in enumerate(rules):
+            seen = set()
+            for group_index, group in enumerate(rule.groups):
+                for phrase in group:
+                    self._add(phrase, rule_index, group_index, rule.slots.get(phrase))
+                    seen.add(phrase)
+            for phrase in rule.vocabulary:
+                if phrase not in seen:
+                    self._add(phrase, rule_index, -1, None)
+            for phrase in rule.excluded:
+                self._add(phrase, rule_index, -2, None)
+        self._data: Dict[Tuple[str, Optional[str]], Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+        self.routed: Dict[str, int] = {}
+        self.passed = 0
+        self.errors = 0
+        # After a failed data query, data rules are skipped (the LLM answers) until retry_at
+        self.retry_at = 0.0
+        self._backoff = 0.0
+
+    def _add(self, phrase: str, rule_index: int, group_index: int, slot: Optional[str]):
+        words = phrase.split()
+        if len(words) > 2:
+            raise ValueError(f"Intent phrase {phrase!r} has more than two words")
+        self._index.setdefault(phrase, []).append((rule_index, group_index, slot))
+
+    def match(self, message: str) -> Optional[IntentMatch]:
+        """Best rule for a message: the first confident one, else the first whose groups all matched"""
+        tokens = normalize_message(message).split()
+        groups: Dict[int, int] = {}  # rule index -> bitmask of matched groups
+        covered: Dict[int, int] = {}  # rule index -> bitmask of claimed token positions
+        slots: Dict[int, Dict[int, str]] = {}  # rule index -> token position -> slot value
+        excluded = set()  # rule indexes with an excluded word present
+        content = 0
+        index = self._index
+        previous = None
+        for position, token in enumerate(tokens):
+            bit = 1 << position
+            if token not in STOPWORDS:
+                content |= bit
+            for phrase, claimed in ((token, bit), (f"{previous} {token}" if previous else None, bit | bit >> 1)):
+                hits = index.get(phrase) if phrase else None
+                if not hits:
+                    continue
+                for rule_index, group_index, slot in hits:
+                    if group_index == -2:
+                        excluded.add(rule_index)
+                        continue
+                    if group_index >= 0:
+                        groups[rule_index] = groups.get(rule_index, 0) | (1 << group_index)
+                    covered[rule_index] = covered.get(rule_index, 0) | claimed
+                    if slot is not None:
+                        # A word pair overrides what its words matched alone ("line items" vs "items")
+                        positions = slots.setdefault(rule_index, {})
+                        positions[position] = slot
+                        if claimed != bit:
+                            positions[position - 1] = slot
+            previous = token
+
+        best = None
+        for rule_index in sorted(groups):
+            if groups[rule_index] != self._full_masks[rule_index]:
+                continue
+            rule = self.rules[rule_index]
+            positions = slots.get(rule_index, {})
+            values = tuple(dict.fromkeys(positions[position] for position in sorted(positions)))
+            confident = (not content & ~covered[rule_index] and rule_index not in excluded
+                         and (rule.max_slots is None or len(values) <= rule.max_slots))
+            if confident:
+                return IntentMatch(rule, True, values)
+            if best is None:
+                best = IntentMatch(rule, False, values)
+        return best
+
+    def route(self, message: str) -> Optional[IntentMatch]:
+        """Confident data intent to answer without the LLM, or None to use the LLM"""
+        if not self.enabled:
+            return None
+        found = self.match(message)
+        if found is None or not found.confident or found.rule.handler is None:
+            self.passed += 1
+            return None
+        return found
+
+    def fallback_reply(self, message: str) -> str:
+        """Canned answer for the first reply rule whose keywords all appear in the message"""
+        tokens = normalize_message(message).split()
+        present = set(tokens)
+        present.update(f"{first} {second}" for first, second in zip(tokens, tokens[1:]))
+        for rule in self.rules:
+            if rule.reply is not None and all(present.intersection(group) for group in rule.groups):
+                return rule.reply
+        return DEFAULT_REPLY
+
+    def cached_answer(self, found: IntentMatch) -> Optional[str]:
+        """Answer from fresh cached data, or None when the handler has to query"""
+        with self._lock:
+            entry = self._data.get((found.rule.handler, found.slots))
+        if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+            return None
+        self._count(found)
+        return entry[1]
+
+    def answer(self, found: IntentMatch, engine, analytics=None) -> str:
+        """Fill the rule's template from the database (blocking; call from the threadpool)"""
+        try:
+            response = HANDLERS[found.rule.handler](engine, analytics, found.slots)
+        except Exception:
+            self.errors += 1
+            self._backoff = min(max(self._backoff * 2, INTENT_DB_RETRY_SECONDS), INTENT_DB_MAX_RETRY_SECONDS)
+            self.retry_at = time.monotonic() + self._backoff
+            raise
+        self._backoff = 0.0
+        with self._lock:
+            self._data[(found.rule.handler, found.slots)] = (time.monotonic(), response)
+        self._count(found)
+        return response
+
+    @property
+    def data_available(self) -> bool:
+        """False while backing off after a failed data query"""
+        return time.monotonic() >= self.retry_at
+
+    def _count(self, found: IntentMatch):
+        self.routed[found.rule.name] = self.routed.get(found.rule.name, 0) + 1
+
+    def invalidate(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "rules": len(self.rules),
+            "phrases": len(self._index),
+            "routed": dict(self.routed),
+            "passed_to_llm": self.passed,
+            "errors": self.errors,
+            "data_retry_in_seconds": round(max(self.retry_at - time.monotonic(), 0.0), 1),
+            "cached_answers": len(self._data),
+            "data_ttl_seconds": self.ttl_seconds
+        }
+
+def fetch(engine, sql: str) -> List[Tuple]:
+    with engine.connect() as connection:
+        return list(connection.execute(text(sql)))
+
+def answer_tables(engine, analytics, slots) -> str:
+    # Planner estimates keep this instant on large tables
+    rows = sorted(fetch(engine, ROW_ESTIMATES_SQL))
+    tables = [(name, estimate) for name, estimate in rows if name in CONTEXT_TABLES]
+    lines = [f"The database has {len(tables)} tables:"]
+    # No estimate before the first ANALYZE; leave the count out rather than guess
+    lines += [f"• **{name}** — about {estimate:,} rows" if estimate is not None else f"• **{name}**"
+              for name, estimate in tables]
+    lines.append("\nAsk me about any of them, for example how many rows one has or how it relates to the others.")
+    return "\n".join(lines)
+
+def answer_row_count(engine, analytics, tables) -> str:
+    table, = tables
+    count = fetch(engine, f"SELECT COUNT(*) FROM {table}")[0][0]
+    return f"There are **{count:,}** {'transaction line items' if table == 'transaction_details' else table} in the database."
+
+def answer_category_breakdown(engine, analytics, slots) -> str:
+    if analytics is not None:
+        totals: Dict[str, List[float]] = {}
+        for row in analytics.report("revenue_by_category_month", year=None):
+            total = totals.setdefault(row["category_name"], [0.0, 0])
+            total[0] += row["revenue"]
+            total[1] += row["units"]
+        rows = [(name, revenue, units) for name, (revenue, units) in totals.items()]
+    else:
+        rows = fetch(engine, """
+            SELECT COALESCE(c.category_name, 'Uncategorized'), SUM(td.line_total), SUM(td.quantity)
+            FROM transaction_details td
+            JOIN products p ON p.product_id = td.product_id
+            LEFT JOIN categories c ON c.category_id = p.category_id
+            GROUP BY 1
+        """)
+    rows = sorted(((name, float(revenue or 0), int(units or 0)) for name, revenue, units in rows),
+                  key=lambda row: row[1], reverse=True)
+    if not rows:
+        return "There are no sales recorded yet, so there is no category breakdown to show."
+    overall = sum(revenue for _, revenue, _ in rows) or 1.0
+    lines = ["Here is revenue by category across all sales:"]
+    lines += [f"• **{name}**: {revenue:,.2f} ({100 * revenue / overall:.1f}%), {units:,} units"
+              for name, revenue, units in rows]
+    return "\n".join(lines)
+
+def answer_payment_breakdown(engine, analytics, slots) -> str:
+    if analytics is not None:
+        rows = [(row["payment_method"], row["transactions"], row["revenue"])
+                for row in analytics.report("payment_methods")]
+    else:
+        rows = fetch(engine, """
+            SELECT COALESCE(payment_method, 'Unknown'), COUNT(*), SUM(total_amount)
+            FROM transactions
+            GROUP BY 1
+        """)
+    rows = sorted(((method, int(count or 0), float(revenue or 0)) for method, count, revenue in rows),
+                  key=lambda row: row[1], reverse=True)
+    if not rows:
+        return "There are no transactions recorded yet, so there is no payment method breakdown to show."
+    overall = sum(count for _, count, _ in rows) or 1
+    lines = ["Here is how customers pay, by number of transactions:"]
+    lines += [f"• **{method}**: {count:,} transactions ({100 * count / overall:.1f}%), {revenue:,.2f} revenue"
+              for method, count, revenue in rows]
+    return "\n".join(lines)
+
+HANDLERS: Dict[str, Callable[..., str]] = {
+    "tables": answer_tables,
+    "row_count": answer_row_count,
+    "category_breakdown": answer_category_breakdown,
+    "payment_breakdown": answer_payment_breakdown,
+}
+
+intent_router = IntentRouter()
+
+BENCHMARK_MESSAGES = [
+    "How many customers are there?",
+    "What tables are in the database?",
+    "Show me revenue by category",
+    "What is the payment method breakdown?",
+    "How many customers from Chicago bought more than twice last month?",
+    "Which products should we restock before the holidays, given last year's sales?",
+    "hello",
+    "Can you explain how the transactions table relates to customers and products?",
+]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure intent routing cost per message")
+    parser.add_argument("--iterations", type=int, default=20000, help="passes over the sample messages")
+    parser.add_argument("message", nargs="*", help="messages to route (default: built-in samples)")
+    args = parser.parse_args(argv)
+
+    router = IntentRouter(enabled=True)
+    messages = args.message or BENCHMARK_MESSAGES
+    routes = {}
+    for message in messages:
+        found = router.match(message)
+        routes[message] = None if found is None else {
+            "intent": found.rule.name, "confident": found.confident, "slots": list(found.slots),
+            "answered_without_llm": bool(found.confident and found.rule.handler)}
+
+    started = time.perf_counter()
+    for _ in range(args.iterations):
+        for message in messages:
+            router.match(message)
+    elapsed = time.perf_counter() - started
+    calls = args.iterations * len(messages)
+    print(json.dumps({
+        "messages": len(messages),
+        "calls": calls,
+        "microseconds_per_message": round(elapsed / calls * 1e6, 3),
+        "routes": routes
+    }, indent=2))
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -1,23 +1,49 @@
+import time
+# Import time is part of the startup report
+_IMPORT_STARTED = time.perf_counter()
+
 import os
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response, WebSocket
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List
 import uuid
+import json
+import asyncio
+from contextlib import aclosing
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from dataclasses import dataclass
 
-# LangChain imports
-from langchain.memory import ConversationBufferMemory
-from langchain.chains import ConversationChain
-from langchain_nvidia_ai_endpoints import ChatNVIDIA
-from langchain.prompts import PromptTemplate
-from langchain.schema import BaseMessage, HumanMessage, AIMessage
+# LangChain and the NVIDIA client are imported on first use (see initialize_nvidia_llm)
 
 # Database imports
-import psycopg2
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, URL
 from dotenv import load_dotenv
 
+from concurrency import llm_gate, llm_flights, session_locks, QueueFullError
+from session_store import session_store, SessionMemory
+from session_backend import create_session_backend, SESSION_ID_MAX_LENGTH
+from response_cache import response_cache
+from intent_router import intent_router
+from sql_executor import (
+    QueryExecutor, QueryValidationError, QueryTimeoutError, PoolExhaustedError, QueryUnavailableError
+)
+from nl2sql import nl2sql_translator
+from analytics import AnalyticsService, ANALYTICS_REFRESH_SECONDS
+from schema_context import SchemaCache, SCHEMA_REFRESH_SECONDS
+from metrics import (
+    metrics, StageTimer, chat_stage_seconds, chat_request_seconds, chat_responses_total,
+    llm_prompt_chars, llm_completion_chars, llm_requests_total, chat_fallbacks_total,
+    llm_coalesced_total, llm_flight_fanout
+)
+from columnar import ColumnarEngine, ColumnarQueryError, COLUMNAR_RELOAD_SECONDS
+from resilience import ResilientLLM, CircuitOpenError, LLMTimeoutError
+from startup import startup
+
 # Load environment variables
 load_dotenv()
 
@@ -35,43 +61,132 @@ app.add_middleware(
 # Pydantic models for request/response
 class ChatRequest(BaseModel):
     message: str
-    session_id: Optional[str] = None
+    session_id: Optional[str] = Field(None, max_length=SESSION_ID_MAX_LENGTH)
+    stateless: bool = False  # answer does not depend on conversation history (cacheable across sessions)
 
 class ChatResponse(BaseModel):
     response: str
     session_id: str
     timestamp: str
 
-# In-memory session storage (use Redis in production)
-conversation_memories: Dict[str, ConversationBufferMemory] = {}
+class ChatBatchRequest(BaseModel):
+    items: List[ChatRequest]
+    parallelism: Optional[int] = None
+
+class QueryRequest(BaseModel):
+    sql: str
+    params: Optional[Dict[str, Any]] = None
+    max_rows: Optional[int] = None
+
+class NLQueryRequest(BaseModel):
+    question: str
+    execute: bool = True
+    max_rows: Optional[int] = None
+
+class ColumnarQueryRequest(BaseModel):
+    table: str = "sales"
+    filters: Optional[List[Dict[str, Any]]] = None
+    group_by: Optional[List[str]] = None
+    aggregates: Optional[List[Dict[str, str]]] = None
+    order_by: Optional[str] = None
+    descending: bool = True
+    limit: Optional[int] = None
+
+# Connection pool sizing
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PREWARM = int(os.getenv("DB_POOL_PREWARM", "2"))  # connections opened during startup
+
+# Startup: finish cache warm-up before accepting traffic (true) or in the background behind /ready (false)
+STARTUP_BLOCKING_WARMUP = os.getenv("STARTUP_BLOCKING_WARMUP", "false").lower() == "true"
+
+# Batch chat limits
+CHAT_BATCH_MAX_ITEMS = int(os.getenv("CHAT_BATCH_MAX_ITEMS", "1000"))
+CHAT_BATCH_PARALLELISM = int(os.getenv("CHAT_BATCH_PARALLELISM", "4"))
+CHAT_BATCH_MAX_PARALLELISM = int(os.getenv("CHAT_BATCH_MAX_PARALLELISM", "16"))
+
+# WebSocket chat limits
+WS_IDLE_TIMEOUT_SECONDS = float(os.getenv("WS_IDLE_TIMEOUT_SECONDS", "300"))
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
+WS_MAX_PENDING = int(os.getenv("WS_MAX_PENDING", "8"))
+WS_MAX_MESSAGE_CHARS = int(os.getenv("WS_MAX_MESSAGE_CHARS", "8000"))
+
+# Clients send this header to get per-stage timings back (Server-Timing header / "done" event)
+TIMING_REQUEST_HEADER = "X-Debug-Timing"
 
 # Database connection
 def get_db_connection():
     """Get database connection using environment variables"""
     try:
-        connection_string = (
-            f"postgresql://{os.getenv('POSTGRES_USER', 'postgres')}:"
-            f"{os.getenv('POSTGRES_PASSWORD', 'password')}@"
-            f"{os.getenv('POSTGRES_HOST', 'localhost')}:"
-            f"{os.getenv('POSTGRES_PORT', '5432')}/"
-            f"{os.getenv('POSTGRES_DATABASE', 'dbms_mini_2')}"
+        connection_url = URL.create(
+            "postgresql+psycopg2",
+            username=os.getenv('POSTGRES_USER', 'postgres'),
+            password=os.getenv('POSTGRES_PASSWORD', 'password'),
+            host=os.getenv('POSTGRES_HOST', 'localhost'),
+            port=int(os.getenv('POSTGRES_PORT', '5432')),
+            database=os.getenv('POSTGRES_DATABASE', 'dbms_mini_2')
+        )
+        engine = create_engine(
+            connection_url,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=True
         )
-        engine = create_engine(connection_string)
         return engine
     except Exception as e:
         print(f"Database connection error: {e}")
         return None
 
+def connect_database():
+    """Create the engine and open the first pool connections in parallel.
+
+    Returns None unless at least one connection actually opened, so a database
+    that is down is reported as such instead of surfacing on the first request.
+    """
+    engine = get_db_connection()
+    if engine is None:
+        return None
+
+    def open_connection(_):
+        try:
+            return engine.connect()
+        except Exception as e:
+            return e
+
+    count = max(1, min(DB_POOL_PREWARM, DB_POOL_SIZE))  # always check at least one connection
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        results = list(executor.map(open_connection, range(count)))
+    errors = [result for result in results if isinstance(result, Exception)]
+    for result in results:
+        if not isinstance(result, Exception):
+            result.close()
+    if len(errors) == count:
+        print(f"Database connection error: {errors[0]}")
+        engine.dispose()
+        return None
+    if errors:
+        print(f"⚠️ Opened {count - len(errors)} of {count} pool connections: {errors[0]}")
+    return engine
+
 # Initialize NVIDIA LLM
 def initialize_nvidia_llm():
     """Initialize NVIDIA Nemotron Ultra model with LangChain"""
+    if os.getenv("FAKE_LLM", "false").lower() == "true":
+        # Simulated model for benchmarks and load tests (see fake_llm.py)
+        from fake_llm import FakeChatNVIDIA
+        return FakeChatNVIDIA()
     try:
         # Use NVIDIA API key from environment
         nvidia_api_key = os.getenv("NVIDIA_API_KEY")
         if not nvidia_api_key:
             raise ValueError("NVIDIA_API_KEY not found in environment variables")
         
-        # Initialize ChatNVIDIA with Nemotron Ultra
+        # Initialize ChatNVIDIA with Nemotron Ultra (a heavy import, deferred until needed)
+        from langchain_nvidia_ai_endpoints import ChatNVIDIA
         llm = ChatNVIDIA(
             model="nvidia/nemotron-4-340b-instruct",  # Nemotron Ultra model
             api_key=nvidia_api_key,
@@ -84,10 +199,12 @@ def initialize_nvidia_llm():
         return None
 
 # Database schema context for the AI
-DATABASE_CONTEXT = """
+ASSISTANT_INTRO = """
 You are a helpful and polite database assistant for an e-commerce system. You have access to the following database schema:
+"""
 
-DATABASE SCHEMA:
+# Used only until the live schema has been introspected (see schema_context.py)
+STATIC_SCHEMA = """DATABASE SCHEMA:
 1. categories (category_id, category_name, description, created_date)
    - Categories: Electronics, Clothing, Beauty, Home & Garden, Sports
 
@@ -107,9 +224,9 @@ RELATIONSHIPS:
 - products.category_id → categories.category_id
 - transactions.customer_id → customers.customer_id  
 - transaction_details.transaction_id → transactions.transaction_id
-- transaction_details.product_id → products.product_id
+- transaction_details.product_id → products.product_id"""
 
-PERSONALITY AND BEHAVIOR:
+ASSISTANT_GUIDELINES = """PERSONALITY AND BEHAVIOR:
 - Always be polite, helpful, and professional
 - Remember the conversation context and refer to previous messages when relevant
 - Provide detailed and informative responses
@@ -128,97 +245,251 @@ CAPABILITIES:
 Please maintain a helpful and polite tone throughout our conversation.
 """
 
-# Create conversation prompt template
-conversation_prompt = PromptTemplate(
-    input_variables=["history", "input"],
-    template=f"""{DATABASE_CONTEXT}
+def build_database_context(schema: str) -> str:
+    """Full system context around a schema description"""
+    return f"{ASSISTANT_INTRO}\n{schema}\n\n{ASSISTANT_GUIDELINES}"
 
-Previous conversation:
-{{history}}
+DATABASE_CONTEXT = build_database_context(STATIC_SCHEMA)
 
-Current user input: {{input}}
+# Static prompt parts, rendered once
+PROMPT_PREFIX = f"{DATABASE_CONTEXT}\n\nPrevious conversation:\n"
+PROMPT_SUFFIX = "\nPlease provide a helpful and polite response based on the database context and conversation history.\n"
+response_cache.set_context(DATABASE_CONTEXT)
 
-Please provide a helpful and polite response based on the database context and conversation history.
-"""
-)
+def set_database_context(context: str):
+    """Replace the schema context used in prompts and invalidate cached responses"""
+    global DATABASE_CONTEXT, PROMPT_PREFIX
+    DATABASE_CONTEXT = context
+    PROMPT_PREFIX = f"{DATABASE_CONTEXT}\n\nPrevious conversation:\n"
+    response_cache.set_context(context)
 
 # Initialize global variables
 llm = None
 db_engine = None
+query_executor = None
+analytics_service = None
+columnar_engine = None
+schema_cache = None
+ws_stats = {"connections": 0, "opened": 0, "idle_closed": 0, "slow_closed": 0}
 
-def get_or_create_memory(session_id: str) -> ConversationBufferMemory:
+def pool_usage():
+    """Checked-out, idle and overflow connections of the database pool"""
+    if not query_executor:
+        return None
+    stats = query_executor.pool_stats()
+    if "checked_out" not in stats:
+        return None
+    return [(("checked_out",), stats["checked_out"]), (("idle",), stats["checked_in"]),
+            (("overflow",), max(stats["overflow"], 0)), (("size",), stats["size"])]
+
+# Gauges are read when /metrics is scraped
+metrics.gauge("session_store_sessions", "Sessions held in memory", lambda: len(session_store))
+metrics.gauge("session_store_bytes", "Approximate bytes of conversation history held in memory",
+              lambda: session_store.total_bytes)
+metrics.gauge("llm_in_flight", "LLM calls currently running", lambda: llm_gate.in_flight)
+metrics.gauge("llm_waiting", "Requests waiting for an LLM slot", lambda: llm_gate.waiting)
+metrics.gauge("llm_rejected_total", "Requests rejected because the LLM queue was full", lambda: llm_gate.rejected)
+metrics.gauge("response_cache_entries", "Entries in the chat response cache", lambda: response_cache.stats()["entries"])
+metrics.gauge("response_cache_lookups", "Response cache lookups by result",
+              lambda: [(("hit",), response_cache.hits), (("miss",), response_cache.misses)], ("result",))
+metrics.gauge("startup_phase_seconds", "Duration of each startup phase, including module import",
+              lambda: [((name,), phase["seconds"]) for name, phase in startup.phases.items()
+                       if phase["seconds"] is not None], ("phase",))
+metrics.gauge("ws_chat_connections", "Open /ws/chat connections", lambda: ws_stats["connections"])
+metrics.gauge("llm_flights_in_flight", "Distinct upstream LLM calls that callers can join",
+              lambda: llm_flights.stats()["in_flight"])
+metrics.gauge("llm_circuit_open", "1 while the LLM circuit breaker is open or half-open",
+              lambda: None if not llm else 0 if llm.accepting else 1)
+metrics.gauge("llm_timeouts_total", "LLM calls that missed their deadline", lambda: llm.timeouts if llm else None)
+metrics.gauge("llm_short_circuited_total", "LLM calls skipped because the circuit was open",
+              lambda: llm.breaker.short_circuited if llm else None)
+metrics.gauge("llm_hedges_total", "Hedged LLM requests by result",
+              lambda: [(("started",), llm.hedges_started), (("won",), llm.hedges_won)] if llm else None, ("result",))
+metrics.gauge("intent_routed_total", "Messages answered by the intent router without the LLM",
+              lambda: [((name,), count) for name, count in intent_router.routed.items()], ("intent",))
+metrics.gauge("db_pool_connections", "Database pool connections by state", pool_usage, ("state",))
+
+def get_or_create_memory(session_id: str) -> SessionMemory:
     """Get or create conversation memory for a session"""
-    if session_id not in conversation_memories:
-        conversation_memories[session_id] = ConversationBufferMemory(
-            return_messages=True,
-            memory_key="history"
-        )
-    return conversation_memories[session_id]
+    return session_store.get_or_create(session_id)
 
-def generate_fallback_response(message: str) -> str:
-    """Generate fallbaccd python-api
-bash start.sh
-cd /home/dikshith/Documents/Projects/AI/DBMS-Mini-Project/python-api && source venv/bin/activate && python -m uvicorn main:app --host 0.0.0.0 --port 8000 --reloadk response when LLM is not available"""
-    message_lower = message.lower()
-    
-    if any(word in message_lower for word in ["hello", "hi", "hey", "greetings"]):
-        return """Hello! I'm your polite database assistant for this e-commerce system. I'm here to help you understand and analyze your database containing information about categories, products, customers, and transactions. How may I assist you today?"""
-    
-    if any(word in message_lower for word in ["customer", "customers", "user", "users"]):
-        return """I'd be happy to help you with customer information! Our database contains comprehensive customer details including names, contact information, demographics, and registration dates. We have customers from major cities across the country. Would you like me to help you analyze customer data, demographics, or suggest specific queries for customer insights?"""
-    
-    if any(word in message_lower for word in ["product", "products", "inventory", "stock"]):
-        return """I can certainly assist you with product and inventory analysis! Our product database includes items across multiple categories such as Electronics (smartphones, laptops, headphones), Clothing (t-shirts, jeans, shoes), Beauty products (cosmetics, personal care), and more. Each product has detailed information including pricing, stock quantities, and descriptions. What specific product information would you like to explore?"""
-    
-    if any(word in message_lower for word in ["sales", "transaction", "transactions", "revenue", "money"]):
-        return """I'm here to help you analyze sales and transaction data! Our comprehensive transaction records include payment methods (Credit Card, Debit Card, Cash, PayPal), transaction dates, amounts, and detailed line items. I can help you understand sales patterns, customer purchase behavior, and revenue trends. What specific sales insights would you like me to help you with?"""
-    
-    if any(word in message_lower for word in ["category", "categories"]):
-        return """I'd be pleased to help you understand our product categories! Our database organizes products into well-defined categories: Electronics, Clothing, Beauty, Home & Garden, and Sports. Each category contains multiple products with detailed descriptions and relationships. Would you like to explore category-wise analysis or see how products are distributed across categories?"""
-    
-    if any(word in message_lower for word in ["database", "schema", "table", "tables", "structure"]):
-        return """I'm happy to explain our database structure! Our e-commerce database consists of 5 main tables: Categories, Products, Customers, Transactions, and Transaction Details. These tables are thoughtfully connected through foreign key relationships to maintain data integrity and enable comprehensive analysis. Would you like me to explain any specific table structure, relationships, or suggest ways to query the data?"""
-    
-    if any(word in message_lower for word in ["help", "what", "how", "can you"]):
-        return """I'm here to provide friendly assistance with your e-commerce database! Here's how I can help you:
+async def load_memory(session_id: str) -> SessionMemory:
+    """Get or create session memory without blocking the event loop on backend reads"""
+    if session_store.backend.persistent:
+        return await run_in_threadpool(get_or_create_memory, session_id)
+    return get_or_create_memory(session_id)
 
-• **Customer Analytics**: Analyze customer demographics, behavior, and registration patterns
-• **Product Management**: Explore inventory levels, product categories, and pricing insights  
-• **Sales Analysis**: Examine transaction trends, revenue patterns, and payment preferences
-• **Database Structure**: Explain table relationships and suggest useful queries
-• **Data Insights**: Provide recommendations for business intelligence and reporting
+def user_message(prompt: str) -> list:
+    """Chat model input for one prompt (langchain_core is loaded on first use)"""
+    from langchain_core.messages import HumanMessage
+    return [HumanMessage(content=prompt)]
 
-I remember our conversation context, so feel free to ask follow-up questions. What would you like to explore first?"""
-    
-    # Default polite response
-    return """Thank you for your message! I'm your helpful database assistant for this e-commerce system. I have comprehensive knowledge about your database schema including categories, products, customers, and transactions. I maintain conversation context and always strive to provide polite and informative responses. 
+def build_prompt(memory: SessionMemory, message: str, grounding: str = "") -> str:
+    """Build the full LLM prompt from the database context and session history"""
+    # The history window is maintained incrementally and cached per session
+    return f"{PROMPT_PREFIX}{memory.history.render()}\n\n{grounding}Current user input: {message}\n{PROMPT_SUFFIX}"
+
+def get_grounding(message: str) -> str:
+    """Precomputed analytics snapshot for analytical questions, if available"""
+    return analytics_service.grounding_text(message) if analytics_service else ""
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format a Server-Sent Event frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-Could you please let me know what specific aspect of your database you'd like to explore? I'm here to help with data analysis, explanations, or any questions you might have!"""
+def generate_fallback_response(message: str) -> str:
+    """Generate fallback response when LLM is not available"""
+    return intent_router.fallback_reply(message)
+
+async def answer_intent(message: str, timer: StageTimer) -> Optional[str]:
+    """Templated answer for a confident data intent, or None to continue to the cache and LLM"""
+    with timer.stage("intent_route"):
+        found = intent_router.route(message)
+        if found is None or not db_engine:
+            return None
+        response = intent_router.cached_answer(found)
+    if response is None:
+        # Right after a database failure, let the LLM answer instead of retrying every message
+        if not intent_router.data_available:
+            return None
+        try:
+            with timer.stage("intent_answer"):
+                response = await run_in_threadpool(intent_router.answer, found, db_engine, analytics_service)
+        except Exception as e:
+            print(f"Intent answer error ({found.rule.name}): {e}")
+            return None
+    return response
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup"""
-    global llm, db_engine
+    global llm, db_engine, query_executor
     
     print("🚀 Starting DBMS Mini Project AI Assistant...")
+    startup.begin()
     
-    # Initialize NVIDIA LLM
-    print("🤖 Initializing NVIDIA Nemotron Ultra model...")
-    llm = initialize_nvidia_llm()
-    if llm:
+    # The LLM client and the database pool do not depend on each other: start both at once
+    print("🤖 Initializing NVIDIA Nemotron Ultra model and 🗄️ connecting to database...")
+    raw_llm, db_engine = await asyncio.gather(
+        startup.phase("llm_init", initialize_nvidia_llm),
+        startup.phase("db_connect", connect_database)
+    )
+    if raw_llm:
+        # Deadlines and circuit breaking around every call (see resilience.py)
+        llm = ResilientLLM(raw_llm)
         print("✅ NVIDIA LLM initialized successfully!")
     else:
+        startup.flag("llm_init", "unavailable")
         print("⚠️ NVIDIA LLM initialization failed - using fallback responses")
-    
-    # Initialize database connection
-    print("🗄️ Connecting to database...")
-    db_engine = get_db_connection()
     if db_engine:
         print("✅ Database connection established!")
+        query_executor = QueryExecutor(db_engine)
     else:
+        startup.flag("db_connect", "unavailable")
         print("⚠️ Database connection failed")
     
-    print("✨ AI Assistant is ready to help!")
+    # Attach the session backend (in-memory unless SESSION_BACKEND is set), and describe the
+    # live schema before the first prompt so the prompt prefix does not change under early requests
+    backend, _ = await asyncio.gather(
+        startup.phase("session_backend", create_session_backend, db_engine),
+        load_schema()
+    )
+    session_store.attach_backend(backend)
+    print(f"💬 Session backend: {session_store.backend.name}")
+    
+    if STARTUP_BLOCKING_WARMUP:
+        await warm_up()
+        print("✨ AI Assistant is ready to help!")
+    else:
+        # Requests are served meanwhile (without grounding or columnar data); /ready waits for this
+        asyncio.create_task(warm_up())
+        print("✨ AI Assistant is accepting requests, warming caches in the background...")
+
+async def warm_up():
+    """Build the analytics aggregates and columnar tables side by side, then mark the worker ready"""
+    await asyncio.gather(setup_analytics(), load_columnar())
+    startup.mark_ready()
+    print(f"⏱️ Ready in {startup.ready_seconds:.2f}s ({startup.summary()})")
+
+async def load_schema():
+    """Introspect the schema and statistics and use them as the prompt's schema context"""
+    global schema_cache
+    if not db_engine:
+        return
+    try:
+        cache = SchemaCache(db_engine)
+        await startup.phase("schema", cache.refresh)
+        schema_cache = cache
+        set_database_context(build_database_context(cache.text))
+        print(f"🧭 Schema context: {len(cache.tables)} tables, ~{cache.stats()['estimated_tokens']} tokens")
+        if SCHEMA_REFRESH_SECONDS > 0:
+            asyncio.create_task(schema_refresh_loop())
+    except Exception as e:
+        print(f"⚠️ Schema introspection failed, using the built-in schema description: {e}")
+
+async def setup_analytics():
+    """Build or catch up the precomputed analytics aggregates"""
+    global analytics_service
+    if not db_engine:
+        return
+    try:
+        service = AnalyticsService(db_engine)
+        await startup.phase("analytics", service.setup)
+        analytics_service = service
+        asyncio.create_task(analytics_refresh_loop())
+        print("📊 Analytics aggregates are up to date!")
+    except Exception as e:
+        print(f"⚠️ Analytics aggregates unavailable: {e}")
+
+async def load_columnar():
+    """Load the in-memory columnar copy of the sales data (needs numpy)"""
+    global columnar_engine
+    if not db_engine or not await run_in_threadpool(ColumnarEngine.available):
+        return
+    try:
+        engine = ColumnarEngine(db_engine)
+        report = await startup.phase("columnar", engine.reload)
+        columnar_engine = engine
+        if COLUMNAR_RELOAD_SECONDS > 0:
+            asyncio.create_task(columnar_reload_loop())
+        print(f"🧮 Columnar engine loaded: {', '.join(report['tables']) or 'no tables'} "
+              f"({report['total_bytes'] / 1024:.0f} KiB)")
+    except Exception as e:
+        print(f"⚠️ Columnar engine unavailable: {e}")
+
+async def analytics_refresh_loop():
+    """Periodically fold new transactions into the aggregates"""
+    while True:
+        await asyncio.sleep(ANALYTICS_REFRESH_SECONDS)
+        try:
+            await run_in_threadpool(analytics_service.refresh)
+        except Exception as e:
+            print(f"Analytics refresh error: {e}")
+
+async def schema_refresh_loop():
+    """Periodically check the schema; the context (and cached responses) change only when it does"""
+    while True:
+        await asyncio.sleep(SCHEMA_REFRESH_SECONDS)
+        try:
+            if await run_in_threadpool(schema_cache.refresh):
+                set_database_context(build_database_context(schema_cache.text))
+                print(f"🧭 Schema changed; prompt context refreshed ({len(schema_cache.tables)} tables)")
+        except Exception as e:
+            print(f"Schema refresh error: {e}")
+
+async def columnar_reload_loop():
+    """Periodically reload the columnar tables from the database"""
+    while True:
+        await asyncio.sleep(COLUMNAR_RELOAD_SECONDS)
+        try:
+            await run_in_threadpool(columnar_engine.reload)
+        except Exception as e:
+            print(f"Columnar reload error: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush pending session writes on shutdown"""
+    session_store.backend.close()
 
 @app.get("/")
 async def root():
@@ -229,10 +500,28 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "chat": "/chat",
+            "chat_stream": "/chat/stream",
+            "chat_batch": "/chat/batch",
+            "chat_websocket": "/ws/chat",
+            "query_execute": "/query/execute",
+            "query_nl": "/query/nl",
+            "analytics": "/analytics/status",
+            "columnar": "/columnar/query",
+            "schema": "/schema",
+            "metrics": "/metrics",
+            "ready": "/ready",
             "health": "/health"
         }
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until startup and cache warm-up have finished"""
+    report = startup.report()
+    if not startup.ready:
+        return JSONResponse(status_code=503, content=report)
+    return report
+
 @app.get("/health")
 async def health_check():
     """Detailed health check"""
@@ -240,69 +529,244 @@ async def health_check():
         "status": "healthy",
         "llm_status": "connected" if llm else "disconnected",
         "database_status": "connected" if db_engine else "disconnected",
-        "active_sessions": len(conversation_memories)
+        "active_sessions": len(session_store),
+        "session_store": session_store.stats(),
+        "llm_queue": llm_gate.stats(),
+        "llm_resilience": llm.stats() if llm else None,
+        "llm_single_flight": llm_flights.stats(),
+        "intent_router": intent_router.stats(),
+        "schema_context": schema_cache.stats() if schema_cache else {"source": "static"},
+        "websockets": dict(ws_stats),
+        "response_cache": response_cache.stats(),
+        "db_pool": query_executor.pool_stats() if query_executor else None,
+        "columnar_engine": "loaded" if columnar_engine else "disabled",
+        "startup": startup.report()
     }
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
-    """Main chat endpoint with conversation memory"""
-    try:
-        # Generate session ID if not provided
-        session_id = request.session_id or str(uuid.uuid4())
-        
-        # Validate input
-        if not request.message or not request.message.strip():
-            raise HTTPException(status_code=400, detail="Message cannot be empty")
+def wants_timing(http_request: Request) -> bool:
+    """Whether the client opted in to per-request stage timings"""
+    return http_request.headers.get(TIMING_REQUEST_HEADER, "").lower() in ("1", "true", "yes")
+
+def fallback_reason(error: Exception) -> str:
+    """Label for chat_fallbacks_total when an LLM call fails"""
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(error, LLMTimeoutError):
+        return "llm_timeout"
+    if isinstance(error, QueueFullError):
+        return "llm_queue_full"
+    return "llm_error"
+
+def finish_request(timer: StageTimer, endpoint: str, outcome: str):
+    """Record stage and end-to-end latencies for a chat request"""
+    timer.observe(chat_stage_seconds, endpoint)
+    chat_request_seconds.observe(timer.total(), endpoint, outcome)
+    chat_responses_total.inc(endpoint, outcome)
+
+async def invoke_llm(prompt: str, endpoint: str, timer: Optional[StageTimer] = None) -> str:
+    """Await the LLM without blocking the event loop, within the concurrency limit"""
+    queued = time.perf_counter()
+    async with llm_gate.slot():
+        if timer:
+            timer.mark("llm_queue", queued)
+        called = time.perf_counter()
+        try:
+            result = await llm.ainvoke(user_message(prompt))
+        except Exception:
+            llm_requests_total.inc(endpoint, "error")
+            raise
+        if timer:
+            timer.mark("llm_call", called)
+    llm_requests_total.inc(endpoint, "success")
+    return result.content
+
+@dataclass
+class ChatTurn:
+    response: str
+    outcome: str  # routed, cache, llm, coalesced or fallback
+    fallback_reason: Optional[str] = None
+
+async def chat_turn(session_id: str, message: str, stateless: bool, timer: StageTimer, endpoint: str,
+                    memory: Optional[SessionMemory] = None) -> ChatTurn:
+    """Answer one message in session order and save the turn to the session's memory"""
+    reason = None
+    # Turns of the same session run one at a time, in arrival order
+    waited = time.perf_counter()
+    async with session_locks.hold(session_id):
+        timer.mark("session_lock", waited)
         
-        message = request.message.strip()
+        # Get or create conversation memory for this session (callers holding it pass it in)
+        if memory is None:
+            with timer.stage("session_load"):
+                memory = await load_memory(session_id)
         
-        # Get or create conversation memory for this session
-        memory = get_or_create_memory(session_id)
+        # Known data questions are answered from the database; then serve repeats from the response cache
+        response = await answer_intent(message, timer)
+        routed = response is not None
+        if not routed:
+            with timer.stage("history_build"):
+                grounding = get_grounding(message)
+                history_text = memory.history.render()
+            with timer.stage("cache_lookup"):
+                cache_key = response_cache.make_key(message, history_text, grounding, stateless)
+                response = response_cache.get(cache_key)
         
         # Generate response
-        if llm:
+        if routed:
+            outcome = "routed"
+        elif response is not None:
+            outcome = "cache"
+        elif llm and not llm.admit():
+            # Circuit is open: answer now instead of waiting on a failing upstream
+            reason = "circuit_open"
+            chat_fallbacks_total.inc(endpoint, reason)
+            with timer.stage("fallback"):
+                response = generate_fallback_response(message)
+            outcome = "fallback"
+        elif llm:
             try:
-                # Get conversation history
-                history = memory.chat_memory.messages if hasattr(memory, 'chat_memory') else []
-                history_text = ""
-                if history:
-                    for msg in history[-10:]:  # Last 10 messages for context
-                        if hasattr(msg, 'content'):
-                            role = "User" if isinstance(msg, HumanMessage) else "Assistant"
-                            history_text += f"{role}: {msg.content}\n"
-                
                 # Create the full prompt
-                full_prompt = f"""{DATABASE_CONTEXT}
-
-Previous conversation:
-{history_text}
-
-Current user input: {message}
-
-Please provide a helpful and polite response based on the database context and conversation history.
-"""
-                
-                # Get response from LLM directly
-                response = llm.invoke([HumanMessage(content=full_prompt)]).content
+                with timer.stage("prompt_build"):
+                    full_prompt = build_prompt(memory, message, grounding)
+                llm_prompt_chars.observe(len(full_prompt), endpoint)
                 
-                # Save to memory
-                memory.save_context({"input": message}, {"output": response})
+                # Identical concurrent questions (same cache key) share one upstream call
+                waited = time.perf_counter()
+                flight = await llm_flights.run(
+                    cache_key, lambda: invoke_llm(full_prompt, endpoint, timer))
+                response = flight.value
+                if flight.shared:
+                    timer.mark("llm_coalesced", waited)
+                    llm_coalesced_total.inc(endpoint)
+                    outcome = "coalesced"
+                else:
+                    llm_flight_fanout.observe(flight.callers, endpoint)
+                    llm_completion_chars.observe(len(response), endpoint)
+                    response_cache.put(cache_key, response)
+                    outcome = "llm"
                 
+            except QueueFullError:
+                raise
             except Exception as e:
                 print(f"LLM Error: {e}")
+                reason = fallback_reason(e)
+                chat_fallbacks_total.inc(endpoint, reason)
                 # Use fallback response if LLM fails
-                response = generate_fallback_response(message)
-                # Still save to memory for context
-                memory.save_context({"input": message}, {"output": response})
+                with timer.stage("fallback"):
+                    response = generate_fallback_response(message)
+                outcome = "fallback"
         else:
             # Use fallback response
-            response = generate_fallback_response(message)
-            # Save to memory for context
+            reason = "llm_unavailable"
+            chat_fallbacks_total.inc(endpoint, reason)
+            with timer.stage("fallback"):
+                response = generate_fallback_response(message)
+            outcome = "fallback"
+        
+        # Save to memory (cached and fallback answers too, so the conversation stays consistent)
+        with timer.stage("save_context"):
             memory.save_context({"input": message}, {"output": response})
+    
+    return ChatTurn(response, outcome, reason)
+
+async def stream_chat_turn(session_id: str, message: str, stateless: bool, timer: StageTimer, endpoint: str,
+                           memory: Optional[SessionMemory] = None):
+    """Like chat_turn, but yields response text as it arrives and then the finished ChatTurn"""
+    outcome = "error"
+    waited = time.perf_counter()
+    async with session_locks.hold(session_id):
+        timer.mark("session_lock", waited)
+        if memory is None:
+            with timer.stage("session_load"):
+                memory = await load_memory(session_id)
+        cached = await answer_intent(message, timer)
+        routed = cached is not None
+        if not routed:
+            with timer.stage("history_build"):
+                grounding = get_grounding(message)
+                history_text = memory.history.render()
+            with timer.stage("cache_lookup"):
+                cache_key = response_cache.make_key(message, history_text, grounding, stateless)
+                cached = response_cache.get(cache_key)
+        chunks = []
+        fallback = "llm_error" if llm else "llm_unavailable"
+        if cached is not None:
+            chunks.append(cached)
+            outcome = "routed" if routed else "cache"
+            yield cached
+        elif llm and not llm.admit():
+            fallback = "circuit_open"
+        elif llm:
+            try:
+                with timer.stage("prompt_build"):
+                    full_prompt = build_prompt(memory, message, grounding)
+                llm_prompt_chars.observe(len(full_prompt), endpoint)
+                queued = time.perf_counter()
+                async with llm_gate.slot():
+                    timer.mark("llm_queue", queued)
+                    called = time.perf_counter()
+                    async for chunk in llm.astream(user_message(full_prompt)):
+                        if chunk.content:
+                            if not chunks:
+                                timer.mark("llm_first_token", called)
+                            chunks.append(chunk.content)
+                            yield chunk.content
+                    timer.mark("llm_call", called)
+                llm_requests_total.inc(endpoint, "success")
+                response_cache.put(cache_key, "".join(chunks))
+                outcome = "llm"
+            except Exception as e:
+                print(f"LLM streaming error: {e}")
+                llm_requests_total.inc(endpoint, "error")
+                fallback = fallback_reason(e)
+        
+        if chunks:
+            response = "".join(chunks)
+            if outcome == "llm":
+                llm_completion_chars.observe(len(response), endpoint)
+        else:
+            # Use fallback response if the LLM is unavailable or failed before the first token
+            chat_fallbacks_total.inc(endpoint, fallback)
+            with timer.stage("fallback"):
+                response = generate_fallback_response(message)
+            outcome = "fallback"
+            yield response
+        
+        # Save the finished turn to memory
+        with timer.stage("save_context"):
+            memory.save_context({"input": message}, {"output": response})
+    
+    yield ChatTurn(response, outcome, fallback if outcome == "fallback" else None)
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat_endpoint(request: ChatRequest, http_request: Request, http_response: Response):
+    """Main chat endpoint with conversation memory"""
+    timer = StageTimer()
+    outcome = "error"
+    try:
+        # Generate session ID if not provided
+        session_id = request.session_id or str(uuid.uuid4())
+        
+        # Validate input
+        if not request.message or not request.message.strip():
+            outcome = "invalid"
+            raise HTTPException(status_code=400, detail="Message cannot be empty")
+        
+        message = request.message.strip()
+        
+        try:
+            turn = await chat_turn(session_id, message, request.stateless, timer, "chat")
+        except QueueFullError as e:
+            outcome = "rejected"
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        outcome = turn.outcome
+        
+        if wants_timing(http_request):
+            http_response.headers["Server-Timing"] = timer.server_timing()
         
         # Return response
         return ChatResponse(
-            response=response,
+            response=turn.response,
             session_id=session_id,
             timestamp=datetime.now().isoformat()
         )
@@ -312,20 +776,266 @@ Please provide a helpful and polite response based on the database context and c
     except Exception as e:
         print(f"Chat endpoint error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error occurred")
+    finally:
+        finish_request(timer, "chat", outcome)
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest, http_request: Request):
+    """Chat endpoint that streams response tokens as Server-Sent Events"""
+    timer = StageTimer()
+    # Generate session ID if not provided
+    session_id = request.session_id or str(uuid.uuid4())
+    
+    # Validate input
+    if not request.message or not request.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+    
+    message = request.message.strip()
+    timing = wants_timing(http_request)
+    
+    # Reject up front if the LLM queue is already full
+    if llm and llm.accepting:
+        try:
+            llm_gate.check_capacity()
+        except QueueFullError as e:
+            finish_request(timer, "chat_stream", "rejected")
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    
+    async def event_stream():
+        outcome = "error"
+        try:
+            async for part in stream_chat_turn(session_id, message, request.stateless, timer, "chat_stream"):
+                if isinstance(part, ChatTurn):
+                    outcome = part.outcome
+                else:
+                    yield format_sse("token", {"content": part})
+            
+            done = {
+                "session_id": session_id,
+                "timestamp": datetime.now().isoformat()
+            }
+            if timing:
+                done["timing_ms"] = timer.as_dict()
+            yield format_sse("done", done)
+        finally:
+            finish_request(timer, "chat_stream", outcome)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/chat/batch")
+async def chat_batch_endpoint(request: ChatBatchRequest):
+    """Answer many messages with bounded parallelism and stream NDJSON results as they complete"""
+    if not request.items:
+        raise HTTPException(status_code=400, detail="Batch has no items")
+    if len(request.items) > CHAT_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {CHAT_BATCH_MAX_ITEMS} items")
+    parallelism = max(1, min(request.parallelism or CHAT_BATCH_PARALLELISM, CHAT_BATCH_MAX_PARALLELISM))
+    
+    # Items of one session run in order; different sessions run side by side
+    session_ids = [item.session_id or str(uuid.uuid4()) for item in request.items]
+    sessions: Dict[str, List[int]] = {}
+    for index, session_id in enumerate(session_ids):
+        sessions.setdefault(session_id, []).append(index)
+    slots = asyncio.Semaphore(parallelism)
+    results: asyncio.Queue = asyncio.Queue()
+    
+    async def run_item(index: int) -> Dict[str, Any]:
+        item = request.items[index]
+        timer = StageTimer()
+        outcome = "error"
+        result: Dict[str, Any] = {"type": "result", "index": index, "session_id": session_ids[index]}
+        try:
+            if not item.message or not item.message.strip():
+                outcome = "invalid"
+                result.update(status="error", error="Message cannot be empty")
+            else:
+                turn = await chat_turn(session_ids[index], item.message.strip(), item.stateless, timer, "chat_batch")
+                outcome = turn.outcome
+                result.update(status="ok", response=turn.response, outcome=turn.outcome,
+                              fallback=turn.outcome == "fallback", fallback_reason=turn.fallback_reason)
+        except QueueFullError as e:
+            outcome = "rejected"
+            result.update(status="error", error=str(e))
+        except Exception as e:
+            print(f"Batch item error: {e}")
+            result.update(status="error", error="Internal server error occurred")
+        finally:
+            finish_request(timer, "chat_batch", outcome)
+        result["duration_ms"] = round(timer.total() * 1000, 2)
+        result["timestamp"] = datetime.now().isoformat()
+        return result
+    
+    async def run_session(indexes: List[int]):
+        for index in indexes:
+            async with slots:
+                result = await run_item(index)
+            await results.put(result)
+    
+    async def stream():
+        started = time.perf_counter()
+        workers = [asyncio.create_task(run_session(indexes)) for indexes in sessions.values()]
+        counts = {"ok": 0, "error": 0, "fallback": 0}
+        try:
+            for _ in range(len(request.items)):
+                result = await results.get()
+                counts[result["status"]] += 1
+                if result.get("fallback"):
+                    counts["fallback"] += 1
+                yield json.dumps(result) + "\n"
+            yield json.dumps({
+                "type": "summary",
+                "items": len(request.items),
+                "sessions": len(sessions),
+                "parallelism": parallelism,
+                **counts,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+            }) + "\n"
+        finally:
+            # Stop outstanding items if the client goes away
+            for worker in workers:
+                worker.cancel()
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+def parse_ws_message(frame: str) -> Dict[str, Any]:
+    """A frame is JSON ({"message": ..., "id": ..., "stateless": ...}) or plain message text"""
+    try:
+        payload = json.loads(frame)
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict):
+        payload = {"message": frame}
+    message = payload.get("message")
+    payload["message"] = message.strip() if isinstance(message, str) else ""
+    return payload
+
+@app.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket,
+                         session_id: Optional[str] = Query(None, max_length=SESSION_ID_MAX_LENGTH)):
+    """Chat over one connection bound to one session: pipelined messages, streamed responses"""
+    await websocket.accept()
+    session_id = session_id or str(uuid.uuid4())
+    await websocket.send_text(json.dumps({"type": "session", "session_id": session_id}))
+    # Keep the session resident while the connection is open
+    session_store.pin(session_id)
+    ws_stats["connections"] += 1
+    ws_stats["opened"] += 1
+    pending: asyncio.Queue = asyncio.Queue(maxsize=WS_MAX_PENDING)
+    state = {"busy": False, "memory": None}
+    
+    async def send(payload: Dict[str, Any]):
+        # A client that stops reading must not hold the session lock or an LLM slot
+        await asyncio.wait_for(websocket.send_text(json.dumps(payload)), WS_SEND_TIMEOUT_SECONDS)
+    
+    async def receive_messages():
+        while True:
+            try:
+                frame = await asyncio.wait_for(websocket.receive(), WS_IDLE_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                if state["busy"] or not pending.empty():
+                    continue
+                ws_stats["idle_closed"] += 1
+                await websocket.close(code=1000, reason="idle timeout")
+                return
+            if frame["type"] == "websocket.disconnect":
+                return
+            text = frame.get("text")
+            if text is None:
+                text = (frame.get("bytes") or b"").decode("utf-8", "replace")
+            # Blocks once WS_MAX_PENDING messages are queued, so a fast sender is throttled by TCP
+            await pending.put(parse_ws_message(text))
+    
+    async def answer(item: Dict[str, Any]):
+        message_id = item.get("id")
+        message = item["message"]
+        if not message or len(message) > WS_MAX_MESSAGE_CHARS:
+            await send({"type": "error", "id": message_id,
+                        "error": "Message cannot be empty" if not message else "Message is too long"})
+            return
+        # Reuse the resident memory unless the session was cleared meanwhile
+        memory = state["memory"]
+        if memory is None or session_store.get(session_id) is not memory:
+            memory = state["memory"] = await load_memory(session_id)
+        timer = StageTimer()
+        outcome = "error"
+        try:
+            await send({"type": "start", "id": message_id})
+            turn = None
+            async with aclosing(stream_chat_turn(session_id, message, bool(item.get("stateless")), timer,
+                                                 "ws_chat", memory)) as parts:
+                async for part in parts:
+                    if isinstance(part, ChatTurn):
+                        turn = part
+                    else:
+                        await send({"type": "token", "id": message_id, "content": part})
+            outcome = turn.outcome
+            done = {
+                "type": "done",
+                "id": message_id,
+                "outcome": turn.outcome,
+                "fallback": turn.outcome == "fallback",
+                "fallback_reason": turn.fallback_reason,
+                "timestamp": datetime.now().isoformat()
+            }
+            if item.get("timing"):
+                done["timing_ms"] = timer.as_dict()
+            await send(done)
+        finally:
+            finish_request(timer, "ws_chat", outcome)
+    
+    async def answer_messages():
+        # One turn at a time, in the order messages arrived
+        while True:
+            item = await pending.get()
+            state["busy"] = True
+            try:
+                await answer(item)
+            finally:
+                state["busy"] = False
+    
+    reader = asyncio.create_task(receive_messages())
+    writer = asyncio.create_task(answer_messages())
+    try:
+        await asyncio.wait({reader, writer}, return_when=asyncio.FIRST_COMPLETED)
+        if writer.done():
+            error = writer.exception()
+            if isinstance(error, asyncio.TimeoutError):
+                ws_stats["slow_closed"] += 1
+                await websocket.close(code=1008, reason="client is not reading responses")
+            elif error is not None:
+                # Usually a send after the client went away
+                print(f"WebSocket chat error: {error}")
+        elif reader.exception() is not None:
+            print(f"WebSocket chat error: {reader.exception()}")
+    except Exception as e:
+        print(f"WebSocket chat error: {e}")
+    finally:
+        reader.cancel()
+        writer.cancel()
+        session_store.unpin(session_id)
+        ws_stats["connections"] -= 1
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Metrics in the Prometheus text exposition format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/sessions")
 async def get_active_sessions():
     """Get information about active chat sessions"""
     return {
-        "active_sessions": len(conversation_memories),
-        "session_ids": list(conversation_memories.keys())
+        "active_sessions": len(session_store),
+        "session_ids": session_store.keys()
     }
 
 @app.delete("/sessions/{session_id}")
 async def clear_session(session_id: str):
     """Clear a specific chat session"""
-    if session_id in conversation_memories:
-        del conversation_memories[session_id]
+    if await run_in_threadpool(session_store.delete, session_id):
         return {"message": f"Session {session_id} cleared successfully"}
     else:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -333,9 +1043,212 @@ async def clear_session(session_id: str):
 @app.delete("/sessions")
 async def clear_all_sessions():
     """Clear all chat sessions"""
-    conversation_memories.clear()
+    await run_in_threadpool(session_store.clear)
     return {"message": "All sessions cleared successfully"}
 
+@app.post("/query/execute")
+async def execute_query(request: QueryRequest):
+    """Run a read-only SELECT and stream the rows back as NDJSON"""
+    if not query_executor:
+        raise HTTPException(status_code=503, detail="Database is not connected")
+    
+    try:
+        result = await run_in_threadpool(
+            query_executor.execute, request.sql, request.params, request.max_rows
+        )
+    except QueryValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except QueryTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except PoolExhaustedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except QueryUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    # Sync iterator: Starlette pulls each batch from the server-side cursor in a threadpool
+    return StreamingResponse(
+        result.iter_ndjson(),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(result.close)
+    )
+
+async def generate_sql(prompt: str) -> str:
+    """Ask the LLM for SQL, sharing the call with identical concurrent translations"""
+    key = "sql\x00" + prompt
+    flight = await llm_flights.run(key, lambda: invoke_llm(prompt, "query_nl"))
+    if flight.shared:
+        llm_coalesced_total.inc("query_nl")
+    else:
+        llm_flight_fanout.observe(flight.callers, "query_nl")
+    return flight.value
+
+@app.post("/query/nl")
+async def natural_language_query(request: NLQueryRequest):
+    """Translate a question to SQL (cached per parameterized template) and optionally run it"""
+    if not query_executor:
+        raise HTTPException(status_code=503, detail="Database is not connected")
+    if not request.question or not request.question.strip():
+        raise HTTPException(status_code=400, detail="Question cannot be empty")
+    
+    try:
+        translation = await nl2sql_translator.translate(
+            request.question.strip(), DATABASE_CONTEXT, generate_sql, query_executor
+        )
+    except QueryValidationError as e:
+        raise HTTPException(status_code=422, detail=f"Could not produce a valid query: {e}")
+    except QueryFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except LLMTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except PoolExhaustedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except QueryUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        if not llm:
+            raise HTTPException(status_code=503, detail="LLM is not available for SQL translation")
+        print(f"NL2SQL error: {e}")
+        raise HTTPException(status_code=502, detail="SQL translation failed")
+    
+    translated = {
+        "sql": translation.sql,
+        "params": translation.params,
+        "template": translation.template,
+        "cached": translation.cached,
+        "plan_cost": translation.plan_cost
+    }
+    if not request.execute:
+        return translated
+    
+    try:
+        result = await run_in_threadpool(
+            query_executor.execute, translation.sql, translation.params, request.max_rows, True
+        )
+    except QueryValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except QueryTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except PoolExhaustedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except QueryUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    def stream():
+        yield json.dumps({"type": "sql", **translated}, default=str) + "\n"
+        yield from result.iter_ndjson()
+    
+    return StreamingResponse(
+        stream(),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(result.close)
+    )
+
+@app.get("/query/stats")
+async def query_stats():
+    """Connection pool saturation and query duration statistics"""
+    if not query_executor:
+        raise HTTPException(status_code=503, detail="Database is not connected")
+    return {**query_executor.stats_snapshot(), "nl2sql": nl2sql_translator.stats()}
+
+async def analytics_report(name: str, **params):
+    """Serve a precomputed report without blocking the event loop"""
+    if not analytics_service:
+        raise HTTPException(status_code=503, detail="Analytics aggregates are not available")
+    rows = await run_in_threadpool(analytics_service.report, name, **params)
+    return {"report": name, "rows": rows, "refreshed_at": analytics_service.last_refresh.get("at")}
+
+@app.get("/analytics/revenue-by-category-month")
+async def revenue_by_category_month(year: Optional[int] = None):
+    """Revenue, units and line items per category and month"""
+    return await analytics_report("revenue_by_category_month", year=year)
+
+@app.get("/analytics/payment-methods")
+async def payment_method_mix():
+    """Transactions and revenue per payment method"""
+    return await analytics_report("payment_methods")
+
+@app.get("/analytics/demographics")
+async def customer_demographics():
+    """Transactions and revenue by customer gender and age band"""
+    return await analytics_report("demographics")
+
+@app.get("/analytics/top-products")
+async def top_products(limit: int = 10):
+    """Best-selling products by revenue"""
+    return await analytics_report("top_products", limit=max(1, min(limit, 100)))
+
+@app.post("/analytics/refresh")
+async def refresh_analytics(full: bool = False):
+    """Fold new rows into the aggregates now (full=true rebuilds them from scratch)"""
+    if not analytics_service:
+        raise HTTPException(status_code=503, detail="Analytics aggregates are not available")
+    return await run_in_threadpool(analytics_service.refresh, full)
+
+@app.get("/analytics/status")
+async def analytics_status():
+    """Aggregate refresh state"""
+    if not analytics_service:
+        raise HTTPException(status_code=503, detail="Analytics aggregates are not available")
+    return analytics_service.status()
+
+@app.get("/schema")
+async def schema_context():
+    """The schema description currently sent with every prompt"""
+    return {
+        "source": "live" if schema_cache else "static",
+        "schema": schema_cache.text if schema_cache else STATIC_SCHEMA,
+        "stats": schema_cache.stats() if schema_cache else None
+    }
+
+@app.post("/schema/refresh")
+async def refresh_schema_context():
+    """Check the schema now (e.g. right after a migration) instead of waiting for the next check"""
+    if not schema_cache:
+        raise HTTPException(status_code=503, detail="Schema introspection is not available")
+    changed = await run_in_threadpool(schema_cache.refresh)
+    if changed:
+        set_database_context(build_database_context(schema_cache.text))
+    return {"changed": changed, "stats": schema_cache.stats()}
+
+@app.post("/columnar/query")
+async def columnar_query(request: ColumnarQueryRequest):
+    """Filter/group-by/aggregate over the in-memory column tables"""
+    if not columnar_engine:
+        raise HTTPException(status_code=503, detail="Columnar engine is not available")
+    try:
+        return await run_in_threadpool(
+            columnar_engine.query, request.table, request.filters, request.group_by,
+            request.aggregates, request.order_by, request.descending, request.limit
+        )
+    except ColumnarQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/columnar/reload")
+async def reload_columnar():
+    """Reload the column tables from the database"""
+    if not columnar_engine:
+        raise HTTPException(status_code=503, detail="Columnar engine is not available")
+    return await run_in_threadpool(columnar_engine.reload)
+
+@app.get("/columnar/memory")
+async def columnar_memory():
+    """Rows and bytes held by the column tables"""
+    if not columnar_engine:
+        raise HTTPException(status_code=503, detail="Columnar engine is not available")
+    return columnar_engine.memory_report()
+
+@app.delete("/cache")
+async def clear_response_cache():
+    """Invalidate all cached chat responses"""
+    response_cache.invalidate()
+    intent_router.invalidate()
+    return {"message": "Response cache cleared successfully"}
+
+startup.record("import", time.perf_counter() - _IMPORT_STARTED)
+
 if __name__ == "__main__":
+    # Single process without auto-reload; see serve.py for workers and production options
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run(app, host=os.getenv("API_HOST", "0.0.0.0"), port=int(os.getenv("API_PORT", "8000")))
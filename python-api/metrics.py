@@ -0,0 +1,214 @@
+"""
+Prometheus-style metrics for the chat hot path.
+
+Counters and histograms are updated in-process and rendered in the
+Prometheus text exposition format by /metrics. Gauges are read from
+callbacks at scrape time, so session-store size and pool usage cost
+nothing between scrapes. StageTimer times the stages of one request and
+can render them as a Server-Timing header.
+"""
+
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, List, Tuple, Iterable, Union
+
+# Default latency buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Callers sharing one upstream call
+FANOUT_BUCKETS = (1, 2, 3, 5, 10, 25, 50, 100)
+# Prompt and completion sizes in characters
+SIZE_BUCKETS = (64, 256, 1024, 2048, 4096, 8192, 16384, 32768, 65536)
+
+LabelValues = Tuple[str, ...]
+
+def format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Counter:
+    """Monotonic counter, optionally split by labels"""
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f"{self.name}{format_labels(self.labels, values)} {format_value(total)}")
+        return lines
+
+class Histogram:
+    """Cumulative-bucket histogram, optionally split by labels"""
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                 buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count], sum
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(values, list(counts), total[0]) for values, (counts, total) in sorted(self._series.items())]
+        for values, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{format_labels(self.labels, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, values)} {format_value(round(total, 6))}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, values)} {cumulative}")
+        return lines
+
+GaugeReading = Union[None, float, List[Tuple[LabelValues, float]]]
+
+class Gauge:
+    """Value read from a callback at scrape time"""
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], GaugeReading], labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+        self.labels = labels
+
+    def render(self) -> List[str]:
+        try:
+            reading = self.read()
+        except Exception:
+            return []
+        if reading is None:
+            return []
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        if isinstance(reading, list):
+            for values, value in reading:
+                lines.append(f"{self.name}{format_labels(self.labels, values)} {format_value(value)}")
+        else:
+            lines.append(f"{self.name} {format_value(reading)}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                  buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def gauge(self, name: str, documentation: str, read: Callable[[], GaugeReading],
+              labels: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, read, labels))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text format"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+class StageTimer:
+    """Durations of the stages of one request"""
+
+    __slots__ = ("started", "stages")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, time.perf_counter() - started))
+
+    def mark(self, name: str, started: float):
+        """Record a stage that began at `started` and ends now"""
+        self.stages.append((name, time.perf_counter() - started))
+
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def observe(self, histogram: Histogram, *label_values: str):
+        """Add each stage to a histogram labelled by stage (after any fixed labels)"""
+        for name, seconds in self.stages:
+            histogram.observe(seconds, *label_values, name)
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, durations in milliseconds"""
+        parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.stages]
+        parts.append(f"total;dur={self.total() * 1000:.2f}")
+        return ", ".join(parts)
+
+    def as_dict(self) -> Dict[str, float]:
+        timings: Dict[str, float] = {}
+        for name, seconds in self.stages:
+            timings[name] = round(timings.get(name, 0.0) + seconds * 1000, 2)
+        timings["total"] = round(self.total() * 1000, 2)
+        return timings
+
+metrics = MetricsRegistry()
+
+# Chat hot path
+chat_stage_seconds = metrics.histogram(
+    "chat_stage_seconds", "Time spent in each stage of a chat request", ("endpoint", "stage"))
+chat_request_seconds = metrics.histogram(
+    "chat_request_seconds", "End-to-end chat request latency", ("endpoint", "outcome"))
+llm_prompt_chars = metrics.histogram(
+    "llm_prompt_chars", "Characters in prompts sent to the LLM", ("endpoint",), SIZE_BUCKETS)
+llm_completion_chars = metrics.histogram(
+    "llm_completion_chars", "Characters in LLM completions", ("endpoint",), SIZE_BUCKETS)
+llm_requests_total = metrics.counter(
+    "llm_requests_total", "LLM calls by result", ("endpoint", "result"))
+llm_coalesced_total = metrics.counter(
+    "llm_coalesced_total", "Requests answered by joining an identical in-flight LLM call", ("endpoint",))
+llm_flight_fanout = metrics.histogram(
+    "llm_flight_fanout", "Callers served by each upstream LLM call", ("endpoint",), FANOUT_BUCKETS)
+chat_fallbacks_total = metrics.counter(
+    "chat_fallbacks_total", "Responses served by the fallback generator", ("endpoint", "reason"))
+chat_responses_total = metrics.counter(
+    "chat_responses_total", "Chat responses by source", ("endpoint", "outcome"))
@@ -0,0 +1,296 @@
+"""
+Versioned schema migrations.
+
+Each migration has an integer version and is recorded in schema_migrations
+once applied, so running setup_database.py again only applies what is new.
+Every step is written to be safe on a database that already has the
+objects and data (IF NOT EXISTS, catalog checks), and indexes on existing
+tables are built with CREATE INDEX CONCURRENTLY so writes keep flowing.
+
+The migration list itself lives in setup_database.py. Optional migrations
+(range-partitioning transactions by transaction_date) are only applied when
+asked for.
+"""
+
+import os
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Dict, List, Optional, Iterable
+
+from analytics import ANALYTICS_DDL, install_change_triggers, reset_aggregates
+from sql_executor import ALLOWED_TABLES, QUERY_ROLE
+
+# Migration configuration
+MIGRATION_LOCK_KEY = 70420002
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    apply: Callable
+    transactional: bool = True  # False for statements such as CREATE INDEX CONCURRENTLY
+    optional: bool = False
+
+def relkind(cursor, table: str) -> Optional[str]:
+    """'r' for a plain table, 'p' for a partitioned one, None when missing"""
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def create_index(connection, name: str, table: str, columns: str):
+    """Create an index if missing, concurrently when the table is a plain table.
+
+    A failed concurrent build leaves an INVALID index behind; it is dropped
+    and rebuilt instead of being skipped by IF NOT EXISTS.
+    """
+    cursor = connection.cursor()
+    cursor.execute("""
+        SELECT i.indisvalid FROM pg_index i
+        WHERE i.indexrelid = to_regclass(%s)
+    """, (name,))
+    row = cursor.fetchone()
+    if row and row[0]:
+        return
+    concurrently = "CONCURRENTLY " if connection.autocommit and relkind(cursor, table) == "r" else ""
+    if row:
+        cursor.execute(f"DROP INDEX {concurrently}IF EXISTS {name}")
+    cursor.execute(f"CREATE INDEX {concurrently}IF NOT EXISTS {name} ON {table} ({columns})")
+
+# ---------------------------------------------------------------------------
+# Migrations
+
+def analytics_tables(connection):
+    """Summary tables maintained by analytics.py"""
+    connection.cursor().execute(ANALYTICS_DDL)
+
+def analytics_refresh_horizon(connection):
+    """Transaction horizon per source (superseded by analytics_change_log, which drops it)"""
+    connection.cursor().execute(
+        "ALTER TABLE agg_refresh_state ADD COLUMN IF NOT EXISTS xid_horizon BIGINT NOT NULL DEFAULT 0")
+
+def analytics_change_log(connection):
+    """Gap tracking and UPDATE/DELETE triggers for the aggregates; rebuilds them on the next refresh.
+
+    The horizon-based refresh folded a row again whenever an UPDATE gave it a
+    new xmin, so aggregates it maintained are not trusted.
+    """
+    cursor = connection.cursor()
+    cursor.execute(ANALYTICS_DDL)
+    install_change_triggers(cursor)
+    cursor.execute("ALTER TABLE agg_refresh_state DROP COLUMN IF EXISTS xid_horizon")
+    reset_aggregates(cursor)
+
+HOT_PATH_INDEXES = [
+    ("idx_transactions_customer_id", "transactions", "customer_id"),
+    ("idx_transactions_transaction_date", "transactions", "transaction_date"),
+    ("idx_transaction_details_transaction_id", "transaction_details", "transaction_id"),
+    ("idx_transaction_details_product_id", "transaction_details", "product_id"),
+]
+
+def hot_path_indexes(connection):
+    """Indexes behind the customer/transaction/product joins and date range scans"""
+    for name, table, columns in HOT_PATH_INDEXES:
+        create_index(connection, name, table, columns)
+
+def month_start(day: date, offset: int = 0) -> date:
+    """First day of the month `offset` months after `day`"""
+    month = day.year * 12 + day.month - 1 + offset
+    return date(month // 12, month % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    """transactions_pYYYYMM"""
+    return f"transactions_p{month.year:04d}{month.month:02d}"
+
+def ensure_transaction_partitions(cursor, first: date, last: date, parent: str = "transactions"):
+    """Create the monthly partitions covering [first, last] that do not exist yet.
+
+    Months that already have rows sitting in the default partition are left
+    there (PostgreSQL refuses to attach a range that the default holds).
+    """
+    month = month_start(first)
+    while month <= last:
+        following = month_start(month, 1)
+        name = partition_name(month)
+        if relkind(cursor, name) is None:
+            cursor.execute(f"""
+                SELECT EXISTS (SELECT 1 FROM transactions_default
+                               WHERE transaction_date >= %s AND transaction_date < %s)
+            """, (month, following))
+            if not cursor.fetchone()[0]:
+                cursor.execute(f"""
+                    CREATE TABLE {name} PARTITION OF {parent}
+                    FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')
+                """)
+        month = following
+
+def partition_transactions(connection):
+    """Rebuild transactions as a table range-partitioned by month of transaction_date.
+
+    The primary key becomes (transaction_id, transaction_date) because a
+    partitioned table's unique keys must include the partition key. For the
+    same reason transaction_details.transaction_id can no longer carry a
+    foreign key to transactions; it keeps its index.
+    """
+    cursor = connection.cursor()
+    if relkind(cursor, "transactions") == "p":
+        return
+    cursor.execute("LOCK TABLE transactions IN ACCESS EXCLUSIVE MODE")
+    cursor.execute("SELECT MIN(transaction_date), MAX(transaction_date) FROM transactions")
+    low, high = cursor.fetchone()
+    today = date.today()
+    first = low.date() if low else today
+    last = max(high.date() if high else today, month_start(today, PARTITION_MONTHS_AHEAD))
+
+    cursor.execute("ALTER TABLE transaction_details DROP CONSTRAINT IF EXISTS transaction_details_transaction_id_fkey")
+    cursor.execute("""
+        CREATE TABLE transactions_partitioned (
+            transaction_id INTEGER NOT NULL DEFAULT nextval('transactions_transaction_id_seq'),
+            customer_id INTEGER REFERENCES customers(customer_id),
+            transaction_date TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            total_amount DECIMAL(10,2) NOT NULL,
+            payment_method VARCHAR(50),
+            status VARCHAR(20) DEFAULT 'completed',
+            PRIMARY KEY (transaction_id, transaction_date)
+        ) PARTITION BY RANGE (transaction_date)
+    """)
+    cursor.execute("CREATE TABLE transactions_default PARTITION OF transactions_partitioned DEFAULT")
+    ensure_transaction_partitions(cursor, first, last, parent="transactions_partitioned")
+    cursor.execute("""
+        INSERT INTO transactions_partitioned
+            (transaction_id, customer_id, transaction_date, total_amount, payment_method, status)
+        SELECT transaction_id, customer_id, COALESCE(transaction_date, CURRENT_TIMESTAMP),
+               total_amount, payment_method, status
+        FROM transactions
+    """)
+
+    # Swap the tables, keeping the id sequence
+    cursor.execute("ALTER SEQUENCE transactions_transaction_id_seq OWNED BY NONE")
+    cursor.execute("DROP TABLE transactions")
+    cursor.execute("ALTER TABLE transactions_partitioned RENAME TO transactions")
+    cursor.execute("ALTER TABLE transactions RENAME CONSTRAINT transactions_partitioned_pkey TO transactions_pkey")
+    cursor.execute("""
+        ALTER TABLE transactions RENAME CONSTRAINT transactions_partitioned_customer_id_fkey
+        TO transactions_customer_id_fkey
+    """)
+    cursor.execute("ALTER SEQUENCE transactions_transaction_id_seq OWNED BY transactions.transaction_id")
+    for name, table, columns in HOT_PATH_INDEXES:
+        if table == "transactions":
+            create_index(connection, name, table, columns)
+    # The copy is a new table: it needs the change triggers, and the aggregates are rebuilt from it
+    cursor.execute(ANALYTICS_DDL)
+    install_change_triggers(cursor)
+    reset_aggregates(cursor)
+    cursor.execute("ANALYZE transactions")
+
+def grant_query_role(cursor, role: str = QUERY_ROLE):
+    """Give the query role SELECT on every allowed table that exists (tables may be added later)"""
+    cursor.execute("SELECT 1 FROM pg_roles WHERE rolname = %s", (role,))
+    if not cursor.fetchone():
+        return
+    cursor.execute(f'GRANT USAGE ON SCHEMA public TO "{role}"')
+    for table in sorted(ALLOWED_TABLES):
+        if relkind(cursor, table) is not None:
+            cursor.execute(f'GRANT SELECT ON {table} TO "{role}"')
+
+def query_reader_role(connection):
+    """NOLOGIN role for /query/execute and /query/nl: SELECT on the allowed tables only.
+
+    The API's user is made a member so the executor can SET LOCAL ROLE to it
+    for each query. Nothing is granted on users or the session tables.
+    """
+    if not QUERY_ROLE:
+        return
+    cursor = connection.cursor()
+    cursor.execute("SELECT 1 FROM pg_roles WHERE rolname = %s", (QUERY_ROLE,))
+    if not cursor.fetchone():
+        cursor.execute(f'CREATE ROLE "{QUERY_ROLE}" NOLOGIN')
+    cursor.execute("SELECT pg_has_role(current_user, %s, 'MEMBER')", (QUERY_ROLE,))
+    if not cursor.fetchone()[0]:
+        cursor.execute(f'GRANT "{QUERY_ROLE}" TO CURRENT_USER')
+    grant_query_role(cursor)
+
+# ---------------------------------------------------------------------------
+# Runner
+
+def applied_migrations(connection) -> Dict[int, Dict]:
+    """Versions recorded in schema_migrations (created on first use)"""
+    cursor = connection.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            duration_ms INTEGER
+        );
+    """)
+    return recorded_migrations(cursor)
+
+def recorded_migrations(cursor) -> Dict[int, Dict]:
+    cursor.execute("SELECT version, name, applied_at, duration_ms FROM schema_migrations ORDER BY version")
+    return {row[0]: {"name": row[1], "applied_at": row[2], "duration_ms": row[3]} for row in cursor.fetchall()}
+
+def run_migrations(connection, migrations: List[Migration], include_optional: Iterable[str] = (),
+                   target: Optional[int] = None) -> List[Migration]:
+    """Apply pending migrations in version order on an autocommit connection; returns those applied"""
+    include_optional = set(include_optional)
+    cursor = connection.cursor()
+    # One runner at a time
+    cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+    applied = []
+    try:
+        done = applied_migrations(connection)
+        for migration in sorted(migrations, key=lambda m: m.version):
+            if migration.version in done or (target is not None and migration.version > target):
+                continue
+            if migration.optional and migration.name not in include_optional:
+                continue
+            started = time.perf_counter()
+            if migration.transactional:
+                connection.autocommit = False
+                try:
+                    migration.apply(connection)
+                    record_migration(connection, migration, started)
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+                finally:
+                    connection.autocommit = True
+            else:
+                migration.apply(connection)
+                record_migration(connection, migration, started)
+            print(f"✅ Migration {migration.version:03d} {migration.name} applied")
+            applied.append(migration)
+        if relkind(cursor, "transactions") == "p":
+            # Keep monthly partitions ready ahead of new transactions
+            today = date.today()
+            ensure_transaction_partitions(cursor, today, month_start(today, PARTITION_MONTHS_AHEAD))
+        if QUERY_ROLE:
+            grant_query_role(cursor)
+    finally:
+        cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+    return applied
+
+def record_migration(connection, migration: Migration, started: float):
+    connection.cursor().execute(
+        "INSERT INTO schema_migrations (version, name, duration_ms) VALUES (%s, %s, %s)",
+        (migration.version, migration.name, int((time.perf_counter() - started) * 1000))
+    )
+
+def migration_status(connection, migrations: List[Migration]) -> List[Dict]:
+    """Every known migration with its applied time (None when pending); never changes the schema"""
+    cursor = connection.cursor()
+    cursor.execute("SELECT to_regclass('schema_migrations')")
+    # No schema_migrations yet: nothing has been applied
+    done = recorded_migrations(cursor) if cursor.fetchone()[0] else {}
+    return [
+        {
+            "version": m.version,
+            "name": m.name,
+            "optional": m.optional,
+            "applied_at": done.get(m.version, {}).get("applied_at")
+        }
+        for m in sorted(migrations, key=lambda m: m.version)
+    ]
@@ -0,0 +1,167 @@
+"""
+Natural-language to SQL translation with a parameterized template cache.
+
+Literals in a question (numbers, dates, quoted strings) are lifted out into
+bound parameters, so "sales in 2023" and "sales in 2022" share the template
+"sales in :p0". The first time a template is seen the LLM writes SQL that
+uses those parameters; the SQL is validated once with EXPLAIN against a
+cost ceiling and cached. Later questions with the same shape skip both the
+LLM call and the validation step.
+"""
+
+import os
+import re
+import asyncio
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable
+
+from response_cache import normalize_message, context_version
+from sql_executor import validate_select, QueryValidationError
+
+# Translator configuration
+NL2SQL_CACHE_MAX_ENTRIES = int(os.getenv("NL2SQL_CACHE_MAX_ENTRIES", "1024"))
+NL2SQL_MAX_PLAN_COST = float(os.getenv("NL2SQL_MAX_PLAN_COST", "1000000"))
+
+_LITERALS = re.compile(
+    r"'(?P<squote>[^']*)'"
+    r"|\"(?P<dquote>[^\"]*)\""
+    r"|(?P<date>\b\d{4}-\d{2}-\d{2}\b)"
+    r"|(?P<number>(?<![\w.])\d+(?:\.\d+)?(?![\w.]))"
+)
+_CODE_FENCE = re.compile(r"```(?:sql)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+
+SQL_PROMPT = """You translate questions about a PostgreSQL e-commerce database into one SQL query.
+
+{schema}
+
+Rules:
+- Return only a single read-only SELECT statement, no explanation.
+- Refer to the values below only through their named parameters (for example :p0), never as literals.
+{parameters}
+Question: {question}
+SQL:"""
+
+@dataclass
+class Translation:
+    sql: str
+    params: Dict[str, Any]
+    template: str
+    cached: bool
+    plan_cost: float
+
+def parameterize(question: str) -> Tuple[str, Dict[str, Any]]:
+    """Replace literals in a question with :pN placeholders; returns (template, params)"""
+    params: Dict[str, Any] = {}
+
+    def replace(match: re.Match) -> str:
+        name = f"p{len(params)}"
+        if match.group("number") is not None:
+            raw = match.group("number")
+            params[name] = float(raw) if "." in raw else int(raw)
+        else:
+            params[name] = match.group("squote") or match.group("dquote") or match.group("date") or ""
+        return f" :{name} "
+
+    template = _LITERALS.sub(replace, question)
+    # Normalize the text around the placeholders only
+    parts = re.split(r"(:p\d+)", template)
+    parts = [part if part.startswith(":p") else normalize_message(part) for part in parts]
+    template = " ".join(part for part in parts if part)
+    return template, params
+
+def extract_sql(llm_output: str) -> str:
+    """Pull the SQL statement out of an LLM reply"""
+    fenced = _CODE_FENCE.search(llm_output)
+    sql = fenced.group(1) if fenced else llm_output
+    return sql.strip().rstrip(";").strip()
+
+class NL2SQLTranslator:
+    """Caches validated SQL templates keyed by the parameterized question"""
+
+    def __init__(self, max_entries: int = NL2SQL_CACHE_MAX_ENTRIES, max_plan_cost: float = NL2SQL_MAX_PLAN_COST):
+        self.max_entries = max_entries
+        self.max_plan_cost = max_plan_cost
+        self._templates: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.llm_translations = 0
+        self.validation_failures = 0
+
+    def lookup(self, question: str, schema_context: str) -> Tuple[Tuple[str, str], Dict[str, Any], Optional[Translation]]:
+        """Parameterize a question and return a cached translation if one exists"""
+        template, params = parameterize(question)
+        key = (context_version(schema_context), template)
+        with self._lock:
+            entry = self._templates.get(key)
+            if entry is None:
+                self.misses += 1
+                return key, params, None
+            self._templates.move_to_end(key)
+            self.hits += 1
+        sql, cost = entry
+        return key, params, Translation(sql=sql, params=params, template=template, cached=True, plan_cost=cost)
+
+    def build_prompt(self, question: str, params: Dict[str, Any], schema_context: str) -> str:
+        """Prompt asking the LLM for parameterized SQL"""
+        parameters = "".join(f"- :{name} = {value!r}\n" for name, value in params.items())
+        if not parameters:
+            parameters = "- (no parameters)\n"
+        return SQL_PROMPT.format(schema=schema_context.strip(), parameters=parameters, question=question)
+
+    def validate(self, sql: str, params: Dict[str, Any], executor) -> Tuple[str, float]:
+        """Check the generated SQL once with EXPLAIN; returns (statement, plan cost)"""
+        statement = validate_select(sql)
+        missing = [name for name in params if not re.search(rf":{name}\b", statement)]
+        if missing:
+            raise QueryValidationError(f"Generated SQL does not use parameters: {', '.join(missing)}")
+        plan = executor.explain(statement, params)
+        cost = float(plan.get("Total Cost", 0.0))
+        if cost > self.max_plan_cost:
+            raise QueryValidationError(f"Query plan cost {cost:.0f} exceeds the ceiling of {self.max_plan_cost:.0f}")
+        return statement, cost
+
+    async def translate(self, question: str, schema_context: str,
+                        generate: Callable[[str], Awaitable[str]], executor) -> Translation:
+        """Return SQL for a question, from the template cache or via the LLM plus one-time validation"""
+        key, params, translation = self.lookup(question, schema_context)
+        if translation is not None:
+            return translation
+
+        prompt = self.build_prompt(question, params, schema_context)
+        self.llm_translations += 1
+        sql = extract_sql(await generate(prompt))
+        try:
+            statement, cost = await asyncio.to_thread(self.validate, sql, params, executor)
+        except QueryValidationError:
+            self.validation_failures += 1
+            raise
+        self.store(key, statement, cost)
+        return Translation(sql=statement, params=params, template=key[1], cached=False, plan_cost=cost)
+
+    def store(self, key: Tuple[str, str], statement: str, cost: float):
+        with self._lock:
+            self._templates[key] = (statement, cost)
+            self._templates.move_to_end(key)
+            while len(self._templates) > self.max_entries:
+                self._templates.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "templates": len(self._templates),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "llm_translations": self.llm_translations,
+                "validation_failures": self.validation_failures,
+                "max_plan_cost": self.max_plan_cost
+            }
+
+nl2sql_translator = NL2SQLTranslator()
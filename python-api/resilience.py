@@ -0,0 +1,268 @@
+"""
+Deadlines, circuit breaking and hedging for LLM calls.
+
+ResilientLLM wraps the chat model with the same ainvoke/astream calls:
+
+- every call has a deadline, so a hung upstream costs at most
+  LLM_TIMEOUT_SECONDS instead of tying up a slot indefinitely;
+- after LLM_BREAKER_FAILURES consecutive failures the circuit opens and
+  callers are told immediately (they serve the fallback response) instead
+  of queueing behind a dead upstream;
+- while open, a background probe retries the model with a tiny prompt
+  after a cool-down (with backoff). The circuit closes on the first
+  success, so no user request is spent discovering recovery;
+- optionally, a call still running past the LLM_HEDGE_PERCENTILE latency
+  of recent calls gets a second identical request, and the first answer
+  wins.
+"""
+
+import os
+import time
+import asyncio
+from collections import deque
+from typing import Dict, Any, List, Optional, AsyncIterator
+
+from concurrency import llm_gate
+
+# Resilience configuration
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_FIRST_TOKEN_TIMEOUT_SECONDS = float(os.getenv("LLM_FIRST_TOKEN_TIMEOUT_SECONDS", "15"))
+LLM_STREAM_TIMEOUT_SECONDS = float(os.getenv("LLM_STREAM_TIMEOUT_SECONDS", "120"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "15"))
+LLM_BREAKER_MAX_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_MAX_COOLDOWN_SECONDS", "120"))
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0"))  # e.g. 0.95; 0 disables hedging
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+PROBE_PROMPT = "Reply with the single word: ok"
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """Raised without calling the LLM while the circuit is open"""
+
+class LLMTimeoutError(Exception):
+    """Raised when an LLM call misses its deadline"""
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with background recovery probing"""
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES,
+                 cooldown_seconds: float = LLM_BREAKER_COOLDOWN_SECONDS,
+                 max_cooldown_seconds: float = LLM_BREAKER_MAX_COOLDOWN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.max_cooldown_seconds = max_cooldown_seconds
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.times_opened = 0
+        self.short_circuited = 0
+        self.probes = 0
+        self.last_error: Optional[str] = None
+        self._probe_task: Optional[asyncio.Task] = None
+
+    @property
+    def allows_requests(self) -> bool:
+        return self.state == CLOSED
+
+    def reject(self):
+        """Count and raise for a caller turned away by the open circuit"""
+        self.short_circuited += 1
+        raise CircuitOpenError(f"LLM circuit is {self.state}; serving fallback")
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        if self.state != CLOSED:
+            print("🟢 LLM circuit closed")
+        self.state = CLOSED
+        self.opened_at = None
+
+    def record_failure(self, error: BaseException, probe_call):
+        self.consecutive_failures += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+        if self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = time.time()
+            self.times_opened += 1
+            print(f"🔴 LLM circuit opened after {self.consecutive_failures} failures ({self.last_error})")
+            if self._probe_task is None or self._probe_task.done():
+                self._probe_task = asyncio.get_running_loop().create_task(self._probe_loop(probe_call))
+
+    async def _probe_loop(self, probe_call):
+        """While open, wait out the cool-down, then probe; back off on each failed probe"""
+        cooldown = self.cooldown_seconds
+        while self.state != CLOSED:
+            await asyncio.sleep(cooldown)
+            self.state = HALF_OPEN
+            self.probes += 1
+            try:
+                await probe_call()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                self.state = OPEN
+                self.opened_at = time.time()
+                cooldown = min(cooldown * 2, self.max_cooldown_seconds)
+                continue
+            self.record_success()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "opened_at": self.opened_at,
+            "times_opened": self.times_opened,
+            "short_circuited": self.short_circuited,
+            "probes": self.probes,
+            "last_error": self.last_error
+        }
+
+class ResilientLLM:
+    """Chat model wrapper adding deadlines, a circuit breaker and optional hedged requests"""
+
+    def __init__(self, llm, timeout_seconds: float = LLM_TIMEOUT_SECONDS,
+                 hedge_percentile: float = LLM_HEDGE_PERCENTILE):
+        self.llm = llm
+        self.timeout_seconds = timeout_seconds
+        self.first_token_timeout_seconds = LLM_FIRST_TOKEN_TIMEOUT_SECONDS
+        self.stream_timeout_seconds = LLM_STREAM_TIMEOUT_SECONDS
+        self.hedge_percentile = hedge_percentile
+        self.breaker = CircuitBreaker()
+        self._latencies: "deque[float]" = deque(maxlen=256)
+        self.timeouts = 0
+        self.hedges_started = 0
+        self.hedges_won = 0
+
+    @property
+    def accepting(self) -> bool:
+        """False while the circuit is open or half-open (callers should fall back)"""
+        return self.breaker.allows_requests
+
+    def admit(self) -> bool:
+        """Like accepting, but counts the caller as short-circuited when the circuit is open"""
+        if self.breaker.allows_requests:
+            return True
+        self.breaker.short_circuited += 1
+        return False
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds after which a second request is sent, or None when hedging is off"""
+        if not self.hedge_percentile or len(self._latencies) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(self.hedge_percentile * len(ordered)))]
+
+    async def _probe(self):
+        from langchain_core.messages import HumanMessage
+        await asyncio.wait_for(self.llm.ainvoke([HumanMessage(content=PROBE_PROMPT)]), self.timeout_seconds)
+
+    def _failed(self, error: BaseException):
+        self.breaker.record_failure(error, self._probe)
+
+    async def _hedged(self, messages: List, **kwargs):
+        primary = asyncio.ensure_future(self.llm.ainvoke(messages, **kwargs))
+        tasks = {primary}
+        hedge_slot = False
+        try:
+            delay = self.hedge_delay()
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                # Only hedge with spare capacity, never ahead of queued callers
+                if not done and await llm_gate.try_acquire():
+                    hedge_slot = True
+                    self.hedges_started += 1
+                    hedge = asyncio.ensure_future(self.llm.ainvoke(messages, **kwargs))
+                    tasks.add(hedge)
+                    while tasks:
+                        done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                        for task in done:
+                            if task.exception() is None:
+                                if task is hedge:
+                                    self.hedges_won += 1
+                                return task.result()
+                    # Both failed: surface the primary's error
+                    return primary.result()
+            return await primary
+        finally:
+            for task in (primary, *tasks):
+                if not task.done():
+                    task.cancel()
+            if hedge_slot:
+                llm_gate.release()
+
+    async def ainvoke(self, messages: List, **kwargs):
+        """ainvoke with a deadline, the circuit breaker and optional hedging"""
+        if not self.breaker.allows_requests:
+            self.breaker.reject()
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(self._hedged(messages, **kwargs), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            error = LLMTimeoutError(f"LLM call exceeded {self.timeout_seconds:g}s")
+            self._failed(error)
+            raise error
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._failed(e)
+            raise
+        self._latencies.append(time.perf_counter() - started)
+        self.breaker.record_success()
+        return result
+
+    async def astream(self, messages: List, **kwargs) -> AsyncIterator:
+        """astream with first-token and total deadlines and the circuit breaker"""
+        if not self.breaker.allows_requests:
+            self.breaker.reject()
+        started = time.perf_counter()
+        deadline = started + self.stream_timeout_seconds
+        iterator = self.llm.astream(messages, **kwargs).__aiter__()
+        first = True
+        try:
+            while True:
+                remaining = deadline - time.perf_counter()
+                if first:
+                    remaining = min(remaining, self.first_token_timeout_seconds)
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), max(remaining, 0.001))
+                except StopAsyncIteration:
+                    break
+                first = False
+                yield chunk
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            error = LLMTimeoutError("LLM stream missed its first-token or total deadline")
+            self._failed(error)
+            raise error
+        except (asyncio.CancelledError, GeneratorExit):
+            raise
+        except Exception as e:
+            self._failed(e)
+            raise
+        finally:
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None:
+                try:
+                    await aclose()
+                except Exception:
+                    pass
+        self._latencies.append(time.perf_counter() - started)
+        self.breaker.record_success()
+
+    def stats(self) -> Dict[str, Any]:
+        delay = self.hedge_delay()
+        return {
+            "circuit": self.breaker.stats(),
+            "timeout_seconds": self.timeout_seconds,
+            "timeouts": self.timeouts,
+            "hedging": {
+                "percentile": self.hedge_percentile or None,
+                "delay_seconds": round(delay, 3) if delay is not None else None,
+                "started": self.hedges_started,
+                "won": self.hedges_won
+            }
+        }
@@ -0,0 +1,128 @@
+"""
+LRU response cache with TTL for the chat endpoint.
+
+Keys combine the normalized question with a hash of the session's history
+window, or with no history at all for stateless FAQ-style questions. Every
+key also includes the live analytics grounding sent with the question (so an
+answer never outlives the figures it was based on) and the version of the
+schema context, and changing the context drops all cached responses.
+"""
+
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+# Cache configuration
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "900"))
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+# Questions whose answer does not depend on the conversation so far
+FAQ_PATTERNS = [
+    re.compile(p) for p in (
+        r"^(what|which) tables\b",
+        r"^(list|show)( me)?( all)?( the)? tables\b",
+        r"^(explain|describe)( me)?( the)? (database|schema)\b",
+        r"^what is the (database|schema)\b",
+        r"^(what|how) (are|is) the (tables|relationships)\b",
+        r"^what can you (do|help)\b",
+        r"^help$",
+    )
+]
+
+def normalize_message(message: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    message = _NON_WORD.sub(" ", message.lower())
+    return _WHITESPACE.sub(" ", message).strip()
+
+def is_faq(normalized_message: str) -> bool:
+    """Whether a normalized question is answered the same regardless of history"""
+    return any(pattern.search(normalized_message) for pattern in FAQ_PATTERNS)
+
+def context_version(context: str) -> str:
+    """Short hash identifying a schema context"""
+    return hashlib.blake2b(context.encode("utf-8"), digest_size=8).hexdigest()
+
+class ResponseCache:
+    """Bounded LRU of LLM responses with per-entry expiry"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.context_version = ""
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def make_key(self, message: str, history_text: str, grounding: str = "", stateless: bool = False) -> str:
+        """Cache key for a question, optionally ignoring the history window but never the grounding"""
+        normalized = normalize_message(message)
+        if stateless or is_faq(normalized):
+            history_text = ""
+            mode = "stateless"
+        else:
+            mode = "history"
+        raw = f"{self.context_version}\x00{mode}\x00{normalized}\x00{grounding}\x00{history_text}"
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a fresh cached response, counting the hit or miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, response: str):
+        """Store a response, evicting the least recently used entry when full"""
+        with self._lock:
+            self._entries[key] = (response, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def set_context(self, context: str):
+        """Record the current schema context, invalidating everything if it changed"""
+        version = context_version(context)
+        if version != self.context_version:
+            if self.context_version:
+                self.invalidate()
+            self.context_version = version
+
+    def invalidate(self):
+        """Drop all cached responses"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "context_version": self.context_version
+            }
+
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS)
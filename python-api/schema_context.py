@@ -0,0 +1,277 @@
+"""
+Live schema and statistics context for the LLM prompt.
+
+SchemaCache introspects information_schema (tables and column types), the
+catalog (primary and foreign keys) and pg_stats (value distributions) and
+renders one compact line per table, e.g.
+
+    customers ~50k: customer_id serial PK, gender varchar(10) [Female 51%, Male 49%], age int {18..80}, ...
+
+Row counts come from planner estimates rounded to two significant figures,
+and statistics are only read again when the structure or a rounded row
+count changes. The rendered text is therefore identical, byte for byte,
+between refreshes, and the prompt prefix and the response cache key
+(which hashes the context) stay valid until the database really changes.
+A cheap structure check runs every SCHEMA_REFRESH_SECONDS in the background.
+"""
+
+import os
+import re
+import time
+import hashlib
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from history import estimate_tokens
+from sql_executor import ALLOWED_TABLES
+
+# Schema context configuration
+SCHEMA_REFRESH_SECONDS = float(os.getenv("SCHEMA_REFRESH_SECONDS", "60"))  # 0 disables the background check
+SCHEMA_MAX_VALUES = int(os.getenv("SCHEMA_MAX_VALUES", "8"))  # categorical values listed per column
+SCHEMA_MAX_VALUE_CHARS = int(os.getenv("SCHEMA_MAX_VALUE_CHARS", "24"))
+
+# The e-commerce tables the assistant may query, without the precomputed aggregates. Everything
+# else in the database (users, chat sessions, migrations) stays out of the context and table listings
+CONTEXT_TABLES = frozenset(table for table in ALLOWED_TABLES if not table.startswith("agg_"))
+
+# Columns with more distinct values than this are summarized by a range rather than listed
+MAX_LISTED_DISTINCT = 25
+
+# Never put sample values of these columns into a prompt
+SENSITIVE_COLUMN = re.compile(r"pass|secret|token|hash|salt|email|phone|address|first_name|last_name|full_name", re.IGNORECASE)
+
+COLUMNS_SQL = """
+    SELECT c.table_name, c.column_name, c.data_type, c.character_maximum_length,
+           c.numeric_precision, c.numeric_scale, c.column_default
+    FROM information_schema.columns c
+    JOIN information_schema.tables t
+      ON t.table_schema = c.table_schema AND t.table_name = c.table_name
+    JOIN pg_class pc ON pc.oid = format('%I.%I', c.table_schema, c.table_name)::regclass
+    WHERE c.table_schema = 'public' AND t.table_type = 'BASE TABLE' AND NOT pc.relispartition
+    ORDER BY c.table_name, c.ordinal_position
+"""
+
+# From the catalog: information_schema's constraint views cost ~0.3s per check on a
+# partitioned schema, and they list every partition's copy of each foreign key
+KEYS_SQL = """
+    SELECT t.relname, CASE c.contype WHEN 'p' THEN 'PRIMARY KEY' ELSE 'FOREIGN KEY' END,
+           a.attname, ft.relname, fa.attname
+    FROM pg_constraint c
+    JOIN pg_class t ON t.oid = c.conrelid
+    JOIN pg_namespace n ON n.oid = t.relnamespace
+    CROSS JOIN LATERAL unnest(c.conkey, c.confkey) WITH ORDINALITY AS k(attnum, target_attnum, position)
+    JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum
+    LEFT JOIN pg_class ft ON ft.oid = c.confrelid
+    LEFT JOIN pg_attribute fa ON fa.attrelid = c.confrelid AND fa.attnum = k.target_attnum
+    WHERE n.nspname = 'public' AND c.contype IN ('p', 'f') AND NOT t.relispartition
+    ORDER BY 1, 2, c.conname, k.position
+"""
+
+# Planner estimates, NULL until the first ANALYZE (reltuples -1); partitioned tables sum their partitions
+ROW_ESTIMATES_SQL = """
+    SELECT c.relname,
+           CASE WHEN c.relkind = 'p' THEN (
+                    SELECT CASE WHEN bool_or(p.reltuples < 0) THEN NULL ELSE COALESCE(SUM(p.reltuples), 0) END
+                    FROM pg_inherits i JOIN pg_class p ON p.oid = i.inhrelid
+                    WHERE i.inhparent = c.oid)
+                WHEN c.reltuples >= 0 THEN c.reltuples END::bigint AS estimate
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p') AND NOT c.relispartition
+"""
+
+# inherited rows describe a partitioned table as a whole; prefer them when present
+STATS_SQL = """
+    SELECT tablename, attname, null_frac, n_distinct,
+           most_common_vals::text::text[], most_common_freqs, histogram_bounds::text::text[]
+    FROM pg_stats
+    WHERE schemaname = 'public'
+    ORDER BY tablename, attname, inherited
+"""
+
+NUMERIC_TYPES = {"smallint", "integer", "bigint", "numeric", "real", "double precision"}
+TEMPORAL_TYPES = {"date", "timestamp with time zone", "timestamp without time zone"}
+TEXT_TYPES = {"character varying", "character", "text"}
+
+SHORT_TYPES = {
+    "integer": "int", "smallint": "smallint", "bigint": "bigint", "text": "text", "boolean": "bool",
+    "real": "real", "double precision": "float8", "date": "date", "uuid": "uuid", "jsonb": "jsonb",
+    "timestamp with time zone": "timestamptz", "timestamp without time zone": "timestamp",
+}
+
+def quote_identifier(name: str) -> str:
+    """Column and table names as they must be written in SQL"""
+    if name.isidentifier() and name == name.lower():
+        return name
+    return '"' + name.replace('"', '""') + '"'
+
+def short_type(data_type: str, length, precision, scale, default) -> str:
+    if default and str(default).startswith("nextval("):
+        return "bigserial" if data_type == "bigint" else "serial"
+    if data_type == "character varying":
+        return f"varchar({length})" if length else "varchar"
+    if data_type == "character":
+        return f"char({length})" if length else "char"
+    if data_type == "numeric":
+        return f"decimal({precision},{scale})" if precision is not None else "decimal"
+    return SHORT_TYPES.get(data_type, data_type)
+
+def approximate(count: int) -> str:
+    """Row count rounded to two significant figures (stable while a table grows slowly)"""
+    if count < 100:
+        return str(count)
+    digits = len(str(count)) - 2
+    rounded = round(count, -digits)
+    for threshold, suffix in ((1_000_000_000, "B"), (1_000_000, "M"), (1_000, "k")):
+        if rounded >= threshold:
+            return f"{rounded / threshold:g}{suffix}"
+    return str(rounded)
+
+def clip_value(value: str) -> str:
+    if len(value) <= SCHEMA_MAX_VALUE_CHARS:
+        return value
+    return value[:SCHEMA_MAX_VALUE_CHARS - 1] + "…"
+
+def share(fraction: float) -> str:
+    percent = round(fraction * 100)
+    return f"{percent}%" if percent >= 1 else "<1%"
+
+class SchemaCache:
+    """Introspected schema, statistics and the rendered prompt text, refreshed when the database changes"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.text = ""
+        self.tables: List[str] = []
+        self.fingerprint: Optional[str] = None
+        self.checks = 0
+        self.renders = 0
+        self.changed_at: Optional[float] = None
+        self.last_check_seconds: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> bool:
+        """Re-check the structure; re-read statistics and re-render only if it changed.
+
+        Returns True when the rendered text changed.
+        """
+        with self._lock:
+            started = time.perf_counter()
+            with self.engine.connect() as connection:
+                columns = [tuple(row) for row in connection.execute(text(COLUMNS_SQL))]
+                keys = [tuple(row) for row in connection.execute(text(KEYS_SQL))]
+                estimates = {name: approximate(int(estimate))
+                             for name, estimate in connection.execute(text(ROW_ESTIMATES_SQL))
+                             if name in CONTEXT_TABLES and estimate is not None}
+                structure = (columns, keys, sorted(estimates.items()))
+                fingerprint = hashlib.sha256(repr(structure).encode("utf-8")).hexdigest()
+                self.checks += 1
+                if fingerprint == self.fingerprint:
+                    self.last_check_seconds = time.perf_counter() - started
+                    return False
+                stats = [tuple(row) for row in connection.execute(text(STATS_SQL))]
+            rendered, tables = render_schema(columns, keys, estimates, stats)
+            self.fingerprint = fingerprint
+            self.last_check_seconds = time.perf_counter() - started
+            if rendered == self.text:
+                return False
+            self.text = rendered
+            self.tables = tables
+            self.renders += 1
+            self.changed_at = time.time()
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "source": "live",
+            "tables": len(self.tables),
+            "chars": len(self.text),
+            "estimated_tokens": estimate_tokens(self.text),
+            "fingerprint": self.fingerprint[:12] if self.fingerprint else None,
+            "checks": self.checks,
+            "renders": self.renders,
+            "changed_at": self.changed_at,
+            "last_check_seconds": round(self.last_check_seconds, 4) if self.last_check_seconds is not None else None,
+            "refresh_interval_seconds": SCHEMA_REFRESH_SECONDS
+        }
+
+def describe_values(data_type: str, rows: str, stat: Optional[Tuple], lookup: bool = False) -> str:
+    """Value distribution suffix for one column from its pg_stats row, or "" if nothing useful is known"""
+    if stat is None:
+        return ""
+    null_frac, n_distinct, common, freqs, bounds = stat
+    common, freqs, bounds = common or [], freqs or [], bounds or []
+    nulls = f" {share(null_frac)} null" if null_frac and null_frac >= 0.01 else ""
+    # n_distinct < 0 is a fraction of the rows, i.e. the column grows with the table
+    if data_type in TEXT_TYPES or data_type == "boolean":
+        if 0 < n_distinct <= SCHEMA_MAX_VALUES and common:
+            values = ", ".join(f"{clip_value(value)} {share(freq)}" for value, freq in zip(common, freqs))
+            return f" [{values}]{nulls}"
+        if 0 < n_distinct <= MAX_LISTED_DISTINCT and common:
+            values = ", ".join(clip_value(value) for value in common[:5])
+            return f" [{values}, … {int(n_distinct)} values]{nulls}"
+        if lookup and data_type != "text" and rows.isdigit() and 0 < int(rows) <= SCHEMA_MAX_VALUES and (bounds or common):
+            # Small lookup table (the target of a foreign key): list every value
+            return f" [{', '.join(clip_value(value) for value in sorted(bounds or common))}]{nulls}"
+        return nulls
+    if data_type in NUMERIC_TYPES or data_type in TEMPORAL_TYPES:
+        values = list(bounds) + list(common)
+        if not values:
+            return nulls
+        if data_type in NUMERIC_TYPES:
+            low, high = min(values, key=float), max(values, key=float)
+        else:
+            # ISO dates and timestamps sort as text; the date part is enough for context
+            low, high = min(values)[:10], max(values)[:10]
+        if 0 < n_distinct <= SCHEMA_MAX_VALUES and data_type in NUMERIC_TYPES and common:
+            values = ", ".join(f"{value} {share(freq)}" for value, freq in zip(common, freqs))
+            return f" [{values}]{nulls}"
+        return f" {{{low}..{high}}}{nulls}"
+    return nulls
+
+def render_schema(columns: List[Tuple], keys: List[Tuple], estimates: Dict[str, str],
+                  stats: List[Tuple]) -> Tuple[str, List[str]]:
+    """Render one line per table; output depends only on the arguments, never on timing or order of arrival"""
+    primary: Dict[str, List[str]] = {}  # key columns in key order
+    foreign: Dict[Tuple[str, str], str] = {}
+    referenced = set()
+    for table, kind, column, target_table, target_column in keys:
+        if kind == "PRIMARY KEY":
+            primary.setdefault(table, []).append(column)
+        elif target_table:
+            foreign[(table, column)] = f"{quote_identifier(target_table)}.{quote_identifier(target_column)}"
+            referenced.add(target_table)
+
+    by_column: Dict[Tuple[str, str], Tuple] = {}
+    for table, column, *values in stats:
+        # Rows are ordered with inherited last, so a partitioned table's whole-table row wins
+        by_column[(table, column)] = tuple(values)
+
+    tables: Dict[str, List[str]] = {}
+    for table, column, data_type, length, precision, scale, default in columns:
+        if table not in CONTEXT_TABLES:
+            continue
+        key = primary.get(table, [])
+        part = f"{quote_identifier(column)} {short_type(data_type, length, precision, scale, default)}"
+        if key == [column]:
+            part += " PK"
+        if (table, column) in foreign:
+            part += f" → {foreign[(table, column)]}"
+        elif column not in key and not SENSITIVE_COLUMN.search(column):
+            part += describe_values(data_type, estimates.get(table, ""), by_column.get((table, column)),
+                                    lookup=table in referenced)
+        tables.setdefault(table, []).append(part)
+
+    lines = ["DATABASE SCHEMA (PostgreSQL; table ~rows: columns; [common values with share of rows], "
+             "{min..max}, → foreign key):"]
+    for table in sorted(tables):
+        key = primary.get(table, [])
+        if len(key) > 1:
+            # A composite key is one constraint; per-column markers would read as several keys
+            tables[table].append(f"PK({', '.join(quote_identifier(column) for column in key)})")
+        rows = estimates.get(table)
+        lines.append(f"{quote_identifier(table)}{f' ~{rows}' if rows and rows != '0' else ''}: "
+                     + ", ".join(tables[table]))
+    return "\n".join(lines), sorted(tables)
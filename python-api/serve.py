@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Production launcher for the chat API.
+
+Runs uvicorn without auto-reload, with one worker process per CPU by
+default, using uvloop and httptools when they are installed
+(pip install uvloop httptools). Each worker starts accepting requests as
+soon as the LLM client and database pool are up and warms its caches in
+the background; route traffic on GET /ready, which answers 503 until a
+worker is warm. Use --reload for development.
+"""
+
+import os
+import sys
+import argparse
+import importlib.util
+
+# Launcher configuration
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_WORKERS = int(os.getenv("WEB_CONCURRENCY", "0"))  # 0 = one per CPU
+API_LOOP = os.getenv("API_LOOP", "auto")  # auto | uvloop | asyncio
+API_HTTP = os.getenv("API_HTTP", "auto")  # auto | httptools | h11
+API_KEEP_ALIVE_SECONDS = int(os.getenv("API_KEEP_ALIVE_SECONDS", "5"))
+API_LIMIT_CONCURRENCY = int(os.getenv("API_LIMIT_CONCURRENCY", "0"))  # 0 = unlimited; excess gets 503
+API_BACKLOG = int(os.getenv("API_BACKLOG", "2048"))
+
+def installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+def choose(option: str, value: str, fast: str, fallback: str) -> str:
+    """Resolve auto to the fast implementation when installed; fail on an explicit missing one"""
+    if value == "auto":
+        return fast if installed(fast) else fallback
+    if value == fast and not installed(fast):
+        raise SystemExit(f"--{option} {fast} requested but {fast} is not installed (pip install {fast})")
+    return value
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the chat API with production settings")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--workers", type=int, default=API_WORKERS, help="worker processes (0 = one per CPU)")
+    parser.add_argument("--loop", choices=("auto", "uvloop", "asyncio"), default=API_LOOP)
+    parser.add_argument("--http", choices=("auto", "httptools", "h11"), default=API_HTTP)
+    parser.add_argument("--keep-alive", type=int, default=API_KEEP_ALIVE_SECONDS, help="idle keep-alive seconds")
+    parser.add_argument("--limit-concurrency", type=int, default=API_LIMIT_CONCURRENCY,
+                        help="connections per worker before answering 503 (0 = unlimited)")
+    parser.add_argument("--backlog", type=int, default=API_BACKLOG)
+    parser.add_argument("--log-level", default=os.getenv("API_LOG_LEVEL", "info"))
+    parser.add_argument("--access-log", action="store_true", help="log every request (off by default)")
+    parser.add_argument("--reload", action="store_true", help="development mode: one worker, restart on code changes")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    workers = 1 if args.reload else (args.workers or os.cpu_count() or 1)
+    loop = choose("loop", args.loop, "uvloop", "asyncio")
+    http = choose("http", args.http, "httptools", "h11")
+
+    print(f"🚀 Serving on http://{args.host}:{args.port} with {workers} worker(s), loop={loop}, http={http}"
+          f"{', reload' if args.reload else ''}")
+    if workers > 1 and os.getenv("SESSION_BACKEND", "memory") == "memory":
+        print("⚠️ SESSION_BACKEND=memory keeps sessions per worker; use postgres or sqlite so every worker sees them")
+    if workers > 1:
+        print("ℹ️ LLM_MAX_CONCURRENCY, caches and WebSocket sessions apply per worker")
+
+    # Run from this directory so "main:app" resolves however the launcher was started
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, os.getcwd())
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        loop=loop,
+        http=http,
+        reload=args.reload,
+        timeout_keep_alive=args.keep_alive,
+        limit_concurrency=args.limit_concurrency or None,
+        backlog=args.backlog,
+        log_level=args.log_level,
+        access_log=args.access_log,
+        proxy_headers=True
+    )
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,225 @@
+"""
+Persistent session backends for the chat session store.
+
+The in-process SessionStore acts as a read-through cache in front of a
+backend. Turns are persisted with write-behind batching: the request path
+only enqueues them and a background thread writes them in batches.
+"""
+
+import os
+import queue
+import threading
+import uuid
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import (
+    MetaData, Table, Column, Integer, BigInteger, String, Text, DateTime,
+    Index, create_engine, select, delete, func
+)
+
+# Backend configuration
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")  # memory | sqlite | postgres
+SESSION_SQLITE_PATH = os.getenv("SESSION_SQLITE_PATH", "sessions.db")
+SESSION_FLUSH_INTERVAL_MS = int(os.getenv("SESSION_FLUSH_INTERVAL_MS", "200"))
+SESSION_FLUSH_BATCH = int(os.getenv("SESSION_FLUSH_BATCH", "500"))
+SESSION_REVALIDATE_SECONDS = float(os.getenv("SESSION_REVALIDATE_SECONDS", "2"))
+SESSION_ID_MAX_LENGTH = 64  # width of chat_session_turns.session_id; the API rejects longer ids
+
+# Identifies turns written by this process so cache catch-up skips them
+WORKER_ID = uuid.uuid4().hex[:16]
+
+metadata = MetaData()
+
+chat_session_turns = Table(
+    "chat_session_turns",
+    metadata,
+    Column("turn_id", BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True),
+    Column("session_id", String(SESSION_ID_MAX_LENGTH), nullable=False),
+    Column("worker_id", String(16), nullable=False),
+    Column("user_message", Text, nullable=False),
+    Column("assistant_message", Text, nullable=False),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Index("idx_chat_session_turns_session", "session_id", "turn_id"),
+)
+
+class MemoryBackend:
+    """No persistence: sessions live only in the process-local store"""
+
+    name = "memory"
+    persistent = False
+
+    def load(self, session_id: str, after_turn_id: Optional[int] = None) -> Tuple[List[Tuple[str, str]], int]:
+        return [], after_turn_id or 0
+
+    def append(self, session_id: str, user_message: str, assistant_message: str):
+        pass
+
+    def delete(self, session_id: str) -> bool:
+        return False
+
+    def clear(self):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+class SQLSessionBackend:
+    """Session turns stored in a SQL table (PostgreSQL or SQLite) with write-behind batching"""
+
+    persistent = True
+
+    def __init__(self, engine, flush_interval_ms: int = SESSION_FLUSH_INTERVAL_MS,
+                 flush_batch: int = SESSION_FLUSH_BATCH):
+        self.engine = engine
+        self.name = engine.dialect.name
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.flush_batch = flush_batch
+        self._queue: "queue.Queue[Dict[str, str]]" = queue.Queue()
+        self._flush_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.rows_written = 0
+        self.batches_written = 0
+        self.write_errors = 0
+        self.rows_dropped = 0
+
+        metadata.create_all(engine, tables=[chat_session_turns])
+
+        self._writer = threading.Thread(target=self._run_writer, name="session-write-behind", daemon=True)
+        self._writer.start()
+
+    def load(self, session_id: str, after_turn_id: Optional[int] = None) -> Tuple[List[Tuple[str, str]], int]:
+        """Read all turns, or only those newer than after_turn_id; returns (turns, last_turn_id)"""
+        catching_up = after_turn_id is not None
+        if not catching_up:
+            # A cold load must also see this worker's queued turns
+            self.flush()
+        query = (
+            select(
+                chat_session_turns.c.turn_id,
+                chat_session_turns.c.worker_id,
+                chat_session_turns.c.user_message,
+                chat_session_turns.c.assistant_message,
+            )
+            .where(chat_session_turns.c.session_id == session_id)
+            .where(chat_session_turns.c.turn_id > (after_turn_id or 0))
+            .order_by(chat_session_turns.c.turn_id)
+        )
+        with self.engine.connect() as connection:
+            rows = connection.execute(query).fetchall()
+        if not rows:
+            return [], after_turn_id or 0
+        if catching_up:
+            # Catching up: our own writes are already in the local cache
+            turns = [(row.user_message, row.assistant_message) for row in rows if row.worker_id != WORKER_ID]
+        else:
+            turns = [(row.user_message, row.assistant_message) for row in rows]
+        return turns, rows[-1].turn_id
+
+    def append(self, session_id: str, user_message: str, assistant_message: str):
+        """Queue a turn for the background writer"""
+        self._queue.put({
+            "session_id": session_id,
+            "worker_id": WORKER_ID,
+            "user_message": user_message,
+            "assistant_message": assistant_message,
+        })
+
+    def delete(self, session_id: str) -> bool:
+        self.flush()
+        with self.engine.begin() as connection:
+            result = connection.execute(
+                delete(chat_session_turns).where(chat_session_turns.c.session_id == session_id)
+            )
+        return result.rowcount > 0
+
+    def clear(self):
+        self.flush()
+        with self.engine.begin() as connection:
+            connection.execute(delete(chat_session_turns))
+
+    def flush(self):
+        """Write every queued turn now and wait for any batch the writer holds"""
+        while True:
+            batch = self._drain(block=False)
+            if not batch:
+                break
+            self._write(batch)
+        self._queue.join()
+
+    def close(self):
+        self._stopping.set()
+        self._writer.join(timeout=5)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "pending_writes": self._queue.qsize(),
+            "rows_written": self.rows_written,
+            "batches_written": self.batches_written,
+            "write_errors": self.write_errors,
+            "rows_dropped": self.rows_dropped
+        }
+
+    def _drain(self, block: bool) -> List[Dict[str, str]]:
+        batch = []
+        try:
+            if block:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+            while len(batch) < self.flush_batch:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _write(self, batch: List[Dict[str, str]]):
+        with self._flush_lock:
+            try:
+                with self.engine.begin() as connection:
+                    connection.execute(chat_session_turns.insert(), batch)
+                self.rows_written += len(batch)
+                self.batches_written += 1
+            except Exception as e:
+                self.write_errors += 1
+                print(f"Session write-behind error, retrying {len(batch)} turns one by one: {e}")
+                # One bad row must not cost the other sessions their turns
+                for row in batch:
+                    self._write_row(row)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_row(self, row: Dict[str, str]):
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(chat_session_turns.insert(), row)
+            self.rows_written += 1
+        except Exception as e:
+            self.rows_dropped += 1
+            print(f"Session write-behind error (1 turn dropped): {e}")
+
+    def _run_writer(self):
+        while not self._stopping.is_set():
+            batch = self._drain(block=True)
+            if batch:
+                self._write(batch)
+
+def create_session_backend(db_engine=None):
+    """Build the backend selected by SESSION_BACKEND"""
+    try:
+        if SESSION_BACKEND == "postgres":
+            if db_engine is None:
+                raise ValueError("SESSION_BACKEND=postgres requires a database connection")
+            return SQLSessionBackend(db_engine)
+        if SESSION_BACKEND == "sqlite":
+            engine = create_engine(f"sqlite:///{SESSION_SQLITE_PATH}")
+            return SQLSessionBackend(engine)
+    except Exception as e:
+        print(f"Session backend error: {e} - falling back to in-memory sessions")
+    return MemoryBackend()
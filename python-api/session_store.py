@@ -0,0 +1,258 @@
+"""
+Bounded in-process session store for chat conversations.
+
+Sessions are kept in least-recently-used order and evicted when they sit
+idle longer than the TTL, when the session count limit is reached, or when
+the total size of stored turns and their prompt history windows exceeds
+the byte budget. Pinned sessions
+(held by an open WebSocket) are never evicted. With a persistent
+backend attached the store is a read-through cache: evicted sessions are
+reloaded from the backend on their next request.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from session_backend import MemoryBackend, SESSION_REVALIDATE_SECONDS
+from history import HistoryWindow
+
+# Store configuration
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "3600"))
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "10000"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Approximate fixed cost of one stored turn (tuple + two str headers)
+TURN_OVERHEAD_BYTES = 160
+
+def turn_size(user_message: str, assistant_message: str) -> int:
+    """Approximate memory footprint of one conversation turn"""
+    return len(user_message.encode("utf-8")) + len(assistant_message.encode("utf-8")) + TURN_OVERHEAD_BYTES
+
+class SessionMemory:
+    """Compact conversation memory: (user, assistant) string pairs plus a prompt-ready history window"""
+
+    __slots__ = ("session_id", "turns", "history", "size_bytes", "last_access",
+                 "persisted_turn_id", "validated_at", "_store")
+
+    def __init__(self, session_id: str, store: Optional["SessionStore"] = None):
+        self.session_id = session_id
+        self.turns: List[Tuple[str, str]] = []
+        self.history = HistoryWindow()
+        self.size_bytes = 0
+        self.last_access = time.monotonic()
+        self.persisted_turn_id = 0
+        self.validated_at = self.last_access
+        self._store = store
+
+    def save_context(self, inputs: Dict[str, str], outputs: Dict[str, str]):
+        """Append a turn (same call shape as LangChain's ConversationBufferMemory)"""
+        self.append_turn(inputs["input"], outputs["output"])
+
+    def append_turn(self, user_message: str, assistant_message: str):
+        """Append a turn and account for its size in the owning store"""
+        size = self._add_turn(user_message, assistant_message)
+        if self._store is not None:
+            self._store.account(self, size)
+            self._store.backend.append(self.session_id, user_message, assistant_message)
+
+    def extend_turns(self, turns: List[Tuple[str, str]]) -> int:
+        """Add turns loaded from the backend without re-persisting them"""
+        return sum(self._add_turn(user_message, assistant_message) for user_message, assistant_message in turns)
+
+    def drop_oldest_turn(self) -> int:
+        """Remove the oldest turn (from the history window too) and return the bytes freed"""
+        history_bytes = self.history.nbytes
+        user_message, assistant_message = self.turns.pop(0)
+        if len(self.history.turns) > len(self.turns):
+            # The window still holds the turn verbatim; keep only its summary line
+            self.history.fold_oldest()
+        size = turn_size(user_message, assistant_message) + history_bytes - self.history.nbytes
+        self.size_bytes -= size
+        return size
+
+    def _add_turn(self, user_message: str, assistant_message: str) -> int:
+        history_bytes = self.history.nbytes
+        self.turns.append((user_message, assistant_message))
+        self.history.append(user_message, assistant_message)
+        size = turn_size(user_message, assistant_message) + self.history.nbytes - history_bytes
+        self.size_bytes += size
+        return size
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+class SessionStore:
+    """LRU session store with idle TTL, count limit and byte budget"""
+
+    def __init__(self, ttl_seconds: float, max_sessions: int, max_bytes: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._sessions: "OrderedDict[str, SessionMemory]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._pinned: Dict[str, int] = {}
+        self.backend = MemoryBackend()
+        self.total_bytes = 0
+        self.evictions = {"ttl": 0, "capacity": 0, "memory": 0}
+        self.trimmed_turns = 0
+        self.backend_loads = 0
+
+    def attach_backend(self, backend):
+        """Use a persistent backend behind the in-process cache"""
+        with self._lock:
+            self.backend = backend
+            self._sessions.clear()
+            self.total_bytes = 0
+
+    def get(self, session_id: str) -> Optional[SessionMemory]:
+        """Return a live session and mark it most recently used"""
+        with self._lock:
+            self._expire()
+            memory = self._sessions.get(session_id)
+            if memory is not None:
+                memory.last_access = time.monotonic()
+                self._sessions.move_to_end(session_id)
+            return memory
+
+    def get_or_create(self, session_id: str) -> SessionMemory:
+        """Return the session, loading it from the backend or creating it on a miss"""
+        memory = self.get(session_id)
+        if memory is not None:
+            if self.backend.persistent and time.monotonic() - memory.validated_at > SESSION_REVALIDATE_SECONDS:
+                self._catch_up(memory)
+            return memory
+
+        # Read through to the backend outside the store lock
+        turns, last_turn_id = self.backend.load(session_id)
+        with self._lock:
+            memory = self._sessions.get(session_id)
+            if memory is not None:
+                # Another request populated the cache meanwhile
+                return memory
+            while len(self._sessions) >= self.max_sessions:
+                if not self._evict_lru("capacity"):
+                    break
+            memory = SessionMemory(session_id, self)
+            memory.persisted_turn_id = last_turn_id
+            self._sessions[session_id] = memory
+            if turns:
+                self.backend_loads += 1
+                self.account(memory, memory.extend_turns(turns))
+            return memory
+
+    def _catch_up(self, memory: SessionMemory):
+        # Pick up turns other workers appended since the last check
+        turns, last_turn_id = self.backend.load(memory.session_id, memory.persisted_turn_id)
+        with self._lock:
+            memory.persisted_turn_id = last_turn_id
+            memory.validated_at = time.monotonic()
+            if turns:
+                self.account(memory, memory.extend_turns(turns))
+
+    def account(self, memory: SessionMemory, size: int):
+        """Record growth of a session and enforce the byte budget"""
+        with self._lock:
+            if self._sessions.get(memory.session_id) is not memory:
+                # Session was evicted or cleared while the turn was running
+                return
+            memory.last_access = time.monotonic()
+            self._sessions.move_to_end(memory.session_id)
+            self.total_bytes += size
+            # Evict other sessions first, least recently used first
+            while self.total_bytes > self.max_bytes and len(self._sessions) > 1:
+                if not self._evict_lru("memory", keep=memory.session_id):
+                    break
+            # A single session larger than the budget loses its oldest turns
+            while self.total_bytes > self.max_bytes and len(memory.turns) > 1:
+                self.total_bytes -= memory.drop_oldest_turn()
+                self.trimmed_turns += 1
+
+    def pin(self, session_id: str):
+        """Keep a session resident until unpin() (calls nest)"""
+        with self._lock:
+            self._pinned[session_id] = self._pinned.get(session_id, 0) + 1
+
+    def unpin(self, session_id: str):
+        with self._lock:
+            count = self._pinned.get(session_id, 0) - 1
+            if count > 0:
+                self._pinned[session_id] = count
+            else:
+                self._pinned.pop(session_id, None)
+
+    def delete(self, session_id: str) -> bool:
+        """Remove a session from the cache and backend, returning whether it existed"""
+        with self._lock:
+            memory = self._sessions.pop(session_id, None)
+            if memory is not None:
+                self.total_bytes -= memory.size_bytes
+        persisted = self.backend.delete(session_id)
+        return memory is not None or persisted
+
+    def clear(self):
+        """Remove all sessions from the cache and backend"""
+        with self._lock:
+            self._sessions.clear()
+            self.total_bytes = 0
+        self.backend.clear()
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            self._expire()
+            return list(self._sessions.keys())
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._expire()
+            return len(self._sessions)
+
+    def stats(self) -> Dict[str, Any]:
+        """Store size and eviction counters"""
+        with self._lock:
+            self._expire()
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "pinned": len(self._pinned),
+                "ttl_seconds": self.ttl_seconds,
+                "evictions": dict(self.evictions),
+                "trimmed_turns": self.trimmed_turns,
+                "backend_loads": self.backend_loads,
+                "backend": self.backend.stats()
+            }
+
+    def _evict_lru(self, reason: str, keep: Optional[str] = None) -> bool:
+        # Skip over pinned sessions (and `keep`), moving them to the back
+        for _ in range(len(self._sessions)):
+            session_id = next(iter(self._sessions))
+            if session_id not in self._pinned and session_id != keep:
+                memory = self._sessions.pop(session_id)
+                self.total_bytes -= memory.size_bytes
+                self.evictions[reason] += 1
+                return True
+            self._sessions.move_to_end(session_id)
+        return False
+
+    def _expire(self):
+        # LRU order means idle sessions sit at the front
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._sessions:
+            session_id, memory = next(iter(self._sessions.items()))
+            if memory.last_access >= cutoff:
+                break
+            if session_id in self._pinned:
+                # Held by a connection: treat as fresh
+                memory.last_access = time.monotonic()
+                self._sessions.move_to_end(session_id)
+                continue
+            self._evict_lru("ttl")
+
+session_store = SessionStore(SESSION_TTL_SECONDS, SESSION_MAX_COUNT, SESSION_MAX_BYTES)
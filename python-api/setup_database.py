@@ -5,6 +5,7 @@ Database setup script to create tables for the DBMS Mini Project
 
 import os
 import sys
+import argparse
 import psycopg2
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 import bcrypt
@@ -12,6 +13,14 @@ import bcrypt
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from analytics import refresh_aggregates
+from migrations import (
+    Migration, run_migrations, migration_status, analytics_tables, hot_path_indexes, partition_transactions,
+    query_reader_role, analytics_refresh_horizon, analytics_change_log, grant_query_role
+)
+from bulk_loader import bulk_load, BULK_WORKERS, BULK_BATCH_ROWS
+from sql_executor import QUERY_ROLE
+
 # Database configuration
 DB_CONFIG = {
     'host': os.getenv('POSTGRES_HOST', 'localhost'),
@@ -114,6 +123,18 @@ def create_tables(connection):
     
     print("✅ All tables created successfully!")
 
+# Versioned schema changes, applied in order and recorded in schema_migrations.
+# Add new migrations at the end with the next version number; never edit applied ones.
+MIGRATIONS = [
+    Migration(1, "initial_schema", create_tables),
+    Migration(2, "analytics_tables", analytics_tables),
+    Migration(3, "hot_path_indexes", hot_path_indexes, transactional=False),
+    Migration(4, "partition_transactions_by_date", partition_transactions, optional=True),
+    Migration(5, "query_reader_role", query_reader_role),
+    Migration(6, "analytics_refresh_horizon", analytics_refresh_horizon),
+    Migration(7, "analytics_change_log", analytics_change_log),
+]
+
 def insert_sample_data(connection):
     """Insert sample data"""
     cursor = connection.cursor()
@@ -183,8 +204,30 @@ def insert_sample_data(connection):
     
     print("✅ Sample data inserted successfully!")
 
-def main():
+def print_load_report(report):
+    """Print rows/sec per table for a bulk load"""
+    for table, stats in sorted(report["tables"].items()):
+        print(f"   {table:<22} {stats['rows']:>12,} rows  {stats['seconds']:>8.2f}s  {stats['rows_per_sec'] or 0:>10,} rows/s")
+    print(f"   {'total':<22} {report['rows']:>12,} rows  {report['seconds']:>8.2f}s  {report['rows_per_sec'] or 0:>10,} rows/s")
+    print(f"   indexes and foreign keys rebuilt in {report['index_rebuild_seconds']:.2f}s")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Create the DBMS Mini Project schema and load data")
+    parser.add_argument("--load", nargs="+", metavar="PATH",
+                        help="bulk load CSV files (named <table>.csv[.gz]), directories of them, or SQL dumps via COPY "
+                             "instead of inserting the sample rows")
+    parser.add_argument("--truncate", action="store_true", help="empty the target tables before loading")
+    parser.add_argument("--workers", type=int, default=BULK_WORKERS, help="tables loaded in parallel")
+    parser.add_argument("--partition-transactions", action="store_true",
+                        help="range-partition transactions by month of transaction_date (optional migration)")
+    parser.add_argument("--migrate-only", action="store_true", help="apply pending migrations and exit")
+    parser.add_argument("--status", action="store_true", help="list migrations and whether they are applied")
+    parser.add_argument("--batch-rows", type=int, default=BULK_BATCH_ROWS, help="rows sent per COPY batch")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Main setup function"""
+    args = parse_args(argv)
     print("🚀 Setting up DBMS Mini Project database...")
     
     # Create connection
@@ -194,11 +237,36 @@ def main():
         return False
     
     try:
-        # Create tables
-        create_tables(connection)
+        if args.status:
+            for migration in migration_status(connection, MIGRATIONS):
+                state = migration["applied_at"] or ("optional" if migration["optional"] else "pending")
+                print(f"   {migration['version']:03d} {migration['name']:<34} {state}")
+            return True
+        
+        # Apply pending schema migrations
+        optional = ["partition_transactions_by_date"] if args.partition_transactions else []
+        applied = run_migrations(connection, MIGRATIONS, include_optional=optional)
+        if not applied:
+            print("✅ Schema is up to date")
+        if args.migrate_only:
+            return True
+        
+        if args.load:
+            # Stream the given files through COPY
+            print(f"📦 Bulk loading {', '.join(args.load)}...")
+            report = bulk_load(DB_CONFIG, args.load, truncate=args.truncate,
+                               workers=args.workers, batch_rows=args.batch_rows)
+            print_load_report(report)
+            # A dump may have created tables (such as sales) after the migrations granted access
+            if QUERY_ROLE:
+                grant_query_role(connection.cursor())
+        else:
+            # Insert sample data
+            insert_sample_data(connection)
         
-        # Insert sample data
-        insert_sample_data(connection)
+        # Build precomputed analytics aggregates
+        refresh_aggregates(connection, full=True)
+        print("✅ Analytics aggregates built successfully!")
         
         print("🎉 Database setup completed successfully!")
         print(f"📊 Connected to database: {DB_CONFIG['database']}")
@@ -0,0 +1,324 @@
+"""
+Read-only SQL execution on the pooled database engine.
+
+Statements are checked to be a single SELECT (or WITH ... SELECT) that only
+touches the e-commerce tables, then run inside a READ ONLY transaction with
+a statement timeout, as QUERY_ROLE: a role that can only SELECT the allowed
+tables (created by the query_reader_role migration). The lexical and plan
+checks give clear errors; the role is what holds when they miss something,
+e.g. a function that runs a query from a string the plan cannot see into.
+
+Results are read through a server-side cursor and streamed to the client as
+NDJSON, stopping at the row cap.
+"""
+
+import os
+import re
+import time
+import json
+import threading
+from collections import deque
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Any, List, Optional, Iterator
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+
+# Executor configuration
+QUERY_STATEMENT_TIMEOUT_MS = int(os.getenv("QUERY_STATEMENT_TIMEOUT_MS", "5000"))
+QUERY_MAX_ROWS = int(os.getenv("QUERY_MAX_ROWS", "10000"))
+QUERY_FETCH_BATCH = int(os.getenv("QUERY_FETCH_BATCH", "500"))
+QUERY_ROLE = os.getenv("QUERY_ROLE", "assistant_reader")  # empty runs queries as the app's own user
+
+# Tables the assistant may read
+ALLOWED_TABLES = {
+    "categories", "products", "customers", "transactions", "transaction_details", "sales",
+    # Precomputed aggregates (see analytics.py)
+    "agg_category_month_revenue", "agg_product_sales", "agg_payment_methods", "agg_customer_demographics"
+}
+
+# Monthly partitions of transactions (see migrations.py) show up in query plans
+_ALLOWED_PARTITIONS = re.compile(r"^transactions_(p\d{6}|default)$")
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_STRING_LITERALS = re.compile(r"'(?:[^']|'')*'")
+_FORBIDDEN = re.compile(
+    r"\b(insert|update|delete|merge|truncate|drop|alter|create|grant|revoke|copy|call|do|"
+    r"vacuum|analyze|lock|set|reset|listen|notify|prepare|execute|into)\b"
+    r"|\bpg_\w+|\bdblink\w*|\blo_\w+"
+    # Settings (statement_timeout, role) and functions that run a query given as a string
+    r"|\bset_config\b|\bts_stat\b|\bts_rewrite\b|\b\w*_to_xml\w*|\bquery_to_\w+",
+    re.IGNORECASE
+)
+
+# Errors from SET LOCAL ROLE when the role is missing or not granted to the app's user
+_ROLE_ERRORS = {"22023", "42501"}
+
+class QueryValidationError(Exception):
+    """Raised when a statement is not an allowed read-only query"""
+
+class QueryTimeoutError(Exception):
+    """Raised when a statement exceeds the statement timeout"""
+
+class PoolExhaustedError(Exception):
+    """Raised when no pooled connection becomes available in time"""
+
+class QueryUnavailableError(Exception):
+    """Raised when the read-only query role is not set up"""
+
+def validate_select(sql: str) -> str:
+    """Return the statement without comments/trailing semicolon if it is a single read-only SELECT"""
+    statement = _COMMENTS.sub(" ", sql).strip().rstrip(";").strip()
+    if not statement:
+        raise QueryValidationError("Query is empty")
+    # Look for keywords outside string literals only
+    bare = _STRING_LITERALS.sub("''", statement)
+    if ";" in bare:
+        raise QueryValidationError("Only a single statement is allowed")
+    first_word = bare.split(None, 1)[0].lower()
+    if first_word not in ("select", "with"):
+        raise QueryValidationError("Only SELECT queries are allowed")
+    match = _FORBIDDEN.search(bare)
+    if match:
+        raise QueryValidationError(f"Keyword or function not allowed in read-only queries: {match.group(0)}")
+    return statement
+
+def plan_relations(plan: Dict[str, Any]) -> List[str]:
+    """Collect every relation name referenced by an EXPLAIN (FORMAT JSON) plan"""
+    relations = []
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if "Relation Name" in node:
+            relations.append(node["Relation Name"])
+        stack.extend(node.get("Plans", []))
+    return relations
+
+def json_default(value: Any) -> Any:
+    """JSON encoder for database types"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, (bytes, memoryview)):
+        return bytes(value).hex()
+    return str(value)
+
+def is_statement_timeout(error: DBAPIError) -> bool:
+    """Whether a driver error is PostgreSQL's query_canceled (statement_timeout)"""
+    return getattr(error.orig, "pgcode", None) == "57014"
+
+class QueryStats:
+    """Rolling query duration statistics"""
+
+    def __init__(self, window: int = 1024):
+        self._durations: "deque[float]" = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.rows = 0
+        self.truncated = 0
+
+    def record(self, duration_ms: float, rows: int, truncated: bool):
+        with self._lock:
+            self.queries += 1
+            self.rows += rows
+            self.truncated += int(truncated)
+            self._durations.append(duration_ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            durations = sorted(self._durations)
+        def percentile(p: float) -> Optional[float]:
+            if not durations:
+                return None
+            return round(durations[min(len(durations) - 1, int(p * len(durations)))], 2)
+        return {
+            "queries": self.queries,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "rows_streamed": self.rows,
+            "truncated_results": self.truncated,
+            "duration_ms": {"p50": percentile(0.50), "p95": percentile(0.95), "p99": percentile(0.99),
+                            "max": round(durations[-1], 2) if durations else None}
+        }
+
+class QueryResult:
+    """An executing query whose rows are pulled lazily from a server-side cursor"""
+
+    def __init__(self, executor: "QueryExecutor", connection, transaction, result, max_rows: int, started: float):
+        self.executor = executor
+        self.connection = connection
+        self.transaction = transaction
+        self.result = result
+        self.max_rows = max_rows
+        self.started = started
+        self.columns = list(result.keys())
+        self._closed = False
+
+    def iter_ndjson(self) -> Iterator[str]:
+        """Yield the column header, row batches and a summary as NDJSON lines"""
+        row_count = 0
+        truncated = False
+        try:
+            yield json.dumps({"type": "columns", "columns": self.columns}) + "\n"
+            for partition in self.result.partitions(QUERY_FETCH_BATCH):
+                lines = []
+                for row in partition:
+                    if row_count >= self.max_rows:
+                        truncated = True
+                        break
+                    lines.append(json.dumps({"type": "row", "values": list(row)}, default=json_default) + "\n")
+                    row_count += 1
+                if lines:
+                    yield "".join(lines)
+                if truncated:
+                    break
+            duration_ms = (time.perf_counter() - self.started) * 1000
+            self.executor.stats.record(duration_ms, row_count, truncated)
+            yield json.dumps({
+                "type": "summary",
+                "row_count": row_count,
+                "truncated": truncated,
+                "duration_ms": round(duration_ms, 2)
+            }) + "\n"
+        except DBAPIError as e:
+            if is_statement_timeout(e):
+                self.executor.stats.timeouts += 1
+                message = "Query exceeded the statement timeout"
+            else:
+                self.executor.stats.errors += 1
+                message = str(e.orig).strip()
+            yield json.dumps({"type": "error", "detail": message}) + "\n"
+        finally:
+            self.close()
+
+    def close(self):
+        """Release the cursor and return the connection to the pool"""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self.result.close()
+            self.transaction.rollback()
+        finally:
+            self.connection.close()
+
+class QueryExecutor:
+    """Runs validated read-only queries on a pooled engine"""
+
+    def __init__(self, engine, statement_timeout_ms: int = QUERY_STATEMENT_TIMEOUT_MS,
+                 max_rows: int = QUERY_MAX_ROWS, role: str = QUERY_ROLE):
+        self.engine = engine
+        self.statement_timeout_ms = statement_timeout_ms
+        self.max_rows = max_rows
+        self.role = role
+        self.stats = QueryStats()
+
+    def begin_read_only(self, connection):
+        """Start a READ ONLY transaction with the statement timeout, switched to the query role"""
+        transaction = connection.begin()
+        connection.execute(text("SET TRANSACTION READ ONLY"))
+        connection.execute(text(f"SET LOCAL statement_timeout = {int(self.statement_timeout_ms)}"))
+        if self.role:
+            try:
+                connection.execute(text(f'SET LOCAL ROLE "{self.role.replace(chr(34), chr(34) * 2)}"'))
+            except DBAPIError as e:
+                if getattr(e.orig, "pgcode", None) in _ROLE_ERRORS:
+                    raise QueryUnavailableError(
+                        f"Read-only query role {self.role!r} is not set up; "
+                        "run python setup_database.py --migrate-only") from e
+                raise
+        return transaction
+
+    def check_relations(self, connection, statement: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """EXPLAIN the statement and ensure it only reads allowed tables; returns the plan"""
+        explained = connection.execute(text(f"EXPLAIN (FORMAT JSON) {statement}"), params).scalar()
+        plan = (json.loads(explained) if isinstance(explained, str) else explained)[0]["Plan"]
+        disallowed = sorted(relation for relation in set(plan_relations(plan)) - ALLOWED_TABLES
+                            if not _ALLOWED_PARTITIONS.match(relation))
+        if disallowed:
+            raise QueryValidationError(f"Query reads tables that are not available: {', '.join(disallowed)}")
+        return plan
+
+    def explain(self, sql: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Validate a statement and return its top-level plan without running it"""
+        statement = validate_select(sql)
+        try:
+            with self.engine.connect() as connection:
+                transaction = self.begin_read_only(connection)
+                try:
+                    return self.check_relations(connection, statement, params or {})
+                finally:
+                    transaction.rollback()
+        except PoolTimeoutError:
+            self.stats.rejected += 1
+            raise PoolExhaustedError("No database connection available")
+        except DBAPIError as e:
+            raise QueryValidationError(str(e.orig).strip())
+
+    def execute(self, sql: str, params: Optional[Dict[str, Any]] = None,
+                max_rows: Optional[int] = None, prevalidated: bool = False) -> QueryResult:
+        """Validate and start a query; rows are fetched as the result is iterated.
+
+        prevalidated skips the lexical and EXPLAIN checks for statements that
+        already passed explain() (e.g. cached NL-to-SQL templates).
+        """
+        statement = sql if prevalidated else validate_select(sql)
+        params = params or {}
+        row_cap = min(max_rows or self.max_rows, self.max_rows)
+        started = time.perf_counter()
+        try:
+            connection = self.engine.connect()
+        except PoolTimeoutError:
+            self.stats.rejected += 1
+            raise PoolExhaustedError("No database connection available")
+        try:
+            transaction = self.begin_read_only(connection)
+            if not prevalidated:
+                self.check_relations(connection, statement, params)
+            result = connection.execution_options(
+                stream_results=True, max_row_buffer=QUERY_FETCH_BATCH
+            ).execute(text(statement), params)
+            return QueryResult(self, connection, transaction, result, row_cap, started)
+        except DBAPIError as e:
+            connection.close()
+            if is_statement_timeout(e):
+                self.stats.timeouts += 1
+                raise QueryTimeoutError("Query exceeded the statement timeout")
+            self.stats.errors += 1
+            raise QueryValidationError(str(e.orig).strip())
+        except Exception:
+            connection.close()
+            self.stats.errors += 1
+            raise
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Connection pool utilisation"""
+        pool = self.engine.pool
+        if not hasattr(pool, "checkedout"):
+            return {"pool": type(pool).__name__}
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        checked_out = pool.checkedout()
+        return {
+            "pool": type(pool).__name__,
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_out": checked_out,
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "saturation": round(checked_out / capacity, 4) if capacity > 0 else None
+        }
+
+    def stats_snapshot(self) -> Dict[str, Any]:
+        return {
+            "role": self.role or None,
+            "statement_timeout_ms": self.statement_timeout_ms,
+            "max_rows": self.max_rows,
+            "pool": self.pool_stats(),
+            "queries": self.stats.snapshot()
+        }
@@ -28,7 +28,7 @@ else
     echo "⚠️  .env file not found, using default environment"
 fi
 
-# Start the FastAPI server
+# Start the FastAPI server (pass --reload for development, --workers N to override one per CPU)
 echo "🌟 Starting FastAPI server on http://localhost:8000"
 echo "📖 API Documentation available at http://localhost:8000/docs"
-uvicorn main:app --host 0.0.0.0 --port 8000 --reload
+python serve.py "$@"
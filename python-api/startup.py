@@ -0,0 +1,85 @@
+"""
+Startup phase tracking and readiness for the API.
+
+Startup runs the slow, independent steps (LLM client, database pool) side
+by side in the threadpool and leaves cache warm-up (analytics aggregates,
+columnar tables) to a background task, so the server accepts connections
+early. GET /ready answers 503 until warm-up has finished, which lets a load
+balancer hold traffic back from a cold worker. Every phase is timed and
+the durations, plus module import time, make up the startup report.
+"""
+
+import time
+import asyncio
+from typing import Callable, Dict, Any, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+class StartupTracker:
+    """Durations and outcomes of startup phases, and whether the worker is ready"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, Dict[str, Any]] = {}
+        self.ready_seconds: Optional[float] = None
+        self._ready: Optional[asyncio.Event] = None
+
+    @property
+    def ready_event(self) -> asyncio.Event:
+        # Created lazily so it belongs to the running event loop
+        if self._ready is None:
+            self._ready = asyncio.Event()
+        return self._ready
+
+    def begin(self):
+        """Start the clock for ready_seconds (the startup event begins)"""
+        self.started = time.perf_counter()
+
+    def record(self, name: str, seconds: float, status: str = "ok"):
+        self.phases[name] = {"seconds": round(seconds, 4), "status": status}
+
+    async def phase(self, name: str, function: Callable, *args) -> Any:
+        """Run a blocking startup step in the threadpool and time it (exceptions propagate)"""
+        self.phases[name] = {"seconds": None, "status": "running"}
+        started = time.perf_counter()
+        status = "failed"
+        try:
+            result = await run_in_threadpool(function, *args)
+            status = "ok"
+            return result
+        finally:
+            self.record(name, time.perf_counter() - started, status)
+
+    def flag(self, name: str, status: str):
+        """Override a finished phase's status (e.g. "unavailable" when a component is skipped)"""
+        self.phases[name]["status"] = status
+
+    def mark_ready(self):
+        self.ready_seconds = time.perf_counter() - self.started
+        self.ready_event.set()
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_seconds is not None
+
+    async def wait_ready(self):
+        await self.ready_event.wait()
+
+    def pending(self) -> list:
+        return [name for name, phase in self.phases.items() if phase["status"] == "running"]
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "ready_seconds": round(self.ready_seconds, 4) if self.ready_seconds is not None else None,
+            "phases": dict(self.phases),
+            "pending": self.pending()
+        }
+
+    def summary(self) -> str:
+        """One-line report for the startup log"""
+        parts = [f"{name} {phase['seconds']:.2f}s" + ("" if phase["status"] == "ok" else f" ({phase['status']})")
+                 for name, phase in self.phases.items() if phase["seconds"] is not None]
+        return ", ".join(parts)
+
+startup = StartupTracker()
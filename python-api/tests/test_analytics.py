@@ -0,0 +1,145 @@
+"""Incremental aggregate refresh against a real PostgreSQL (skipped when none is reachable).
+
+Each test works in a scratch schema, so the database's own tables are never touched.
+"""
+
+import os
+import uuid
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+from analytics import AGGREGATE_TABLES, create_analytics_tables, refresh_aggregates
+from migrations import partition_transactions
+from setup_database import create_tables
+
+DB_CONFIG = {
+    "host": os.getenv("POSTGRES_HOST", "localhost"),
+    "port": os.getenv("POSTGRES_PORT", "5432"),
+    "user": os.getenv("POSTGRES_USER", "postgres"),
+    "password": os.getenv("POSTGRES_PASSWORD", "password"),
+    "dbname": os.getenv("POSTGRES_DATABASE", "dbms_mini_2"),
+}
+
+@pytest.fixture
+def schema():
+    try:
+        admin = psycopg2.connect(connect_timeout=3, **DB_CONFIG)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL not reachable: {e}")
+    admin.autocommit = True
+    name = f"test_analytics_{uuid.uuid4().hex[:8]}"
+    admin.cursor().execute(f"CREATE SCHEMA {name}")
+    try:
+        yield name
+    finally:
+        admin.cursor().execute(f"DROP SCHEMA {name} CASCADE")
+        admin.close()
+
+def connect(schema):
+    connection = psycopg2.connect(options=f"-c search_path={schema}", **DB_CONFIG)
+    connection.autocommit = True
+    return connection
+
+@pytest.fixture
+def db(schema):
+    connection = connect(schema)
+    create_tables(connection)
+    cursor = connection.cursor()
+    cursor.execute("""
+        INSERT INTO categories (category_name) VALUES ('Books'), ('Games');
+        INSERT INTO products (product_name, category_id, price) VALUES ('Novel', 1, 10), ('Puzzle', 2, 25);
+        INSERT INTO customers (first_name, last_name, email, gender, age)
+        VALUES ('A', 'A', 'a@example.com', 'Female', 30), ('B', 'B', 'b@example.com', 'Male', 52);
+    """)
+    for number in range(5):
+        add_transaction(cursor, customer=number % 2 + 1, amount=100 + number, method=("Cash", "UPI")[number % 2])
+    create_analytics_tables(connection)
+    refresh_aggregates(connection)
+    yield connection
+    connection.close()
+
+def add_transaction(cursor, customer: int, amount: float, method: str):
+    cursor.execute("""
+        INSERT INTO transactions (customer_id, transaction_date, total_amount, payment_method)
+        VALUES (%s, '2024-03-15', %s, %s) RETURNING transaction_id
+    """, (customer, amount, method))
+    transaction_id = cursor.fetchone()[0]
+    cursor.execute("""
+        INSERT INTO transaction_details (transaction_id, product_id, quantity, unit_price, line_total)
+        VALUES (%s, %s, 1, %s, %s)
+    """, (transaction_id, customer, amount, amount))
+    return transaction_id
+
+def aggregates(connection):
+    cursor = connection.cursor()
+    snapshot = {}
+    for table in AGGREGATE_TABLES:
+        cursor.execute(f"SELECT * FROM {table} ORDER BY 1, 2")
+        snapshot[table] = cursor.fetchall()
+    return snapshot
+
+def assert_matches_rebuild(connection):
+    incremental = aggregates(connection)
+    refresh_aggregates(connection, full=True)
+    assert incremental == aggregates(connection)
+
+def payment_totals(connection):
+    cursor = connection.cursor()
+    cursor.execute("SELECT SUM(transactions), SUM(revenue) FROM agg_payment_methods")
+    return cursor.fetchone()
+
+def test_update_does_not_fold_a_row_again(db):
+    before = payment_totals(db)
+    assert before[0] == 5
+    db.cursor().execute("UPDATE transactions SET status = 'refunded' WHERE transaction_id = 1")
+    result = refresh_aggregates(db)
+    assert result["folded"]["transactions"] == {"new_ids": 0, "late_rows": 0, "changes": 2}
+    assert payment_totals(db) == before
+    assert_matches_rebuild(db)
+
+def test_updates_and_deletes_replace_the_old_contribution(db):
+    cursor = db.cursor()
+    cursor.execute("UPDATE transactions SET total_amount = 500, payment_method = 'Card' WHERE transaction_id = 2")
+    cursor.execute("UPDATE transaction_details SET quantity = 3, line_total = 300 WHERE detail_id = 3")
+    cursor.execute("DELETE FROM transaction_details WHERE transaction_id IN (4, 5)")
+    cursor.execute("DELETE FROM transactions WHERE transaction_id = 5")
+    refresh_aggregates(db)
+    assert_matches_rebuild(db)
+
+def test_changed_rows_that_were_not_folded_yet_are_counted_once(db):
+    cursor = db.cursor()
+    new_id = add_transaction(cursor, customer=1, amount=40, method="Cash")
+    cursor.execute("UPDATE transactions SET total_amount = 45 WHERE transaction_id = %s", (new_id,))
+    refresh_aggregates(db)
+    assert payment_totals(db)[0] == 6
+    assert_matches_rebuild(db)
+
+def test_row_committed_after_a_higher_id_is_folded(db, schema):
+    late = connect(schema)
+    late.autocommit = False
+    late_id = add_transaction(late.cursor(), customer=1, amount=7, method="Cash")
+    add_transaction(db.cursor(), customer=2, amount=9, method="UPI")
+    refresh_aggregates(db)
+    assert payment_totals(db)[0] == 6
+    late.commit()
+    late.close()
+    result = refresh_aggregates(db)
+    assert result["folded"]["transactions"]["late_rows"] == 1
+    assert payment_totals(db)[0] == 7
+    assert late_id < 7
+    assert_matches_rebuild(db)
+
+def test_partitioning_rebuilds_instead_of_double_counting(db):
+    before = aggregates(db)
+    db.autocommit = False
+    partition_transactions(db)
+    db.commit()
+    db.autocommit = True
+    refresh_aggregates(db)
+    assert aggregates(db) == before
+    # The rebuilt table logs changes too
+    db.cursor().execute("UPDATE transactions SET status = 'refunded' WHERE transaction_id = 1")
+    refresh_aggregates(db)
+    assert aggregates(db) == before
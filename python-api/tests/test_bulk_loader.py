@@ -0,0 +1,33 @@
+import threading
+
+import psycopg2
+import pytest
+
+from bulk_loader import QueueBatches, TableLoad
+
+# Nothing listens on port 1, so connecting fails straight away
+UNREACHABLE = {"host": "127.0.0.1", "port": 1, "dbname": "none", "user": "none", "connect_timeout": 2}
+
+def feed(stream: QueueBatches, batches: int) -> threading.Thread:
+    def run():
+        for number in range(batches):
+            stream.put((f"{number}\n", 1))
+        stream.close()
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+def test_failed_connect_still_drains_the_feed():
+    stream = QueueBatches(depth=1)
+    feeder = feed(stream, 10)
+    with pytest.raises(psycopg2.OperationalError):
+        TableLoad("customers", None, stream).run(UNREACHABLE)
+    feeder.join(timeout=5)
+    assert not feeder.is_alive()
+
+def test_drain_after_the_end_returns():
+    stream = QueueBatches(depth=3)
+    feed(stream, 2).join(timeout=5)
+    assert list(stream) == [("0\n", 1), ("1\n", 1)]
+    stream.drain()  # the end marker was already read; must not wait for another
+    assert list(stream) == []
@@ -0,0 +1,100 @@
+import datetime
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from columnar import ColumnarEngine, ColumnarQueryError, ColumnTable, build_column, load_numpy
+
+ROWS = [
+    # date, gender, age, category, total_amount
+    ("2023-01-05", "Male", 34, "Beauty", 150.0),
+    ("2023-01-20", "Female", 26, "Clothing", 500.0),
+    ("2023-02-11", "Female", 50, "Beauty", 30.0),
+    ("2023-03-02", None, 41, "Electronics", 900.0),
+]
+
+@pytest.fixture
+def engine():
+    load_numpy()
+    kinds = {"date": "date", "gender": "str", "age": "int", "category": "str", "total_amount": "float"}
+    raw = {name: [row[i] for row in ROWS] for i, name in enumerate(kinds)}
+    raw["date"] = [datetime.date.fromisoformat(value) for value in raw["date"]]
+    columns = {name: build_column(kind, raw[name]) for name, kind in kinds.items()}
+    engine = ColumnarEngine(None)
+    engine.tables["sales"] = ColumnTable("sales", columns, len(ROWS), 0.0)
+    return engine
+
+def count(engine, *filters):
+    return engine.query("sales", filters=list(filters))["matched_rows"]
+
+@pytest.mark.parametrize("condition, expected", [
+    ({"column": "gender", "value": "Female"}, 2),
+    ({"column": "gender", "op": "ne", "value": "Female"}, 2),
+    ({"column": "category", "op": "in", "value": ["Beauty", "Electronics", "Toys"]}, 3),
+    ({"column": "age", "op": "between", "value": [26, 41]}, 3),
+    ({"column": "age", "op": "gt", "value": 40.5}, 2),
+    ({"column": "date", "op": "between", "value": ["2023-01-01", "2023-01-31"]}, 2),
+    ({"column": "date", "op": "ge", "value": "2023-02-11"}, 2),
+    ({"column": "total_amount", "op": "le", "value": 150}, 2),
+])
+def test_filters(engine, condition, expected):
+    assert count(engine, condition) == expected
+
+def test_filters_combine(engine):
+    assert count(engine, {"column": "gender", "value": "Female"}, {"column": "age", "op": "lt", "value": 30}) == 1
+
+@pytest.mark.parametrize("condition, message", [
+    ({"column": "age", "op": "between", "value": 30}, "pair"),
+    ({"column": "age", "op": "between", "value": [1, 2, 3]}, "pair"),
+    ({"column": "age", "op": "in", "value": "30"}, "list"),
+    ({"column": "age", "op": "gt", "value": "thirty"}, "number"),
+    ({"column": "age", "op": "eq", "value": None}, "number"),
+    ({"column": "age", "op": "eq", "value": True}, "number"),
+    ({"column": "date", "op": "ge", "value": "2023-13-45"}, "date"),
+    ({"column": "date", "op": "between", "value": ["2023-01-01", 5]}, "date"),
+    ({"column": "gender", "op": "lt", "value": "M"}, "not supported"),
+    ({"column": "category", "op": "between", "value": ["A", "C"]}, "not supported"),
+    ({"column": "age", "op": "like", "value": 3}, "Unknown operator"),
+    ({"column": "missing", "value": 3}, "Unknown column"),
+])
+def test_malformed_filters_are_query_errors(engine, condition, message):
+    with pytest.raises(ColumnarQueryError, match=message):
+        count(engine, condition)
+
+def test_group_and_aggregate(engine):
+    result = engine.query("sales", group_by=["date:month"],
+                          aggregates=[{"fn": "sum", "column": "total_amount"}, {"fn": "count"}],
+                          order_by="date:month", descending=False)
+    assert result["rows"] == [
+        {"date:month": "2023-01", "sum_total_amount": 650.0, "count": 2},
+        {"date:month": "2023-02", "sum_total_amount": 30.0, "count": 1},
+        {"date:month": "2023-03", "sum_total_amount": 900.0, "count": 1},
+    ]
+
+def test_text_group_keeps_missing_values(engine):
+    rows = engine.query("sales", group_by=["gender"], order_by="count")["rows"]
+    assert sorted((row["gender"] or "", row["count"]) for row in rows) == [("", 1), ("Female", 2), ("Male", 1)]
+
+@pytest.mark.parametrize("kwargs, message", [
+    ({"table": "customers"}, "not loaded"),
+    ({"table": "sales", "aggregates": [{"fn": "median", "column": "age"}]}, "Unknown aggregate"),
+    ({"table": "sales", "aggregates": [{"fn": "sum", "column": "gender"}]}, "numeric"),
+    ({"table": "sales", "group_by": ["age:month"]}, "date grouping"),
+    ({"table": "sales", "limit": 0}, "at least 1"),
+    ({"table": "sales", "limit": -1}, "at least 1"),
+])
+def test_invalid_queries(engine, kwargs, message):
+    with pytest.raises(ColumnarQueryError, match=message):
+        engine.query(**kwargs)
+
+def test_failed_reload_keeps_the_loaded_table(engine, monkeypatch):
+    loaded = engine.tables["sales"]
+    def fail(name, sql, kinds):
+        raise ConnectionError("database is down")
+    monkeypatch.setattr(engine, "_load_table", fail)
+    report = engine.reload()
+    assert engine.tables["sales"] is loaded
+    assert report["tables"]["sales"]["rows"] == len(ROWS)
+    assert report["load_errors"]["sales"] == "database is down"
+    assert "line_items" not in engine.tables  # never loaded, nothing to keep
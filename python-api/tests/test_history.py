@@ -0,0 +1,57 @@
+from history import HistoryWindow, estimate_tokens, clip, first_sentence
+
+def turn(number: int, length: int = 200):
+    return f"Question {number} " + "q" * length, f"Answer {number}. " + "a" * length
+
+def test_recent_turns_render_verbatim():
+    window = HistoryWindow(token_budget=1000, summary_budget=200)
+    window.append("How many customers?", "There are 50,000 customers.")
+    assert window.render() == "User: How many customers?\nAssistant: There are 50,000 customers.\n"
+    assert window.tokens == estimate_tokens(window.render())
+
+def test_oldest_turns_fold_into_summary_under_budget():
+    window = HistoryWindow(token_budget=300, summary_budget=10_000)
+    for number in range(6):
+        window.append(*turn(number))
+    assert window.turn_tokens <= 300
+    assert len(window.turns) + len(window.summary) == 6
+    rendered = window.render()
+    assert rendered.startswith("Summary of earlier conversation:\n- User asked: Question 0")
+    assert "| Assistant: Answer 0.\n" in rendered  # only the first sentence of a reply is kept
+    assert rendered.endswith(window.turns[-1][2])
+
+def test_summary_is_bounded_and_counts_omitted_turns():
+    window = HistoryWindow(token_budget=100, summary_budget=120)
+    for number in range(20):
+        window.append(*turn(number))
+    assert window.summary_tokens <= 120
+    assert window.omitted_turns == 20 - len(window.turns) - len(window.summary)
+    assert f"- ({window.omitted_turns} earlier turns omitted)" in window.render()
+
+def test_the_newest_turn_is_kept_even_over_budget():
+    window = HistoryWindow(token_budget=10, summary_budget=10)
+    window.append(*turn(1, length=500))
+    assert len(window.turns) == 1
+
+def test_render_cache_is_refreshed_by_changes():
+    window = HistoryWindow(token_budget=1000, summary_budget=200)
+    window.append("hi", "Hello!")
+    assert window.render() is window.render()
+    window.fold_oldest()
+    assert window.render() == "Summary of earlier conversation:\n- User asked: hi | Assistant: Hello!\n\n"
+
+def test_byte_size_follows_the_entries():
+    window = HistoryWindow(token_budget=300, summary_budget=100)
+    sizes = []
+    for number in range(10):
+        window.append(*turn(number))
+        sizes.append(window.nbytes)
+    assert max(sizes) < 2 * sizes[2]  # folding and the summary budget keep it bounded
+    while window.turns:
+        window.fold_oldest()
+    assert window.nbytes > 0 and not window.turns
+
+def test_text_helpers():
+    assert clip("a  b\n c", 10) == "a b c"
+    assert clip("abcdefghij", 5) == "abcd…"
+    assert first_sentence("Yes. More detail here.") == "Yes."
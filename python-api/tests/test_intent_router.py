@@ -0,0 +1,96 @@
+from contextlib import contextmanager
+
+import pytest
+
+from intent_router import IntentRouter, DEFAULT_REPLY, GREETING_REPLY, PRODUCTS_REPLY
+
+class FakeEngine:
+    """Engine stand-in: answers every query with the given rows, or raises"""
+
+    def __init__(self, rows=None, error=None):
+        self.rows = rows or []
+        self.error = error
+        self.queries = []
+
+    @contextmanager
+    def connect(self):
+        if self.error:
+            raise self.error
+        yield self
+
+    def execute(self, statement):
+        self.queries.append(str(statement))
+        return iter(self.rows)
+
+@pytest.fixture
+def router():
+    return IntentRouter(enabled=True)
+
+@pytest.mark.parametrize("message, intent, slots", [
+    ("How many customers are there?", "row_count", ("customers",)),
+    ("how many line items", "row_count", ("transaction_details",)),
+    ("How many transaction details do we have", "row_count", ("transaction_details",)),
+    ("What tables are in the database?", "list_tables", ()),
+    ("Show me revenue by category", "category_breakdown", ()),
+    ("What is the payment method breakdown?", "payment_breakdown", ()),
+])
+def test_routes_confident_data_questions(router, message, intent, slots):
+    found = router.route(message)
+    assert found is not None
+    assert (found.rule.name, found.slots) == (intent, slots)
+
+@pytest.mark.parametrize("message", [
+    "How many customers in Chicago?",
+    "Show me revenue by category for 2023",
+    "How many users are there?",
+    "How many accounts do we have?",
+    "How many customers have orders?",
+    "How many orders do customers have?",
+    "How many customers with orders?",
+    "How many orders per customer?",
+    "How many customers and products are there?",
+    "Which products should we restock before the holidays?",
+    "hello",
+])
+def test_leaves_other_questions_to_the_llm(router, message):
+    assert router.route(message) is None
+
+def test_disabled_router_routes_nothing():
+    assert IntentRouter(enabled=False).route("How many customers are there?") is None
+
+def test_row_count_answers_the_named_table(router):
+    engine = FakeEngine(rows=[(50000,)])
+    answer = router.answer(router.route("How many customers do we have?"), engine)
+    assert answer == "There are **50,000** customers in the database."
+    assert engine.queries == ["SELECT COUNT(*) FROM customers"]
+
+def test_table_list_leaves_out_unknown_row_counts(router):
+    engine = FakeEngine(rows=[("customers", 50000), ("products", None)])
+    answer = router.answer(router.route("What tables are in the database?"), engine)
+    assert "• **customers** — about 50,000 rows" in answer
+    assert "• **products**\n" in answer and "about 0" not in answer
+
+def test_answers_are_cached_per_slot_set(router):
+    found = router.route("How many customers are there?")
+    assert router.cached_answer(found) is None
+    router.answer(found, FakeEngine(rows=[(5,)]))
+    assert router.cached_answer(found) == "There are **5** customers in the database."
+    assert router.cached_answer(router.route("How many products are there?")) is None
+
+def test_backs_off_after_a_database_failure(router):
+    found = router.route("How many customers are there?")
+    with pytest.raises(ConnectionError):
+        router.answer(found, FakeEngine(error=ConnectionError("down")))
+    assert not router.data_available
+    router.retry_at = 0.0
+    assert router.data_available
+    router.answer(found, FakeEngine(rows=[(1,)]))
+    assert router._backoff == 0.0
+
+@pytest.mark.parametrize("message, reply", [
+    ("hello there", GREETING_REPLY),
+    ("tell me about product stock", PRODUCTS_REPLY),
+    ("this is something else", DEFAULT_REPLY),  # "this" must not match "hi"
+])
+def test_fallback_replies_match_whole_words(router, message, reply):
+    assert router.fallback_reply(message) == reply
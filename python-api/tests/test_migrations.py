@@ -0,0 +1,98 @@
+from datetime import date, datetime
+
+import pytest
+
+from migrations import Migration, migration_status, month_start, partition_name, ensure_transaction_partitions
+
+MIGRATIONS = [
+    Migration(2, "analytics_tables", None),
+    Migration(1, "initial_schema", None),
+    Migration(3, "partition_transactions_by_date", None, optional=True),
+]
+
+class FakeCursor:
+    """Answers the catalog lookup and the schema_migrations query; records every statement"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.result = []
+
+    def execute(self, statement, params=None):
+        self.connection.statements.append(" ".join(statement.split()))
+        if "to_regclass" in statement:
+            self.result = [("schema_migrations" if self.connection.recorded is not None else None,)]
+        else:
+            self.result = self.connection.recorded
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+class FakeConnection:
+    def __init__(self, recorded):
+        self.recorded = recorded
+        self.statements = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+def test_status_on_a_fresh_database_is_read_only():
+    connection = FakeConnection(recorded=None)
+    status = migration_status(connection, MIGRATIONS)
+    assert [(m["version"], m["applied_at"]) for m in status] == [(1, None), (2, None), (3, None)]
+    assert all(statement.startswith("SELECT") for statement in connection.statements)
+
+def test_status_reports_recorded_migrations():
+    applied_at = datetime(2026, 1, 1)
+    connection = FakeConnection(recorded=[(1, "initial_schema", applied_at, 12)])
+    status = migration_status(connection, MIGRATIONS)
+    assert [(m["name"], m["applied_at"], m["optional"]) for m in status] == [
+        ("initial_schema", applied_at, False),
+        ("analytics_tables", None, False),
+        ("partition_transactions_by_date", None, True),
+    ]
+    assert not any("CREATE" in statement for statement in connection.statements)
+
+@pytest.mark.parametrize("day, offset, expected", [
+    (date(2024, 1, 31), 0, date(2024, 1, 1)),
+    (date(2024, 11, 15), 2, date(2025, 1, 1)),
+    (date(2024, 1, 15), -1, date(2023, 12, 1)),
+    (date(2024, 12, 1), 25, date(2027, 1, 1)),
+])
+def test_month_start(day, offset, expected):
+    assert month_start(day, offset) == expected
+
+def test_partition_name():
+    assert partition_name(date(2024, 3, 1)) == "transactions_p202403"
+
+class PartitionCursor:
+    """Catalog with some partitions already present and some months held by the default partition"""
+
+    def __init__(self, existing, in_default):
+        self.existing = set(existing)
+        self.in_default = set(in_default)
+        self.created = []
+        self.result = None
+
+    def execute(self, statement, params=None):
+        if "FROM pg_class" in statement:
+            self.result = ("r",) if params[0] in self.existing else None
+        elif "transactions_default" in statement:
+            self.result = (params[0] in self.in_default,)
+        elif statement.strip().startswith("CREATE TABLE"):
+            self.created.append(" ".join(statement.split()))
+
+    def fetchone(self):
+        return self.result
+
+def test_ensure_partitions_creates_only_missing_months():
+    cursor = PartitionCursor(existing={"transactions_p202401"}, in_default={date(2024, 3, 1)})
+    ensure_transaction_partitions(cursor, date(2024, 1, 20), date(2024, 4, 2))
+    assert cursor.created == [
+        "CREATE TABLE transactions_p202402 PARTITION OF transactions "
+        "FOR VALUES FROM ('2024-02-01') TO ('2024-03-01')",
+        "CREATE TABLE transactions_p202404 PARTITION OF transactions "
+        "FOR VALUES FROM ('2024-04-01') TO ('2024-05-01')",
+    ]
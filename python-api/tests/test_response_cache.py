@@ -0,0 +1,46 @@
+import pytest
+
+from response_cache import ResponseCache, normalize_message, is_faq
+
+@pytest.fixture
+def cache():
+    cache = ResponseCache(max_entries=2, ttl_seconds=60)
+    cache.set_context("schema v1")
+    return cache
+
+def test_grounding_is_part_of_every_key(cache):
+    # FAQ and stateless questions ignore history, but not the figures they were answered from
+    for message, stateless in (("What tables are there?", False), ("Revenue by category", True),
+                               ("Revenue by category", False)):
+        assert (cache.make_key(message, "", "revenue: 100", stateless)
+                != cache.make_key(message, "", "revenue: 200", stateless))
+
+def test_history_only_matters_for_stateful_questions(cache):
+    assert cache.make_key("What tables are there?", "user: hi", "") == cache.make_key("what tables are there", "", "")
+    assert cache.make_key("Revenue by category", "a", "", stateless=True) == \
+        cache.make_key("Revenue by category", "b", "", stateless=True)
+    assert cache.make_key("Revenue by category", "a", "") != cache.make_key("Revenue by category", "b", "")
+
+def test_history_and_grounding_cannot_run_together(cache):
+    assert cache.make_key("Top products", "ab", "c") != cache.make_key("Top products", "a", "bc")
+
+def test_context_change_invalidates(cache):
+    key = cache.make_key("help", "", "")
+    cache.put(key, "answer")
+    cache.set_context("schema v1")
+    assert cache.get(key) == "answer"
+    cache.set_context("schema v2")
+    assert cache.get(key) is None
+    assert cache.make_key("help", "", "") != key
+
+def test_least_recently_used_entry_is_evicted(cache):
+    cache.put("a", "1")
+    cache.put("b", "2")
+    cache.get("a")
+    cache.put("c", "3")
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("1", None, "3")
+    assert cache.evictions == 1
+
+def test_normalization_and_faq():
+    assert normalize_message("  What   TABLES are there?! ") == "what tables are there"
+    assert is_faq("what tables are there") and not is_faq("revenue by category")
@@ -0,0 +1,53 @@
+from schema_context import render_schema, approximate
+
+COLUMNS = [
+    ("customers", "customer_id", "integer", None, 32, 0, "nextval('customers_customer_id_seq'::regclass)"),
+    ("customers", "first_name", "character varying", 50, None, None, None),
+    ("customers", "last_name", "character varying", 50, None, None, None),
+    ("customers", "gender", "character varying", 10, None, None, None),
+    ("transactions", "transaction_id", "integer", None, 32, 0, None),
+    ("transactions", "transaction_date", "date", None, None, None, None),
+    ("transactions", "customer_id", "integer", None, 32, 0, None),
+    ("users", "user_id", "integer", None, 32, 0, None),
+    ("users", "email", "character varying", 255, None, None, None),
+    ("chat_session_turns", "session_id", "text", None, None, None, None),
+]
+KEYS = [
+    ("customers", "PRIMARY KEY", "customer_id", None, None),
+    ("transactions", "FOREIGN KEY", "customer_id", "customers", "customer_id"),
+    ("transactions", "PRIMARY KEY", "transaction_id", None, None),
+    ("transactions", "PRIMARY KEY", "transaction_date", None, None),
+    ("users", "PRIMARY KEY", "user_id", None, None),
+]
+ESTIMATES = {"customers": "50k", "transactions": "400k", "users": "1"}
+STATS = [
+    ("customers", "first_name", 0.0, 40.0, ["Ana", "Ben"], [0.5, 0.5], None),
+    ("customers", "last_name", 0.0, 40.0, ["Lee", "Roe"], [0.5, 0.5], None),
+    ("customers", "gender", 0.0, 2.0, ["Female", "Male"], [0.51, 0.49], None),
+]
+
+def render():
+    return render_schema(COLUMNS, KEYS, ESTIMATES, STATS)
+
+def test_only_ecommerce_tables_are_described():
+    text, tables = render()
+    assert tables == ["customers", "transactions"]
+    assert "users" not in text and "email" not in text and "chat_session" not in text
+
+def test_composite_primary_key_is_one_constraint():
+    text, _ = render()
+    line = next(line for line in text.splitlines() if line.startswith("transactions"))
+    assert line.endswith("PK(transaction_id, transaction_date)")
+    assert "transaction_id int," in line and "customer_id int → customers.customer_id" in line
+    assert "customers ~50k: customer_id serial PK," in text
+
+def test_personal_names_are_never_sampled():
+    text, _ = render()
+    assert "Ana" not in text and "Lee" not in text
+    assert "gender varchar(10) [Female 51%, Male 49%]" in text
+
+def test_render_is_deterministic():
+    assert render() == render()
+
+def test_row_estimates_are_rounded_to_two_figures():
+    assert [approximate(n) for n in (42, 49_871, 1_234_567, 400_213)] == ["42", "50k", "1.2M", "400k"]
@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+from sqlalchemy import create_engine
+
+from session_store import SessionStore, turn_size
+from session_backend import SQLSessionBackend
+
+def store(max_sessions=10, max_bytes=10_000_000, ttl_seconds=3600):
+    return SessionStore(ttl_seconds=ttl_seconds, max_sessions=max_sessions, max_bytes=max_bytes)
+
+def total(store):
+    return sum(memory.size_bytes for memory in store._sessions.values())
+
+def test_least_recently_used_session_is_evicted_at_capacity():
+    sessions = store(max_sessions=2)
+    sessions.get_or_create("a")
+    sessions.get_or_create("b")
+    sessions.get("a")
+    sessions.get_or_create("c")
+    assert sessions.keys() == ["a", "c"]
+    assert sessions.evictions["capacity"] == 1
+
+def test_pinned_sessions_are_not_evicted():
+    sessions = store(max_sessions=2)
+    sessions.get_or_create("a")
+    sessions.pin("a")
+    sessions.get_or_create("b")
+    sessions.get_or_create("c")
+    assert "a" in sessions and "b" not in sessions
+
+def test_idle_sessions_expire():
+    sessions = store(ttl_seconds=60)
+    sessions.get_or_create("old").last_access = time.monotonic() - 120
+    sessions.get_or_create("new")
+    assert sessions.keys() == ["new"]
+    assert sessions.evictions["ttl"] == 1
+
+def test_size_counts_turns_and_history_window():
+    sessions = store()
+    memory = sessions.get_or_create("a")
+    memory.append_turn("How many customers?", "There are 50,000 customers.")
+    assert memory.size_bytes == turn_size("How many customers?", "There are 50,000 customers.") + memory.history.nbytes
+    assert sessions.total_bytes == memory.size_bytes
+
+def test_byte_budget_evicts_other_sessions_first():
+    sessions = store(max_bytes=8_000)
+    sessions.get_or_create("a").append_turn("x" * 1000, "y" * 1000)
+    sessions.get_or_create("b").append_turn("x" * 1000, "y" * 1000)
+    assert list(sessions._sessions) == ["b"]
+    assert sessions.evictions["memory"] == 1
+    assert sessions.total_bytes == total(sessions) <= 8_000
+
+@pytest.mark.parametrize("turns", [8, 30])
+def test_trimming_a_session_also_trims_its_history(turns):
+    sessions = store(max_bytes=20_000)
+    memory = sessions.get_or_create("a")
+    for number in range(turns):
+        memory.append_turn(f"question {number} " + "x" * 500, f"answer {number}. " + "y" * 500)
+    assert sessions.trimmed_turns > 0
+    assert sessions.total_bytes == memory.size_bytes <= 20_000
+    assert len(memory.history.turns) <= len(memory.turns)
+    # What the prompt still quotes verbatim is what the session still stores
+    assert [turn[:2] for turn in memory.history.turns] == memory.turns[len(memory.turns) - len(memory.history.turns):]
+    assert "question 0 " not in "".join(rendered for _, _, rendered, _ in memory.history.turns)
+
+def test_delete_releases_bytes():
+    sessions = store()
+    sessions.get_or_create("a").append_turn("hi", "hello")
+    assert sessions.delete("a")
+    assert sessions.total_bytes == 0 and "a" not in sessions
+
+def test_a_bad_turn_does_not_drop_the_rest_of_its_batch(tmp_path):
+    backend = SQLSessionBackend(create_engine(f"sqlite:///{tmp_path / 'sessions.db'}"), flush_interval_ms=50)
+    try:
+        backend.append("a", "hi", "hello")
+        backend.append("b", "hi", None)  # NOT NULL violation fails the batch insert
+        backend.append("a", "bye", "goodbye")
+        backend.flush()
+        turns, _ = backend.load("a")
+        assert turns == [("hi", "hello"), ("bye", "goodbye")]
+        assert (backend.rows_written, backend.rows_dropped) == (2, 1)
+    finally:
+        backend.close()
@@ -0,0 +1,47 @@
+import pytest
+
+from sql_executor import validate_select, plan_relations, QueryValidationError
+
+TS_STAT_PAYLOAD = (
+    "SELECT word FROM ts_stat('SELECT to_tsvector(''simple'', email || '' '' || password) FROM users')"
+)
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM customers",
+    "select count(*) from transactions where payment_method = 'Cash';",
+    "WITH t AS (SELECT 1 AS x) SELECT x FROM t",
+    "SELECT 'drop table customers' AS label",
+    "SELECT 1 -- ; delete from customers",
+])
+def test_accepts_read_only_selects(sql):
+    assert validate_select(sql).lower().startswith(("select", "with"))
+
+@pytest.mark.parametrize("sql", [
+    TS_STAT_PAYLOAD,
+    "SELECT * FROM ts_rewrite('a & b'::tsquery, 'SELECT t, s FROM aliases')",
+    "SELECT query_to_xml('SELECT * FROM users', true, true, '')",
+    "SELECT table_to_xml('users', true, true, '')",
+    "SELECT cursor_to_xml('c', 10, true, true, '')",
+    "SELECT query_to_xmlschema('SELECT 1', true, true, '')",
+    "SELECT * FROM dblink('dbname=x', 'SELECT 1') AS t(x int)",
+    "SELECT set_config('statement_timeout', '0', true)",
+    "SELECT pg_read_file('/etc/passwd')",
+    "SELECT * FROM customers; DELETE FROM customers",
+    "DELETE FROM customers",
+    "SELECT * INTO backup FROM customers",
+    "",
+])
+def test_rejects_writes_and_query_string_functions(sql):
+    with pytest.raises(QueryValidationError):
+        validate_select(sql)
+
+def test_ts_stat_payload_is_named_in_the_error():
+    with pytest.raises(QueryValidationError, match="ts_stat"):
+        validate_select(TS_STAT_PAYLOAD)
+
+def test_plan_relations_walks_nested_plans():
+    plan = {"Node Type": "Hash Join", "Plans": [
+        {"Node Type": "Seq Scan", "Relation Name": "customers"},
+        {"Node Type": "Hash", "Plans": [{"Node Type": "Seq Scan", "Relation Name": "users"}]},
+    ]}
+    assert sorted(plan_relations(plan)) == ["customers", "users"]